@@ -1,76 +1,209 @@
 import os
+import asyncio
+import hmac
 import logging
 from datetime import datetime, timedelta
-from flask import Flask, render_template, jsonify
-from config import SERVER_HOST, FLASK_PORT
-from bot import setup_bot
+from flask import Flask, render_template, jsonify, request
+from config import SERVER_HOST, FLASK_PORT, LEADER_LEASE_TTL, WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET
+from webhook import update_queue, QUEUED, DUPLICATE, BUSY, UNAVAILABLE, RELAYED
+from metrics import REGISTRY, render, sample_value
 import threading
+import time
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 # Create Flask app
 app = Flask(__name__)
 app.secret_key = os.environ.get("SESSION_SECRET", "binary_trading_signals_bot_secret")
 
-# In-memory storage for bot status
-bot_status = {
-    "running": False,
-    "authenticated_users": 0,
-    "signals_sent": 0,
-    "last_updated": None
-}
+# The Telegram stack and the store (PTB, SQLAlchemy) are imported where
+# they are used, not here, so the web app is up as soon as Flask is and
+# an autoscaled instance starts serving without waiting for the bot.
+
+def current_status():
+    """
+    Bot status as seen by any web worker.
+
+    Read from the shared store rather than process memory, since with
+    several gunicorn workers only the elected leader runs the bot.
+    """
+    from leader import POLLER_LEASE
+    from storage import store, SIGNALS_SENT, SIGNAL_SNAPSHOT
+    signals, published_at = store.get_state(SIGNAL_SNAPSHOT)
+    return {
+        "running": store.lease_holder(POLLER_LEASE) is not None,
+        "authenticated_users": store.count_users(),
+        "signals_sent": store.counter(SIGNALS_SENT),
+        "cached_signals": len(signals or []),
+        "snapshot_updated": (
+            datetime.fromtimestamp(published_at).strftime("%Y-%m-%d %H:%M:%S")
+            if published_at is not None else None
+        ),
+        "metrics": metrics_summary(bot_metrics()),
+        "last_updated": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    }
+
+def bot_metrics():
+    """
+    Metric families of the process running the bot.
+
+    That is this process's own registry if it is the leader, otherwise
+    the copy the leader last published to the store.
+    """
+    if election is not None and election.is_leader:
+        return REGISTRY.collect()
+    from storage import store, METRICS_SNAPSHOT
+    families, _ = store.get_state(METRICS_SNAPSHOT)
+    return families or []
+
+def metrics_summary(families):
+    """Headline numbers for /status and the dashboard"""
+    lookups = sample_value(families, "signal_cache_lookups_total")
+    hits = lookups - sample_value(families, "signal_cache_lookups_total", result="miss")
+    fetches = sample_value(families, "signals_fetch_total")
+    timed_fetches = sample_value(families, "signals_fetch_seconds_count")
+    return {
+        "handler_calls": sample_value(families, "bot_handler_calls_total"),
+        "handler_errors": sample_value(families, "bot_handler_errors_total"),
+        "signal_fetches": fetches,
+        "signal_fetch_errors": fetches - sample_value(families, "signals_fetch_total", outcome="ok"),
+        "avg_fetch_seconds": (
+            round(sample_value(families, "signals_fetch_seconds_sum") / timed_fetches, 3)
+            if timed_fetches else None
+        ),
+        "cache_hit_ratio": round(hits / lookups, 3) if lookups else None,
+        "telegram_requests": sample_value(families, "telegram_requests_total"),
+        "broadcast_rate": round(sample_value(families, "broadcast_messages_per_second"), 1),
+        "queue_depth": sample_value(families, "queue_depth")
+    }
 
 @app.route("/")
 def index():
     """Main page route"""
-    from config import AUTHENTICATED_USERS
-    # Update the status from the config
-    bot_status["authenticated_users"] = len(AUTHENTICATED_USERS)
-    bot_status["last_updated"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    return render_template("index.html", bot_status=bot_status)
+    return render_template("index.html", bot_status=current_status())
 
 @app.route("/status")
 def status():
     """API endpoint to get bot status"""
-    from config import AUTHENTICATED_USERS
-    # Update the status from the config
-    bot_status["authenticated_users"] = len(AUTHENTICATED_USERS)
-    bot_status["last_updated"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
+    bot_status = current_status()
     return jsonify({
         "status": "online" if bot_status["running"] else "offline",
         "authenticated_users": bot_status["authenticated_users"],
         "signals_sent": bot_status["signals_sent"],
+        "cached_signals": bot_status["cached_signals"],
+        "snapshot_updated": bot_status["snapshot_updated"],
+        "metrics": bot_status["metrics"],
         "last_updated": bot_status["last_updated"]
     })
 
+@app.route("/metrics")
+def metrics():
+    """Prometheus scrape endpoint; any worker serves the bot's metrics"""
+    from leader import POLLER_LEASE
+    from storage import store, SIGNALS_SENT
+    families = bot_metrics() + [
+        {"name": "bot_running", "help": "1 if a process holds the poller lease", "type": "gauge",
+         "samples": [["bot_running", {}, int(store.lease_holder(POLLER_LEASE) is not None)]]},
+        {"name": "bot_authenticated_users", "help": "Authenticated users", "type": "gauge",
+         "samples": [["bot_authenticated_users", {}, store.count_users()]]},
+        {"name": "bot_signals_sent_total", "help": "Signals sent to users by any process", "type": "counter",
+         "samples": [["bot_signals_sent_total", {}, store.counter(SIGNALS_SENT)]]}
+    ]
+    return app.response_class(render(families), mimetype="text/plain; version=0.0.4")
+
+@app.route("/health")
+def health():
+    """Liveness probe: the web app is up"""
+    return jsonify({"web": "up"})
+
+@app.route("/ready")
+def ready():
+    """
+    Readiness probe: the web app is up and a bot is connected to Telegram.
+
+    The bot is either run by this process ("connected") or by another
+    worker holding the poller lease ("standby").
+    """
+    state = bot_state()
+    status_code = 200 if state in ("connected", "standby") else 503
+    return jsonify({"web": "up", "bot": state}), status_code
+
+def bot_state():
+    """
+    Returns:
+        str: "connected", "standby" (another worker runs the bot),
+            "starting" or "down" (no worker runs the bot)
+    """
+    if election is None:
+        return "starting"
+    if election.is_leader:
+        connected = _bot["connected"]
+        return "connected" if connected is not None and connected.is_set() else "starting"
+    from leader import POLLER_LEASE
+    from storage import store
+    return "standby" if store.lease_holder(POLLER_LEASE) is not None else "down"
+
+@app.route(WEBHOOK_PATH, methods=["POST"])
+def telegram_webhook():
+    """
+    Receive an update from Telegram (or a recorded one POSTed locally).
+
+    Only requests carrying WEBHOOK_SECRET in the secret token header are
+    accepted; with no secret configured every request is refused.
+
+    Updates are only queued here and handled on the bot's event loop.
+    A worker that isn't running the bot relays them to the leader through
+    the store. Non-2xx responses make Telegram redeliver later, which is
+    how a full queue, or a store that can't be reached, pushes back.
+    """
+    # Without a secret there is no way to tell Telegram from a forger
+    token = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+    if not WEBHOOK_SECRET or not hmac.compare_digest(token.encode(), WEBHOOK_SECRET.encode()):
+        return jsonify({"ok": False, "error": "forbidden"}), 403
+
+    payload = request.get_json(silent=True)
+    try:
+        outcome = update_queue.submit(payload)
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+
+    if outcome == UNAVAILABLE and WEBHOOK_URL:
+        from storage import store
+        try:
+            store.relay_update(payload)
+            return jsonify({"ok": True, "status": RELAYED})
+        except Exception as e:
+            logger.error(f"Error relaying update {payload['update_id']}: {e}")
+
+    if outcome in (QUEUED, DUPLICATE):
+        return jsonify({"ok": True, "status": outcome})
+    status_code = 429 if outcome == BUSY else 503
+    return jsonify({"ok": False, "status": outcome}), status_code, {"Retry-After": "1"}
+
 @app.route("/test-signals")
 def test_signals():
     """Test endpoint to check signal processing"""
     from utils import fetch_trading_signals, format_signal_message
+    from signal_feeds import signal_aggregator
+    from signal_model import Signal
     
     # Create some sample signals to test with, in case the API doesn't return any
+    now = int(time.time())
     sample_signals = [
-        {
-            "asset": "EUR/USD",
-            "direction": "CALL",
-            "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "original_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "converted_time": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        },
-        {
-            "asset": "BTC/USD",
-            "direction": "PUT",
-            "time": (datetime.now() + timedelta(hours=1)).strftime("%Y-%m-%d %H:%M:%S"),
-            "original_time": (datetime.now() + timedelta(hours=1)).strftime("%Y-%m-%d %H:%M:%S"),
-            "converted_time": (datetime.now() + timedelta(hours=1)).strftime("%Y-%m-%d %H:%M:%S")
-        }
+        Signal.at("EUR/USD", "CALL", now, original_time=datetime.now().strftime("%H:%M")),
+        Signal.at("BTC/USD", "PUT", now + 3600,
+                  original_time=(datetime.now() + timedelta(hours=1)).strftime("%H:%M"))
     ]
     
     # First try to get real signals
-    real_signals = fetch_trading_signals()
+    async def fetch_once():
+        try:
+            return await fetch_trading_signals()
+        finally:
+            # This event loop ends with the request, so don't keep its connections
+            await signal_aggregator.aclose()
+    
+    real_signals = asyncio.run(fetch_once())
     
     # Use real signals if available, otherwise use samples
     signals = real_signals if real_signals else sample_signals
@@ -80,7 +213,7 @@ def test_signals():
     
     # Return both raw and formatted signals for testing
     return jsonify({
-        "raw_signals": signals,
+        "raw_signals": [signal.to_dict() for signal in signals],
         "formatted_signals": formatted_signals
     })
 
@@ -88,12 +221,94 @@ def run_flask_app():
     """Run the Flask app"""
     app.run(host=SERVER_HOST, port=FLASK_PORT, debug=True, use_reloader=False)
 
+# Election deciding which process runs the bot, and the bot run by this process
+election = None
+_bot = {"application": None, "loop": None, "thread": None, "stop": None, "connected": None}
+_bot_lock = threading.Lock()
+_startup = None
+
 def start_bot_thread():
+    """
+    Compete to run the Telegram bot.
+
+    Every worker calls this, but only the elected leader runs the bot, so
+    several gunicorn workers never fight over getUpdates. In webhook mode
+    the other workers relay the updates they receive to the leader
+    through the store. If the leader goes away another worker takes over.
+
+    Returns at once: the heavy imports, warm-up and the election run in
+    a background thread while the web app already serves requests.
+    """
+    global _startup
+    with _bot_lock:
+        if _startup is not None:
+            return
+        _startup = threading.Thread(target=_start_election, name="bot-startup", daemon=True)
+    _startup.start()
+
+def _start_election():
+    global election
+    started = time.perf_counter()
+    from leader import LeaderElection
+    from storage import store
+    try:
+        # Connect and migrate the store and compile the page template now,
+        # not on the first request
+        store.engine
+        app.jinja_env.get_template("index.html")
+        logger.info(f"Web warm-up finished in {time.perf_counter() - started:.2f}s")
+    except Exception as e:
+        logger.error(f"Error warming up: {e}")
+
+    election = LeaderElection(on_elected=_start_bot, on_demoted=_stop_bot)
+    election.start()
+
+def _start_bot():
     """Start the Telegram bot in a separate thread"""
-    updater = setup_bot()
-    if updater:
-        bot_status["running"] = True
+    with _bot_lock:
+        if _bot["thread"] is not None and _bot["thread"].is_alive():
+            return
+        from bot import setup_bot, connected
+        application = setup_bot()
+        if not application:
+            logger.error("Bot setup failed!")
+            election.resign()
+            return
         logger.info("Starting bot in background thread...")
-        updater.start_polling()
-    else:
-        logger.error("Bot setup failed!")
+        loop = asyncio.new_event_loop()
+        stop = asyncio.Event()
+        thread = threading.Thread(
+            target=_run_bot,
+            args=(application, loop, stop),
+            name="telegram-bot",
+            daemon=True
+        )
+        _bot.update(application=application, loop=loop, thread=thread, stop=stop, connected=connected)
+        thread.start()
+
+def _stop_bot():
+    """Stop polling after losing leadership, so the new leader is the only poller"""
+    with _bot_lock:
+        application, loop, thread, stop = _bot["application"], _bot["loop"], _bot["thread"], _bot["stop"]
+        if thread is None or not thread.is_alive():
+            return
+        logger.info("Stopping bot, this process is no longer the leader")
+        # Both must be called on the bot's own event loop
+        loop.call_soon_threadsafe(stop.set if WEBHOOK_URL else application.stop_running)
+        thread.join(timeout=LEADER_LEASE_TTL)
+
+def _run_bot(application, loop, stop):
+    """Run the bot's event loop; signal handlers only work in the main thread"""
+    asyncio.set_event_loop(loop)
+    try:
+        if WEBHOOK_URL:
+            from bot import run_webhook
+            loop.run_until_complete(run_webhook(application, stop))
+        else:
+            application.run_polling(stop_signals=None)
+    except Exception as e:
+        logger.error(f"Bot polling stopped: {e}")
+    finally:
+        if election is not None and election.is_leader:
+            # Let another worker (or the next election round) restart polling
+            election.resign()
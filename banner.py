@@ -0,0 +1,130 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from telegram.error import BadRequest
+from config import BANNER_IMAGE_PATH, BANNER_FILE_ID_PATH
+
+logger = logging.getLogger(__name__)
+
+# Fragments of the BadRequest messages Telegram sends for an unusable
+# file_id, e.g. "Wrong file identifier/http url specified"
+FILE_ID_ERRORS = ("file identifier", "file_id", "file reference")
+
+def _is_file_id_error(error):
+    message = error.message.lower()
+    return any(fragment in message for fragment in FILE_ID_ERRORS)
+
+class BannerCache:
+    """
+    Uploads the signal banner once and reuses Telegram's file_id afterwards.
+
+    The file_id is persisted next to a hash of the image so it survives
+    restarts and is discarded automatically when the image changes.
+    """
+
+    def __init__(self, image_path=BANNER_IMAGE_PATH, store_path=BANNER_FILE_ID_PATH):
+        self.image_path = image_path
+        self.store_path = store_path
+        self._lock = None
+        self._lock_loop = None
+        self._file_id = None
+        self._loaded = False
+
+    @property
+    def file_id(self):
+        """The cached Telegram file_id, or None until the first upload"""
+        if not self._loaded:
+            self._file_id = self._load()
+            self._loaded = True
+        return self._file_id
+
+    async def send(self, send_photo, **kwargs):
+        """
+        Send the banner through a reply_photo/send_photo style callable.
+
+        Args:
+            send_photo (callable): Coroutine function accepting photo= plus the given keyword arguments
+            **kwargs: Passed through (caption, parse_mode, chat_id, ...)
+
+        Returns:
+            Message: The sent message
+
+        Raises:
+            FileNotFoundError: If the banner has to be uploaded and is missing
+            BadRequest: For anything but an unusable file_id, e.g. a caption
+                that fails to parse; the cached file_id is kept
+        """
+        file_id = self.file_id
+        if file_id:
+            try:
+                return await send_photo(photo=file_id, **kwargs)
+            except BadRequest as e:
+                if not _is_file_id_error(e):
+                    raise
+                # The id belongs to another bot or was purged, upload again
+                logger.warning(f"Cached banner file_id rejected, re-uploading: {e}")
+                self._forget(file_id)
+
+        async with self._upload_lock():
+            # Another sender may have finished the upload while we waited
+            if self._file_id:
+                return await send_photo(photo=self._file_id, **kwargs)
+
+            with open(self.image_path, 'rb') as photo:
+                message = await send_photo(photo=photo, **kwargs)
+
+            if message is not None and getattr(message, 'photo', None):
+                self._file_id = message.photo[-1].file_id
+                self._save(self._file_id)
+                logger.info("Banner uploaded, reusing its file_id from now on")
+            return message
+
+    def _upload_lock(self):
+        # A lock belongs to the loop it was first used on; the bot gets a
+        # new loop each time it is restarted, e.g. after regaining leadership
+        loop = asyncio.get_running_loop()
+        if self._lock_loop is not loop:
+            self._lock = asyncio.Lock()
+            self._lock_loop = loop
+        return self._lock
+
+    def _image_hash(self):
+        try:
+            with open(self.image_path, 'rb') as image:
+                return hashlib.sha256(image.read()).hexdigest()
+        except OSError:
+            return None
+
+    def _load(self):
+        try:
+            with open(self.store_path) as store:
+                data = json.load(store)
+        except (OSError, ValueError):
+            return None
+
+        if data.get("image_hash") != self._image_hash():
+            logger.info("Banner image changed, cached file_id discarded")
+            return None
+        return data.get("file_id")
+
+    def _save(self, file_id):
+        try:
+            tmp_path = f"{self.store_path}.tmp"
+            with open(tmp_path, 'w') as store:
+                json.dump({"file_id": file_id, "image_hash": self._image_hash()}, store)
+            os.replace(tmp_path, self.store_path)
+        except OSError as e:
+            logger.warning(f"Could not persist banner file_id: {e}")
+
+    def _forget(self, file_id):
+        if self._file_id == file_id:
+            self._file_id = None
+            try:
+                os.remove(self.store_path)
+            except OSError:
+                pass
+
+# Shared banner used by handlers and signal pushes
+banner = BannerCache()
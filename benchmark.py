@@ -0,0 +1,412 @@
+#!/usr/bin/env python3
+"""
+Load test and benchmark harness for the handlers and the signal pipeline.
+
+Everything runs against local stand-ins, never the live services:
+
+- a fake signals API serving a recorded (or synthesized) payload of
+  configurable size, and
+- a fake Telegram Bot API answering every call with a canned result,
+  optionally after a fixed delay.
+
+The real bot (handlers, cache, store, broadcast engine, PTB request
+stack) is pointed at them and driven with N simulated users. Each
+scenario reports p50/p95/p99 latency, operations per second and peak
+memory. Every run is appended to a JSON lines file and compared with
+the previous run with the same parameters, so regressions show up.
+
+Usage:
+    python benchmark.py --users 1000 --signals 500
+    python benchmark.py --payload recorded_response.json --fail-on-regression
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger("benchmark")
+
+BOT_TOKEN = "123456:BENCHMARK"
+BANNER_FILE_ID = "BENCHMARK_BANNER"
+
+# Metrics compared between runs: a regression is a p95 increase or a
+# throughput drop beyond the tolerance
+COMPARED = (("p95_ms", 1), ("ops_per_sec", -1))
+
+def synthesize_payload(count, now=None):
+    """
+    Build a signals API response with count records in the API's format.
+
+    Entry times are spread minute by minute from now on, in the API's
+    UTC+6 wall time.
+    """
+    now = now or datetime.now(timezone(timedelta(hours=6)))
+    assets = ("BRLUSD_otc", "USDPKR_otc", "USDINR_otc", "EUR/USD", "GBP/JPY")
+    records = [
+        {
+            "entrada": (now + timedelta(minutes=i + 1)).strftime("%H:%M"),
+            "ativos": assets[i % len(assets)],
+            "direcao_principal": "CALL" if i % 2 else "PUT",
+            "percentual": 75 + i % 20
+        }
+        for i in range(count)
+    ]
+    return json.dumps({"signals": records}).encode()
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _reply(self, body, content_type="application/json"):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def _serve(handler_class):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler_class)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name=handler_class.__name__, daemon=True).start()
+    return server
+
+def start_signals_server(payload):
+    """Serve payload (bytes) for every GET; returns the server"""
+    class SignalsHandler(_QuietHandler):
+        def do_GET(self):
+            self._reply(payload)
+
+    return _serve(SignalsHandler)
+
+def start_bot_api_server(latency=0.0):
+    """
+    Serve canned Bot API results for any method.
+
+    Args:
+        latency (float): Seconds each call takes, like a real round trip
+
+    Returns:
+        ThreadingHTTPServer: The server; server.calls counts calls by method
+    """
+    calls = {}
+    lock = threading.Lock()
+    user = {"id": 1, "is_bot": True, "first_name": "Benchmark", "username": "benchmark_bot"}
+    message = {
+        "message_id": 1, "date": int(time.time()),
+        "chat": {"id": 1, "type": "private", "first_name": "Benchmark"}, "text": "ok"
+    }
+    results = {
+        "getMe": user,
+        "sendMessage": message,
+        "sendPhoto": dict(message, photo=[
+            {"file_id": BANNER_FILE_ID, "file_unique_id": "banner", "width": 512, "height": 512}
+        ])
+    }
+
+    class BotApiHandler(_QuietHandler):
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            method = self.path.rsplit("/", 1)[-1]
+            with lock:
+                calls[method] = calls.get(method, 0) + 1
+            if latency:
+                time.sleep(latency)
+            body = {"ok": True, "result": results.get(method, True)}
+            self._reply(json.dumps(body).encode())
+
+        do_GET = do_POST
+
+    server = _serve(BotApiHandler)
+    server.calls = calls
+    return server
+
+def percentile(ordered, q):
+    """Nearest-rank percentile of an already sorted list"""
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+def summarize(latencies, elapsed, operations=None):
+    """
+    Args:
+        latencies (list): Seconds per operation
+        elapsed (float): Wall time of the whole scenario
+        operations (int): Operations done, defaults to len(latencies)
+
+    Returns:
+        dict: count, p50/p95/p99 in ms, ops_per_sec and peak RSS in KB
+    """
+    ordered = sorted(latencies)
+    operations = len(ordered) if operations is None else operations
+    to_ms = lambda value: round(value * 1000, 3) if value is not None else None
+    return {
+        "count": operations,
+        "p50_ms": to_ms(percentile(ordered, 0.50)),
+        "p95_ms": to_ms(percentile(ordered, 0.95)),
+        "p99_ms": to_ms(percentile(ordered, 0.99)),
+        "ops_per_sec": round(operations / elapsed, 1) if elapsed > 0 else None,
+        # ru_maxrss is in KB on Linux; it only grows, so it is the peak so far
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    }
+
+async def drive(coroutines, concurrency):
+    """
+    Run coroutine factories with bounded concurrency.
+
+    Returns:
+        tuple: (latencies in seconds, elapsed seconds, number of errors)
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def timed(factory):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await factory()
+            except Exception as e:
+                errors += 1
+                logger.debug(f"Operation failed: {e}")
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(timed(factory) for factory in coroutines))
+    return latencies, time.perf_counter() - started, errors
+
+def _user(user_id):
+    return {"id": user_id, "is_bot": False, "first_name": f"User{user_id}"}
+
+def _message(update_id, user_id, text, command=False):
+    message = {
+        "message_id": update_id, "date": int(time.time()), "from": _user(user_id),
+        "chat": {"id": user_id, "type": "private", "first_name": f"User{user_id}"}, "text": text
+    }
+    if command:
+        message["entities"] = [{"offset": 0, "length": len(text.split()[0]), "type": "bot_command"}]
+    return {"update_id": update_id, "message": message}
+
+def _callback(update_id, user_id, data):
+    message = _message(update_id, user_id, "menu")["message"]
+    return {"update_id": update_id, "callback_query": {
+        "id": str(update_id), "from": _user(user_id), "message": message,
+        "chat_instance": str(user_id), "data": data
+    }}
+
+async def run_scenarios(args, bot_api_url):
+    """Run every scenario against the stand-ins and return their summaries"""
+    # Imported late: configuration is read from the environment set up in main()
+    from telegram import Update
+    from bot import setup_bot
+    from broadcast import BroadcastEngine
+    from metrics import REGISTRY, sample_value
+    from signal_cache import signal_cache
+    from storage import store
+    from utils import fetch_trading_signals, format_signal_message
+
+    application = setup_bot(token=BOT_TOKEN, base_url=bot_api_url)
+    await application.initialize()
+    bot = application.bot
+    results = {}
+
+    def handler_errors():
+        # PTB hands handler exceptions to the error handler, so count them from the metrics
+        return sample_value(REGISTRY.collect(), "bot_handler_errors_total")
+
+    async def scenario(name, coroutines, operations=None):
+        errors_before = handler_errors()
+        latencies, elapsed, errors = await drive(coroutines, args.concurrency)
+        errors += handler_errors() - errors_before
+        results[name] = dict(summarize(latencies, elapsed, operations), errors=errors)
+        logger.info(f"{name}: {json.dumps(results[name])}")
+
+    try:
+        await scenario("signal_pipeline", [
+            lambda: fetch_trading_signals(raise_on_error=True) for _ in range(args.fetches)
+        ])
+        await signal_cache.refresh()
+        upcoming = len(signal_cache.peek())
+        logger.info(f"Signal snapshot holds {upcoming} upcoming signals")
+
+        users = list(range(1_000_001, 1_000_001 + args.users))
+        for user_id in users:
+            store.add_user(user_id)
+
+        def process(payload):
+            return lambda: application.process_update(Update.de_json(payload, bot))
+
+        await scenario("signals_command", [
+            process(_message(i, user_id, "/signals", command=True)) for i, user_id in enumerate(users)
+        ])
+        await scenario("button_callback", [
+            process(_callback(i, user_id, "get_signals")) for i, user_id in enumerate(users)
+        ])
+
+        keys = [f"BENCHKEY{i:07d}" for i in range(args.users)]
+        store.add_keys(keys)
+        newcomers = range(2_000_001, 2_000_001 + args.users)
+        await scenario("process_potential_key", [
+            process(_message(i, user_id, key)) for i, (user_id, key) in enumerate(zip(newcomers, keys))
+        ])
+
+        # Telegram's limits are the bottleneck in production; lift them to
+        # measure the engine itself
+        engine = BroadcastEngine(rate=args.broadcast_rate, per_chat_interval=0)
+        text = format_signal_message(signal_cache.peek()[0]) if upcoming else "Benchmark"
+        send_latencies = []
+
+        async def send(chat_id):
+            started = time.perf_counter()
+            await bot.send_message(chat_id=chat_id, text=text, parse_mode="Markdown")
+            send_latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        result = await engine.broadcast([(chat_id, send) for chat_id in users])
+        results["broadcast"] = dict(
+            summarize(send_latencies, time.perf_counter() - started, result.delivered),
+            errors=result.failed
+        )
+        logger.info(f"broadcast: {json.dumps(results['broadcast'])}")
+    finally:
+        await application.shutdown()
+    return results
+
+def _git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def load_previous(path, params):
+    """The last stored run with the same parameters, or None"""
+    if not os.path.exists(path):
+        return None
+    previous = None
+    with open(path) as results_file:
+        for line in results_file:
+            line = line.strip()
+            if line:
+                run = json.loads(line)
+                if run.get("params") == params:
+                    previous = run
+    return previous
+
+def compare(previous, current, tolerance):
+    """
+    Returns:
+        list: (scenario, metric, before, after) for every regression beyond tolerance
+    """
+    regressions = []
+    for name, stats in current.items():
+        before_stats = previous.get(name)
+        if not before_stats:
+            continue
+        for metric, direction in COMPARED:
+            before, after = before_stats.get(metric), stats.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before * direction
+            if change > tolerance:
+                regressions.append((name, metric, before, after))
+    return regressions
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--users", type=int, default=500, help="Simulated users per scenario")
+    parser.add_argument("--signals", type=int, default=200, help="Records in the synthesized payload")
+    parser.add_argument("--payload", help="Serve this recorded API response instead of a synthesized one")
+    parser.add_argument("--fetches", type=int, default=50, help="Signal pipeline fetches")
+    parser.add_argument("--concurrency", type=int, default=64, help="Operations in flight at once")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="Seconds each fake Bot API call takes")
+    parser.add_argument("--broadcast-rate", type=float, default=10000, help="Broadcast rate limit, msg/s")
+    parser.add_argument("--results", default="benchmark_results.jsonl", help="JSON lines file runs are appended to")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Relative change reported as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit with status 1 on regressions")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(
+        level=logging.WARNING,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        stream=sys.stdout
+    )
+    logger.setLevel(logging.INFO)
+
+    if args.payload:
+        with open(args.payload, "rb") as payload_file:
+            payload = payload_file.read()
+    else:
+        payload = synthesize_payload(args.signals)
+    signals_server = start_signals_server(payload)
+    bot_api_server = start_bot_api_server(args.api_latency)
+
+    workdir = tempfile.mkdtemp(prefix="bot-benchmark-")
+    os.environ["SIGNALS_API_URL"] = f"http://127.0.0.1:{signals_server.server_port}/signals"
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'benchmark.db')}"
+    os.environ["BANNER_FILE_ID_PATH"] = os.path.join(workdir, "banner_file_id.json")
+    os.environ.setdefault("BANNER_IMAGE_PATH", os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "static", "images", "billionaire_ai_bot.png"
+    ))
+    os.environ["SIGNAL_CACHE_TTL"] = "3600"
+    bot_api_url = f"http://127.0.0.1:{bot_api_server.server_port}/bot"
+
+    try:
+        results = asyncio.run(run_scenarios(args, bot_api_url))
+    finally:
+        signals_server.shutdown()
+        bot_api_server.shutdown()
+
+    params = {
+        "users": args.users, "signals": None if args.payload else args.signals,
+        "payload": os.path.basename(args.payload) if args.payload else None, "payload_bytes": len(payload),
+        "fetches": args.fetches, "concurrency": args.concurrency,
+        "api_latency": args.api_latency, "broadcast_rate": args.broadcast_rate
+    }
+    previous = load_previous(args.results, params)
+    run = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "revision": _git_revision(),
+        "python": sys.version.split()[0],
+        "params": params,
+        "bot_api_calls": dict(bot_api_server.calls),
+        "scenarios": results
+    }
+    with open(args.results, "a") as results_file:
+        results_file.write(json.dumps(run) + "\n")
+
+    print(f"\n{'scenario':<24}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'ops/s':>10}{'errors':>8}")
+    for name, stats in results.items():
+        print(f"{name:<24}{stats['count']:>8}{stats['p50_ms'] or 0:>10.2f}{stats['p95_ms'] or 0:>10.2f}"
+              f"{stats['p99_ms'] or 0:>10.2f}{stats['ops_per_sec'] or 0:>10.1f}{stats['errors']:>8}")
+    print(f"Peak RSS: {max(stats['max_rss_kb'] for stats in results.values()) / 1024:.1f} MB")
+
+    if previous is None:
+        print(f"\nNo previous run with these parameters in {args.results}")
+        return 0
+    regressions = compare(previous["scenarios"], results, args.tolerance)
+    print(f"\nCompared with {previous['timestamp']} ({previous.get('revision')}): "
+          f"{len(regressions)} regressions beyond {args.tolerance:.0%}")
+    for name, metric, before, after in regressions:
+        print(f"  {name} {metric}: {before} -> {after}")
+    return 1 if regressions and args.fail_on_regression else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,16 +1,23 @@
+import asyncio
 import logging
+import threading
+import time
 from telegram import Update
+from telegram.request import HTTPXRequest
 from telegram.ext import (
-    Updater,
+    Application,
     CommandHandler,
     CallbackQueryHandler,
     MessageHandler,
-    Filters
+    filters
 )
 from handlers import (
     start_command,
     help_command,
     signals_command,
+    subscribe_command,
+    unsubscribe_command,
+    subscriptions_command,
     button_callback,
     generate_keys_command,
     list_keys_command,
@@ -18,55 +25,198 @@ from handlers import (
     admin_panel,
     error_handler
 )
-from config import BOT_TOKEN
+from signal_poller import poll_signals
+from signal_feeds import signal_aggregator
+from expiry import expiry_scheduler
+from subscriptions import subscriptions
+from webhook import update_queue
+from metrics import REGISTRY, TELEGRAM_REQUESTS, TELEGRAM_LATENCY, instrument_handler
+from storage import METRICS_SNAPSHOT, store
+from config import (
+    BOT_TOKEN,
+    BOT_CONCURRENT_UPDATES,
+    SIGNAL_POLL_INTERVAL,
+    METRICS_PUBLISH_INTERVAL,
+    WEBHOOK_URL,
+    WEBHOOK_PATH,
+    WEBHOOK_SECRET,
+    WEBHOOK_RELAY_INTERVAL
+)
 
 logger = logging.getLogger(__name__)
 
-def setup_bot():
+class InstrumentedRequest(HTTPXRequest):
+    """HTTPXRequest that counts and times every Bot API call, e.g. sendMessage"""
+
+    async def do_request(self, url, *args, **kwargs):
+        method = url.rsplit("/", 1)[-1]
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            status_code, payload = await super().do_request(url, *args, **kwargs)
+            outcome = "ok" if status_code == 200 else str(status_code)
+            return status_code, payload
+        finally:
+            TELEGRAM_REQUESTS.inc(method=method, outcome=outcome)
+            TELEGRAM_LATENCY.observe(time.perf_counter() - started, method=method)
+
+async def publish_metrics(context):
+    """Job callback: copy this process's metrics to the store for the other workers"""
+    try:
+        await asyncio.to_thread(store.put_state, METRICS_SNAPSHOT, REGISTRY.collect())
+    except Exception as e:
+        logger.error(f"Error publishing metrics: {e}")
+
+async def take_relayed_updates(context):
+    """Job callback: queue the webhook updates other workers relayed through the store"""
+    try:
+        await update_queue.take_relayed(store)
+    except Exception as e:
+        logger.error(f"Error taking relayed updates: {e}")
+
+# Set while the bot is connected to Telegram, for the readiness probe
+connected = threading.Event()
+
+async def start_background_tasks(application):
+    """Load the subscription index and pending expiry notices once the bot is up"""
+    try:
+        await subscriptions.load()
+    except Exception as e:
+        # Lookups retry the load through refresh()
+        logger.error(f"Error loading subscriptions: {e}")
+    await expiry_scheduler.start(application.bot)
+    connected.set()
+
+async def stop_background_tasks(application):
+    """Stop the expiry scheduler and close pooled connections to the signal feeds"""
+    connected.clear()
+    await expiry_scheduler.stop()
+    await signal_aggregator.aclose()
+
+def setup_bot(token=BOT_TOKEN, base_url=None):
     """
     Set up and configure the Telegram bot.
     
+    Args:
+        token (str): Bot token
+        base_url (str): Bot API base URL, e.g. a local stand-in; Telegram's by default
+    
     Returns:
-        Updater: The configured bot updater
+        Application: The configured bot application
     """
-    if not BOT_TOKEN:
+    if not token:
         logger.error("No bot token provided! Bot cannot start.")
         return None
+    if WEBHOOK_URL and not WEBHOOK_SECRET:
+        logger.error("WEBHOOK_URL is set without WEBHOOK_SECRET! Bot cannot start.")
+        return None
     
-    # Create the Updater and pass it your bot's token
-    updater = Updater(BOT_TOKEN)
-    
-    # Get the dispatcher to register handlers
-    dispatcher = updater.dispatcher
+    # Create the Application; updates from different users are handled
+    # concurrently on one event loop
+    builder = (
+        Application.builder()
+        .token(token)
+        .request(InstrumentedRequest(connection_pool_size=256))
+        .concurrent_updates(BOT_CONCURRENT_UPDATES)
+        .post_init(start_background_tasks)
+        .post_shutdown(stop_background_tasks)
+    )
+    if base_url:
+        builder = builder.base_url(base_url)
+    application = builder.build()
     
     # Register command handlers
-    dispatcher.add_handler(CommandHandler("start", start_command))
-    dispatcher.add_handler(CommandHandler("help", help_command))
-    dispatcher.add_handler(CommandHandler("signals", signals_command))
+    application.add_handler(CommandHandler("start", instrument_handler(start_command)))
+    application.add_handler(CommandHandler("help", instrument_handler(help_command)))
+    application.add_handler(CommandHandler("signals", instrument_handler(signals_command)))
+    application.add_handler(CommandHandler("subscribe", instrument_handler(subscribe_command)))
+    application.add_handler(CommandHandler("unsubscribe", instrument_handler(unsubscribe_command)))
+    application.add_handler(CommandHandler("subscriptions", instrument_handler(subscriptions_command)))
     
     # Add message handler for authentication keys
-    dispatcher.add_handler(MessageHandler(Filters.text & ~Filters.command, process_potential_key))
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, instrument_handler(process_potential_key)))
     
     # Admin commands
-    dispatcher.add_handler(CommandHandler("admin", admin_panel))
-    dispatcher.add_handler(CommandHandler("generate_keys", generate_keys_command))
-    dispatcher.add_handler(CommandHandler("list_keys", list_keys_command))
+    application.add_handler(CommandHandler("admin", instrument_handler(admin_panel)))
+    application.add_handler(CommandHandler("generate_keys", instrument_handler(generate_keys_command)))
+    application.add_handler(CommandHandler("list_keys", instrument_handler(list_keys_command)))
     
     # Register callback query handler for buttons
-    dispatcher.add_handler(CallbackQueryHandler(button_callback))
+    application.add_handler(CallbackQueryHandler(instrument_handler(button_callback)))
     
     # Register error handler
-    dispatcher.add_error_handler(error_handler)
+    application.add_error_handler(error_handler)
     
+    # Poll the signals API in the background and push new signals
+    if SIGNAL_POLL_INTERVAL > 0:
+        application.job_queue.run_repeating(
+            poll_signals,
+            interval=SIGNAL_POLL_INTERVAL,
+            first=0,
+            name="signal_poller"
+        )
+    
+    application.job_queue.run_repeating(
+        publish_metrics,
+        interval=METRICS_PUBLISH_INTERVAL,
+        first=METRICS_PUBLISH_INTERVAL,
+        name="metrics_publisher"
+    )
+
+    if WEBHOOK_URL:
+        application.job_queue.run_repeating(
+            take_relayed_updates,
+            interval=WEBHOOK_RELAY_INTERVAL,
+            first=0,
+            name="webhook_relay"
+        )
+
     logger.info("Bot setup completed!")
-    return updater
+    return application
+
+async def run_webhook(application, stop, updates=update_queue):
+    """
+    Run the bot on updates posted to the Flask webhook route instead of polling.
+
+    Mirrors the lifecycle of Application.run_polling(), minus the updater:
+    updates come in through the UpdateQueue until stop is set.
+
+    Args:
+        application (Application): The configured bot application
+        stop (asyncio.Event): Set to shut the bot down
+        updates (UpdateQueue): Queue the webhook route feeds
+    """
+    await application.initialize()
+    try:
+        if application.post_init:
+            await application.post_init(application)
+        await application.start()
+        updates.start(application)
+        try:
+            await application.bot.set_webhook(
+                f"{WEBHOOK_URL.rstrip('/')}{WEBHOOK_PATH}",
+                secret_token=WEBHOOK_SECRET,
+                allowed_updates=Update.ALL_TYPES
+            )
+            logger.info(f"Webhook set to {WEBHOOK_URL}{WEBHOOK_PATH}")
+        except Exception as e:
+            # Keep serving, e.g. recorded updates POSTed locally
+            logger.error(f"Error setting webhook: {e}")
+
+        await stop.wait()
+
+        await updates.stop()
+        await application.stop()
+    finally:
+        if application.post_shutdown:
+            await application.post_shutdown(application)
+        await application.shutdown()
 
 def run_bot():
     """Start the bot"""
-    updater = setup_bot()
-    if updater:
+    application = setup_bot()
+    if application:
         logger.info("Starting bot...")
-        updater.start_polling()
-        updater.idle()
+        application.run_polling(allowed_updates=Update.ALL_TYPES)
     else:
-        logger.error("Bot setup failed!")
\ No newline at end of file
+        logger.error("Bot setup failed!")
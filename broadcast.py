@@ -0,0 +1,276 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import timedelta
+from telegram.error import RetryAfter, TimedOut, NetworkError, Forbidden, BadRequest
+from logging_setup import SampledLogger
+from metrics import BROADCAST_MESSAGES, BROADCAST_THROUGHPUT, QUEUE_DEPTH
+from config import (
+    BROADCAST_RATE,
+    BROADCAST_PER_CHAT_INTERVAL,
+    BROADCAST_WORKERS,
+    BROADCAST_MAX_RETRIES,
+    BROADCAST_MAX_FLOOD_WAIT
+)
+
+logger = logging.getLogger(__name__)
+# Per-chat outcomes repeat thousands of times in a large broadcast
+dropped_chat_log = SampledLogger(logger)
+transient_error_log = SampledLogger(logger)
+
+class TokenBucket:
+    """
+    Token bucket enforcing a global send rate across all broadcast workers.
+
+    A 429 from Telegram pauses the whole bucket for the requested
+    retry-after period, since flood limits apply to the bot as a whole.
+    """
+
+    def __init__(self, rate, capacity=None):
+        """
+        Args:
+            rate (float): Tokens added per second
+            capacity (float): Maximum burst size, defaults to one second of tokens
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+
+    async def acquire(self):
+        """Wait until a token is available and take it"""
+        while True:
+            now = time.monotonic()
+            if now < self._paused_until:
+                wait = self._paused_until - now
+            else:
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds):
+        """Stop handing out tokens for the given number of seconds"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0
+        self._updated_at = self._paused_until
+
+@dataclass
+class BroadcastResult:
+    """Progress and outcome of a broadcast"""
+    total: int
+    delivered: int = 0
+    failed: int = 0
+    retried: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+    finished_at: float = None
+    failed_chats: list = field(default_factory=list)
+
+    @property
+    def done(self):
+        return self.delivered + self.failed
+
+    @property
+    def elapsed(self):
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    @property
+    def rate(self):
+        """Messages delivered per second"""
+        return self.delivered / self.elapsed if self.elapsed > 0 else 0.0
+
+class BroadcastEngine:
+    """
+    Delivers messages to many chats within Telegram's rate limits.
+
+    - A shared token bucket caps the global send rate.
+    - Each chat is owned by exactly one worker, so messages to the same
+      chat are sent in order. Every send reserves the chat's next slot
+      first, so concurrent broadcasts also keep the per-chat interval.
+    - RetryAfter (429) pauses every worker and retries the message until
+      max_flood_wait has passed; timeouts and network errors are retried
+      up to max_retries times with backoff; blocked or missing chats fail
+      immediately.
+    """
+
+    def __init__(self, rate=BROADCAST_RATE, per_chat_interval=BROADCAST_PER_CHAT_INTERVAL,
+                 workers=BROADCAST_WORKERS, max_retries=BROADCAST_MAX_RETRIES,
+                 max_flood_wait=BROADCAST_MAX_FLOOD_WAIT):
+        self.bucket = TokenBucket(rate)
+        self.per_chat_interval = per_chat_interval
+        self.workers = max(1, workers)
+        self.max_retries = max_retries
+        self.max_flood_wait = max_flood_wait
+        # chat_id -> earliest time the next message to the chat may be sent
+        self._next_slot = OrderedDict()
+        self.pending = 0
+
+    async def broadcast(self, jobs, progress=None, progress_every=100):
+        """
+        Send a batch of messages and wait for the batch to finish.
+
+        Args:
+            jobs (iterable): (chat_id, send) pairs, await send(chat_id) performs the API call
+            progress (callable): Called with the BroadcastResult as messages complete
+            progress_every (int): Number of completed messages between progress calls
+
+        Returns:
+            BroadcastResult: Delivered and failed counts
+        """
+        shards = self._partition(jobs)
+        result = BroadcastResult(total=sum(len(shard) for shard in shards))
+        if result.total == 0:
+            result.finished_at = time.monotonic()
+            return result
+
+        self.pending += result.total
+        try:
+            await asyncio.gather(*(
+                self._run_worker(shard, result, progress, progress_every)
+                for shard in shards if shard
+            ))
+        finally:
+            self.pending -= result.total - result.done
+
+        result.finished_at = time.monotonic()
+        BROADCAST_THROUGHPUT.set(result.rate)
+        logger.info(
+            f"Broadcast finished: {result.delivered} delivered, {result.failed} failed "
+            f"in {result.elapsed:.1f}s ({result.rate:.1f} msg/s)"
+        )
+        if progress:
+            progress(result)
+        return result
+
+    async def broadcast_message(self, bot, chat_ids, text, parse_mode='Markdown', **kwargs):
+        """
+        Send the same text message to every chat.
+
+        Returns:
+            BroadcastResult: Delivered and failed counts
+        """
+        async def send(chat_id):
+            await bot.send_message(chat_id=chat_id, text=text, parse_mode=parse_mode)
+
+        return await self.broadcast(((chat_id, send) for chat_id in chat_ids), **kwargs)
+
+    def _partition(self, jobs):
+        """
+        Split jobs into per-worker shards.
+
+        Jobs for one chat always land on the same worker, and each
+        worker's shard is interleaved in rounds (every chat's first
+        message, then every chat's second message, ...) so per-chat
+        spacing rarely stalls the worker.
+        """
+        per_chat = [OrderedDict() for _ in range(self.workers)]
+        for chat_id, send in jobs:
+            per_chat[hash(chat_id) % self.workers].setdefault(chat_id, []).append(send)
+
+        shards = []
+        for chats in per_chat:
+            shard = []
+            depth = max((len(sends) for sends in chats.values()), default=0)
+            for round_index in range(depth):
+                for chat_id, sends in chats.items():
+                    if round_index < len(sends):
+                        shard.append((chat_id, sends[round_index]))
+            shards.append(shard)
+        return shards
+
+    async def _run_worker(self, shard, result, progress, progress_every):
+        for chat_id, send in shard:
+            delivered, retries = await self._deliver(chat_id, send)
+
+            result.retried += retries
+            self.pending -= 1
+            if delivered:
+                result.delivered += 1
+                BROADCAST_MESSAGES.inc(outcome="delivered")
+            else:
+                result.failed += 1
+                result.failed_chats.append(chat_id)
+                BROADCAST_MESSAGES.inc(outcome="failed")
+
+            if progress and result.done % progress_every == 0:
+                try:
+                    progress(result)
+                except Exception as e:
+                    logger.warning(f"Broadcast progress callback failed: {e}")
+
+    async def _deliver(self, chat_id, send):
+        """
+        Send one message honouring the global and per-chat limits.
+
+        Returns:
+            tuple: (delivered, retries)
+        """
+        retries = 0
+        failures = 0
+        flood_deadline = None
+        while True:
+            wait = self._reserve_slot(chat_id) - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            await self.bucket.acquire()
+            try:
+                await send(chat_id)
+                return True, retries
+            except RetryAfter as e:
+                retry_after = e.retry_after
+                if isinstance(retry_after, timedelta):
+                    retry_after = retry_after.total_seconds()
+                logger.warning(f"Flood limit hit, pausing broadcast for {retry_after}s")
+                self.bucket.pause(retry_after)
+                now = time.monotonic()
+                if flood_deadline is None:
+                    flood_deadline = now + self.max_flood_wait
+                if now + retry_after > flood_deadline:
+                    logger.warning(f"Giving up on {chat_id} after waiting on flood limits for too long")
+                    return False, retries
+            except (Forbidden, BadRequest) as e:
+                dropped_chat_log.info("Dropping chat %s from broadcast: %s", chat_id, e)
+                return False, retries
+            except (TimedOut, NetworkError) as e:
+                transient_error_log.warning("Transient error sending to %s: %s", chat_id, e)
+                failures += 1
+                if failures > self.max_retries:
+                    return False, retries
+                await asyncio.sleep(min(2 ** (failures - 1), 30))
+            except Exception as e:
+                logger.error(f"Unexpected error sending to {chat_id}: {e}")
+                return False, retries
+
+            retries += 1
+
+    def _reserve_slot(self, chat_id):
+        """
+        Claim the chat's next send slot.
+
+        Reading and moving the slot happen without yielding to the event
+        loop, so two broadcasts can never claim the same slot.
+
+        Returns:
+            float: Monotonic time the caller may send at
+        """
+        now = time.monotonic()
+        slot = max(now, self._next_slot.get(chat_id, now))
+        self._next_slot[chat_id] = slot + self.per_chat_interval
+        self._next_slot.move_to_end(chat_id)
+        # Forget chats whose next slot has passed, oldest reservations first
+        while self._next_slot:
+            oldest_chat, next_slot = next(iter(self._next_slot.items()))
+            if next_slot > now:
+                break
+            del self._next_slot[oldest_chat]
+        return slot
+
+# Shared engine so concurrent broadcasts respect the same global limit
+broadcaster = BroadcastEngine()
+QUEUE_DEPTH.set_function(lambda: broadcaster.pending, queue="broadcast")
@@ -1,17 +1,25 @@
 import os
+import json
 import logging
 
-# Configure logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-)
 logger = logging.getLogger(__name__)
 
+# Logging (see logging_setup.py). LOG_LEVEL applies to every module unless
+# LOG_LEVELS overrides it, e.g. "signal_schema=DEBUG,httpx=WARNING".
+# LOG_FORMAT is "json" for structured records or "text". Repetitive
+# messages on hot paths are logged once every LOG_SAMPLE_EVERY times.
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+LOG_LEVELS = os.environ.get("LOG_LEVELS", "httpx=WARNING,httpcore=WARNING,apscheduler=WARNING")
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json")
+LOG_SAMPLE_EVERY = int(os.environ.get("LOG_SAMPLE_EVERY", "100"))
+
 # Bot configuration
 BOT_TOKEN = os.environ.get("TELEGRAM_BOT_TOKEN")
 if not BOT_TOKEN:
     logger.error("No TELEGRAM_BOT_TOKEN found in environment variables!")
+
+# Maximum number of updates processed concurrently on the bot's event loop
+BOT_CONCURRENT_UPDATES = int(os.environ.get("BOT_CONCURRENT_UPDATES", "256"))
     
 # Channel to verify membership
 CHANNEL_USERNAME = os.environ.get("CHANNEL_USERNAME", "-1002001615430")
@@ -20,6 +28,74 @@ CHANNEL_USERNAME = os.environ.get("CHANNEL_USERNAME", "-1002001615430")
 SIGNALS_API_URL = os.environ.get("SIGNALS_API_URL", "https://alltradingapi.com/signal_list_gen_vip/qx_signal.js?start=00:00&end=23:00&duration=30&currency_pairs=BRLUSD_otc,USDPKR_otc,USDINR_otc&operation_mode=normal&percentage_min=75&apply_filter=1&is_separate=1&backtest_advanced=off")
 SIGNALS_API_KEY = os.environ.get("SIGNALS_API_KEY")
 
+# Signals API client (see signals_client.py). Each fetch, retries included,
+# must finish within SIGNALS_DEADLINE seconds. After SIGNALS_BREAKER_THRESHOLD
+# consecutive failures calls fail fast for SIGNALS_BREAKER_RESET seconds.
+SIGNALS_CONNECT_TIMEOUT = float(os.environ.get("SIGNALS_CONNECT_TIMEOUT", "5"))
+SIGNALS_READ_TIMEOUT = float(os.environ.get("SIGNALS_READ_TIMEOUT", "10"))
+SIGNALS_DEADLINE = float(os.environ.get("SIGNALS_DEADLINE", "15"))
+SIGNALS_MAX_RETRIES = int(os.environ.get("SIGNALS_MAX_RETRIES", "2"))
+SIGNALS_POOL_SIZE = int(os.environ.get("SIGNALS_POOL_SIZE", "10"))
+SIGNALS_BREAKER_THRESHOLD = int(os.environ.get("SIGNALS_BREAKER_THRESHOLD", "5"))
+SIGNALS_BREAKER_RESET = float(os.environ.get("SIGNALS_BREAKER_RESET", "60"))
+
+# Webhook mode: set WEBHOOK_URL to the public base URL of this app (e.g.
+# https://bot.example.com) to receive updates at WEBHOOK_PATH instead of
+# long polling. Updates wait in a queue of at most WEBHOOK_QUEUE_SIZE until
+# one of WEBHOOK_WORKERS handles them; when it is full Telegram is told to
+# retry later. WEBHOOK_SECRET is required in webhook mode: Telegram echoes
+# it back on every POST and requests without it are refused, since anyone
+# who knows WEBHOOK_PATH could otherwise post forged updates. It may hold
+# 1-256 characters out of A-Z, a-z, 0-9, _ and -.
+# Telegram may POST to any web worker or instance, but only the leader runs
+# the bot: the others leave updates in the shared store, and the leader
+# picks them up every WEBHOOK_RELAY_INTERVAL seconds. With several workers
+# or autoscaled instances DATABASE_URL must point at a shared database.
+WEBHOOK_URL = os.environ.get("WEBHOOK_URL")
+WEBHOOK_PATH = "/telegram/webhook"
+WEBHOOK_SECRET = os.environ.get("WEBHOOK_SECRET")
+WEBHOOK_QUEUE_SIZE = int(os.environ.get("WEBHOOK_QUEUE_SIZE", "1000"))
+WEBHOOK_WORKERS = int(os.environ.get("WEBHOOK_WORKERS", "64"))
+WEBHOOK_DEDUP_SIZE = int(os.environ.get("WEBHOOK_DEDUP_SIZE", "10000"))
+WEBHOOK_RELAY_INTERVAL = float(os.environ.get("WEBHOOK_RELAY_INTERVAL", "1"))
+
+# Signal cache configuration (seconds)
+# Fresh signals are served straight from memory for SIGNAL_CACHE_TTL seconds.
+# After that the last good list is still served for up to SIGNAL_CACHE_MAX_STALE
+# seconds while a single background refresh runs.
+SIGNAL_CACHE_TTL = int(os.environ.get("SIGNAL_CACHE_TTL", "30"))
+SIGNAL_CACHE_MAX_STALE = int(os.environ.get("SIGNAL_CACHE_MAX_STALE", "300"))
+
+# Background poller interval (seconds), keep it below SIGNAL_CACHE_TTL so
+# handlers always read a fresh snapshot. Set to 0 to disable polling.
+SIGNAL_POLL_INTERVAL = int(os.environ.get("SIGNAL_POLL_INTERVAL", "20"))
+
+# Seconds the in-memory subscription routing index may lag behind changes
+# made by other processes before it is reloaded from the database
+SUBSCRIPTION_RELOAD_INTERVAL = int(os.environ.get("SUBSCRIPTION_RELOAD_INTERVAL", "300"))
+
+# Expiry notices go out SIGNAL_EXPIRY_DELAY seconds after a signal's entry
+# time. Notices that are more than SIGNAL_EXPIRY_GRACE seconds overdue when
+# the bot starts are dropped instead of sent late.
+SIGNAL_EXPIRY_DELAY = int(os.environ.get("SIGNAL_EXPIRY_DELAY", "120"))
+SIGNAL_EXPIRY_GRACE = int(os.environ.get("SIGNAL_EXPIRY_GRACE", "600"))
+
+# Number of rendered signal messages kept in memory
+SIGNAL_MESSAGE_CACHE_SIZE = int(os.environ.get("SIGNAL_MESSAGE_CACHE_SIZE", "1024"))
+
+# Broadcast limits (Telegram allows roughly 30 msg/s overall and 1 msg/s per chat)
+BROADCAST_RATE = float(os.environ.get("BROADCAST_RATE", "28"))
+BROADCAST_PER_CHAT_INTERVAL = float(os.environ.get("BROADCAST_PER_CHAT_INTERVAL", "1.0"))
+BROADCAST_WORKERS = int(os.environ.get("BROADCAST_WORKERS", "8"))
+BROADCAST_MAX_RETRIES = int(os.environ.get("BROADCAST_MAX_RETRIES", "3"))
+# Flood waits (429 RetryAfter) don't count as retries; a message is given up
+# once it would wait on them for more than BROADCAST_MAX_FLOOD_WAIT seconds
+BROADCAST_MAX_FLOOD_WAIT = float(os.environ.get("BROADCAST_MAX_FLOOD_WAIT", "300"))
+
+# Banner image attached to every signal and the file where its Telegram file_id is kept
+BANNER_IMAGE_PATH = os.environ.get("BANNER_IMAGE_PATH", "static/images/billionaire_ai_bot.png")
+BANNER_FILE_ID_PATH = os.environ.get("BANNER_FILE_ID_PATH", "banner_file_id.json")
+
 # Master private key that validates user private keys
 MASTER_KEY = os.environ.get("MASTER_KEY", "master_trading_key_2023")
 
@@ -27,23 +103,59 @@ MASTER_KEY = os.environ.get("MASTER_KEY", "master_trading_key_2023")
 SOURCE_TIMEZONE = "UTC+6:00"
 TARGET_TIMEZONE = "Asia/Kolkata"  # GMT+5:30
 
+# Which API fields hold the entry time, asset and direction, as JSON, e.g.
+# {"time": "entrada", "asset": "ativos", "direction": "direcao_principal"}.
+# When unset the mapping is detected from each response (see signal_schema.py).
+SIGNAL_FIELD_MAPPING = json.loads(os.environ.get("SIGNAL_FIELD_MAPPING") or "null")
+
+# Several signal feeds, as a JSON list fetched concurrently and merged, e.g.
+# [{"name": "otc-30", "url": "https://...", "deadline": 8},
+#  {"name": "otc-60", "url": "https://...", "timezone": "UTC-3:00", "mapping": {"time": "hora"}}].
+# Each feed may set api_key, deadline (seconds), timezone and mapping; the
+# defaults are the SIGNALS_* settings above. When unset SIGNALS_API_URL is
+# the only feed (see signal_feeds.py).
+SIGNAL_SOURCES = json.loads(os.environ.get("SIGNAL_SOURCES") or "null")
+
+# What to do when feeds disagree on the direction of a signal for the same
+# asset and time: "drop" discards it, "first" keeps the feed listed first,
+# "majority" keeps the direction most feeds agree on (ties are dropped)
+SIGNAL_CONFLICT_POLICY = os.environ.get("SIGNAL_CONFLICT_POLICY", "drop")
+
 # Server configuration
 SERVER_HOST = "0.0.0.0"
 FLASK_PORT = 5000
 BOT_PORT = 8000
 
-# In-memory storage for authenticated users
-AUTHENTICATED_USERS = set()
+# Database for keys and authenticated users (see storage.py). SQLite by
+# default; set DATABASE_URL to a Postgres URL to share state across hosts.
+DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///bot.db")
+
+# Only one process (e.g. one of several gunicorn workers) runs the Telegram
+# poller. It holds a lease in the database for LEADER_LEASE_TTL seconds and
+# renews it every LEADER_RENEW_INTERVAL seconds; if it dies another process
+# takes over once the lease expires.
+LEADER_LEASE_TTL = int(os.environ.get("LEADER_LEASE_TTL", "30"))
+LEADER_RENEW_INTERVAL = int(os.environ.get("LEADER_RENEW_INTERVAL", "10"))
 
-# Collection of valid single-use keys
-VALID_KEYS = [
+# Seconds between copies of the bot's metrics published for /metrics and
+# /status on the workers that don't run the bot
+METRICS_PUBLISH_INTERVAL = int(os.environ.get("METRICS_PUBLISH_INTERVAL", "15"))
+
+# Single-use keys seeded into the key store on first start
+SEED_KEYS = [
     "VIPTRADER123", "SIGNALVIP456", "BINARYPRO789", "TRADERVIP101", 
     "EXPERTKEY202", "SIGNALKING303", "VIPACCESS404", "MASTERKEY505",
     "TRADEBOSS606", "SIGNALPRO707"
 ]
 
-# Keys that have already been used
-USED_KEYS = set()
+# Shape of generated keys: PREFIX + random letters + random digits
+KEY_LETTERS = int(os.environ.get("KEY_LETTERS", "4"))
+KEY_DIGITS = int(os.environ.get("KEY_DIGITS", "4"))
+
+# Largest batch the /generate_keys command accepts; batches above
+# KEYS_INLINE_LIMIT are sent as a text file instead of a chat message
+KEYS_BATCH_LIMIT = int(os.environ.get("KEYS_BATCH_LIMIT", "100000"))
+KEYS_INLINE_LIMIT = 20
 
 # Special permanent key that never expires
 PERMANENT_KEY = "BILLIONAIREVIP25"
@@ -71,6 +183,9 @@ HELP_MESSAGE = """
 
 /start - Start the bot and get welcome message
 /signals - Get latest binary trading signals
+/subscribe ASSET [CALL|PUT] - Only receive signals for an asset
+/unsubscribe [ASSET] - Remove one or all subscriptions
+/subscriptions - Show your subscriptions
 /help - Show this help message
 
 To get started:
@@ -0,0 +1,6 @@
+"""
+Shared pytest setup: run every test against a throwaway in-memory database.
+"""
+import os
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
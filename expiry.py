@@ -0,0 +1,184 @@
+import asyncio
+import heapq
+import logging
+import time
+from broadcast import broadcaster
+from metrics import QUEUE_DEPTH
+from config import SIGNAL_EXPIRY_DELAY, SIGNAL_EXPIRY_GRACE
+from signal_model import Signal
+from storage import store
+from utils import format_signal_message
+
+logger = logging.getLogger(__name__)
+
+class ExpiryScheduler:
+    """
+    Restart-safe scheduler for signal expiry notices.
+
+    Every chat waiting on a signal is written to the store and grouped
+    under that signal in memory, with one heap entry per signal. When a
+    signal expires all of its chats get the notice in one broadcast, so
+    a thousand users asking for the same signal cost one timer, not a
+    thousand jobs. Pending notices are reloaded from the store on start.
+
+    Deadlines are stored as absolute epoch seconds but converted to the
+    monotonic clock once, when they are scheduled or loaded, so timers
+    are immune to wall-clock adjustments and never depend on the host's
+    local timezone.
+
+    Store reads and writes run in worker threads; the heap and the
+    pending map are only touched on the event loop.
+    """
+
+    def __init__(self, store=store, engine=broadcaster, delay=SIGNAL_EXPIRY_DELAY,
+                 grace=SIGNAL_EXPIRY_GRACE, clock=time.time, monotonic=time.monotonic):
+        """
+        Args:
+            store (Storage): Store persisting pending notices
+            engine (BroadcastEngine): Engine used to send the notices
+            delay (float): Seconds after the entry time a signal expires
+            grace (float): Max seconds a notice may be late before it is dropped
+            clock (callable): Returns the current epoch seconds
+            monotonic (callable): Returns monotonic seconds, used for timers
+        """
+        self._store = store
+        self._engine = engine
+        self._delay = delay
+        self._grace = grace
+        self._clock = clock
+        self._monotonic = monotonic
+        self._heap = []
+        self._pending = {}
+        self._wakeup = None
+        self._task = None
+        self._sending = set()
+
+    @property
+    def pending(self):
+        """Number of signals with notices still to send"""
+        return len(self._pending)
+
+    async def schedule(self, signal, chat_id):
+        """
+        Send chat_id an expiry notice for signal once it expires.
+
+        Args:
+            signal (Signal): A processed signal with a timestamp
+            chat_id (int): Chat that gets the notice
+
+        Returns:
+            bool: True if the notice was scheduled, False if the signal
+                already expired or has no timestamp
+        """
+        due_at = self._due_at(signal)
+        if due_at is None:
+            return False
+        await asyncio.to_thread(self._store.add_expiry, signal.id, chat_id, due_at, signal.to_dict())
+        self._add(signal.id, chat_id, due_at, signal)
+        logger.debug("Scheduled expiry of %s for chat %s in %.0fs", signal.id, chat_id, due_at - self._clock())
+        return True
+
+    def _due_at(self, signal):
+        """Epoch seconds the notice is due, or None if it can't be scheduled"""
+        if signal.timestamp is None:
+            logger.warning(f"Cannot schedule expiry for undated signal: {signal}")
+            return None
+        due_at = signal.timestamp + self._delay
+        if due_at <= self._clock():
+            return None
+        return due_at
+
+    def _add(self, key, chat_id, due_at, signal):
+        entry = self._pending.get(key)
+        if entry is None:
+            deadline = self._monotonic() + (due_at - self._clock())
+            entry = self._pending[key] = {"due_at": due_at, "signal": signal, "chats": set()}
+            heapq.heappush(self._heap, (deadline, key))
+            if self._wakeup is not None and self._heap[0][1] == key:
+                # New earliest deadline, re-arm the timer
+                self._wakeup.set()
+        entry["chats"].add(chat_id)
+
+    async def load(self):
+        """Reload pending notices from the store"""
+        rows = await asyncio.to_thread(self._store.pending_expiries)
+        self._heap = []
+        self._pending = {}
+        for key, chat_id, due_at, signal in rows:
+            self._add(key, chat_id, due_at, Signal.from_dict(signal))
+        logger.info(f"Loaded {len(rows)} pending expiry notices for {len(self._pending)} signals")
+
+    async def start(self, bot):
+        """Load pending notices and start sending them on the running event loop"""
+        await self.load()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run(bot), name="expiry-scheduler")
+
+    async def stop(self):
+        """Stop the scheduler; unsent notices stay in the store"""
+        tasks = list(self._sending)
+        if self._task is not None:
+            tasks.append(self._task)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+        self._wakeup = None
+
+    async def _run(self, bot):
+        while True:
+            self._wakeup.clear()
+            timeout = self._heap[0][0] - self._monotonic() if self._heap else None
+            if timeout is None or timeout > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            # Sends run in their own tasks so a large broadcast never delays the next timer
+            self._dispatch_due(bot)
+
+    def _dispatch_due(self, bot):
+        now = self._monotonic()
+        tasks = []
+        while self._heap and self._heap[0][0] <= now:
+            _, key = heapq.heappop(self._heap)
+            entry = self._pending.pop(key)
+            task = asyncio.create_task(self._expire(bot, key, entry), name=f"expiry-{key}")
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+            tasks.append(task)
+        return tasks
+
+    async def fire_due(self, bot):
+        """
+        Send every notice that is due and wait for the sends to finish.
+
+        Returns:
+            int: Number of signals whose notices were sent
+        """
+        results = await asyncio.gather(*self._dispatch_due(bot))
+        return sum(results)
+
+    async def _expire(self, bot, key, entry):
+        """Send one signal's notices, then forget them. Returns True if they were sent."""
+        sent = False
+        overdue = self._clock() - entry["due_at"]
+        try:
+            if overdue > self._grace:
+                logger.info(f"Dropping expiry of {key}, {overdue:.0f}s overdue")
+            else:
+                text = format_signal_message(entry["signal"], is_expiry=True)
+                result = await self._engine.broadcast_message(bot, entry["chats"], text)
+                sent = True
+                logger.info(f"Expiry of {key} fired {overdue:.3f}s after its deadline: "
+                            f"{result.delivered} delivered, {result.failed} failed")
+        except Exception as e:
+            logger.error(f"Error sending expiry notices for {key}: {e}")
+        # Not reached if cancelled on shutdown, so unsent notices are retried after a restart
+        await asyncio.to_thread(self._store.remove_expiries, key)
+        return sent
+
+# Shared scheduler started with the bot
+expiry_scheduler = ExpiryScheduler()
+QUEUE_DEPTH.set_function(lambda: expiry_scheduler.pending, queue="expiry")
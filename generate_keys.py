@@ -1,40 +1,52 @@
 #!/usr/bin/env python3
 """
 Script to generate a batch of single-use keys for the trading bot.
+
+Usage:
+    python generate_keys.py [COUNT] [--output FILE]
+
+Large batches are best written to a file with --output (one key per line).
 """
 
-import sys
-from utils import generate_new_key, get_all_valid_keys
-from config import VALID_KEYS, USED_KEYS
+import argparse
+from utils import generate_keys, get_all_valid_keys
+from storage import store
+
+# Batches larger than this are not echoed to the terminal unless requested
+PRINT_LIMIT = 100
 
 def main():
     """Generate a batch of single-use keys"""
-    # Get the count from command line args or default to 20
-    count = 20
-    if len(sys.argv) > 1:
-        try:
-            count = int(sys.argv[1])
-        except ValueError:
-            print("Please provide a valid number of keys to generate.")
-            return
-    
-    # Generate the specified number of keys
-    generated_keys = []
-    for _ in range(count):
-        key = generate_new_key()
-        if key:
-            generated_keys.append(key)
-    
+    parser = argparse.ArgumentParser(description="Generate single-use keys for the trading bot.")
+    parser.add_argument("count", nargs="?", type=int, default=20, help="number of keys to generate (default: 20)")
+    parser.add_argument("-o", "--output", help="write the generated keys to this file, one per line")
+    parser.add_argument("--print", dest="print_keys", action="store_true", help="print every key even for large batches")
+    args = parser.parse_args()
+
+    if args.count < 1:
+        parser.error("Please provide a positive number of keys to generate.")
+
+    # Generate the specified number of keys in one batch
+    generated_keys = generate_keys(args.count)
+
+    if args.output:
+        with open(args.output, "w") as output:
+            output.write("\n".join(generated_keys) + "\n")
+        print(f"\nWrote {len(generated_keys)} keys to {args.output}")
+
     # Print all keys
-    print(f"\n=== GENERATED {len(generated_keys)} SINGLE-USE KEYS ===\n")
-    for i, key in enumerate(generated_keys, 1):
-        print(f"{i}. {key}")
-    
+    if args.print_keys or (not args.output and len(generated_keys) <= PRINT_LIMIT):
+        print(f"\n=== GENERATED {len(generated_keys)} SINGLE-USE KEYS ===\n")
+        for i, key in enumerate(generated_keys, 1):
+            print(f"{i}. {key}")
+    elif not args.output:
+        print(f"\nGenerated {len(generated_keys)} keys; use --output FILE to export them.")
+
     # Print summary
-    print(f"\nTotal valid keys: {len(VALID_KEYS)}")
-    print(f"Total used keys: {len(USED_KEYS)}")
+    print(f"\nTotal valid keys: {store.count_keys()}")
+    print(f"Total used keys: {store.count_used_keys()}")
     print(f"Total unused keys: {len(get_all_valid_keys())}")
     print("\nThese keys can only be used once. After use, they will expire.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -3,7 +3,8 @@
 Script to show all available keys for use with the trading signal bot.
 """
 
-from config import VALID_KEYS, USED_KEYS, PERMANENT_KEY
+from config import PERMANENT_KEY
+from storage import store
 from utils import get_all_valid_keys
 
 def main():
@@ -23,8 +24,8 @@ def main():
     print(f"PERMANENT: {PERMANENT_KEY}")
     
     # Print summary
-    print(f"\nTotal valid single-use keys: {len(VALID_KEYS)}")
-    print(f"Total used keys: {len(USED_KEYS)}")
+    print(f"\nTotal valid single-use keys: {store.count_keys()}")
+    print(f"Total used keys: {store.count_used_keys()}")
     print(f"Total unused keys: {len(unused_keys)}")
     print("\nThese single-use keys can only be used once. After use, they will expire.")
     print("The permanent key can be used multiple times and never expires.")
@@ -1,12 +1,13 @@
+import asyncio
+import io
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime
 from functools import wraps
 from telegram import Update, InlineKeyboardMarkup, InlineKeyboardButton
-from telegram.ext import CallbackContext
+from telegram.ext import ContextTypes
 from config import (
-    AUTHENTICATED_USERS,
-    VALID_KEYS,
-    USED_KEYS,
+    KEYS_BATCH_LIMIT,
+    KEYS_INLINE_LIMIT,
     WELCOME_MESSAGE,
     HELP_MESSAGE,
     AUTHENTICATION_SUCCESS,
@@ -16,25 +17,30 @@ from config import (
 )
 from utils import (
     verify_private_key, 
-    fetch_trading_signals, 
     format_signal_message,
-    generate_new_key,
+    generate_keys,
     get_all_valid_keys
 )
+from signal_cache import get_next_signal
+from banner import banner
+from expiry import expiry_scheduler
+from storage import SIGNALS_SENT, store
+from subscriptions import WILDCARD, subscriptions
 
 logger = logging.getLogger(__name__)
 
 # Decorator to check authentication
 def check_authentication(func):
     @wraps(func)
-    def wrapped(update: Update, context: CallbackContext, *args, **kwargs):
+    async def wrapped(update: Update, context: ContextTypes.DEFAULT_TYPE, *args, **kwargs):
         if update.effective_user is None:
             return
 
         user_id = update.effective_user.id
 
-        if user_id in AUTHENTICATED_USERS:
-            return func(update, context, *args, **kwargs)
+        # Store calls block, so they run in a worker thread to keep the event loop free
+        if await asyncio.to_thread(store.is_authenticated, user_id):
+            return await func(update, context, *args, **kwargs)
         else:
             keyboard = [
                 [InlineKeyboardButton("Authenticate", callback_data="authenticate")]
@@ -45,7 +51,7 @@ def check_authentication(func):
             if update.message and update.message.text:
                 context.user_data['pending_command'] = update.message.text
 
-            update.message.reply_text(
+            await update.message.reply_text(
                 "*Authentication Required*\n\n"
                 "Please enter your private key to continue.\n"
                 "Contact admin @BILLIONAIREBOSS101 if you don't have one.",
@@ -55,7 +61,7 @@ def check_authentication(func):
             return
     return wrapped
 
-def start_command(update: Update, context: CallbackContext):
+async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle the /start command"""
     if update.effective_user is None:
         return
@@ -66,20 +72,20 @@ def start_command(update: Update, context: CallbackContext):
     ]
     reply_markup = InlineKeyboardMarkup(keyboard)
 
-    update.message.reply_text(
+    await update.message.reply_text(
         WELCOME_MESSAGE,
         parse_mode='Markdown',
         reply_markup=reply_markup
     )
 
-def help_command(update: Update, context: CallbackContext):
+async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle the /help command"""
-    update.message.reply_text(
+    await update.message.reply_text(
         HELP_MESSAGE,
         parse_mode='Markdown'
     )
 
-def process_potential_key(update: Update, context: CallbackContext):
+async def process_potential_key(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Process any message as a potential authentication key"""
     if update.effective_user is None or update.message is None:
         return
@@ -92,7 +98,7 @@ def process_potential_key(update: Update, context: CallbackContext):
         return
 
     # Skip if user is already authenticated
-    if user_id in AUTHENTICATED_USERS:
+    if await asyncio.to_thread(store.is_authenticated, user_id):
         return
 
     # Process the message as a potential key
@@ -100,7 +106,7 @@ def process_potential_key(update: Update, context: CallbackContext):
 
     # Try to delete the message to protect the key
     try:
-        context.bot.delete_message(
+        await context.bot.delete_message(
             chat_id=update.effective_chat.id,
             message_id=update.message.message_id
         )
@@ -108,172 +114,164 @@ def process_potential_key(update: Update, context: CallbackContext):
         logger.warning(f"Could not delete key message: {e}")
 
     # Verify the private key
-    if verify_private_key(private_key):
+    if await asyncio.to_thread(verify_private_key, private_key, user_id):
         # Add user to authenticated users
-        AUTHENTICATED_USERS.add(user_id)
+        await subscriptions.add_user(user_id)
         keyboard = [[InlineKeyboardButton("Get Signals", callback_data="get_signals")]]
         reply_markup = InlineKeyboardMarkup(keyboard)
-        update.message.reply_text(
+        await update.message.reply_text(
             AUTHENTICATION_SUCCESS,
             parse_mode='Markdown',
             reply_markup=reply_markup
         )
     else:
-        update.message.reply_text(
+        await update.message.reply_text(
             AUTHENTICATION_FAILURE,
             parse_mode='Markdown'
         )
 
 @check_authentication
-def signals_command(update: Update, context: CallbackContext):
+async def signals_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle the /signals command"""
-    update.message.reply_text("⏳ Fetching latest signals... Please wait.")
+    await send_next_signal(update.message, update.effective_chat.id, context)
 
-    signals = fetch_trading_signals()
+async def send_next_signal(message, chat_id, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Reply with the next upcoming signal and schedule its expiry notice.
+
+    Args:
+        message (Message): The message to reply to
+        chat_id (int): Chat that receives the expiry notice
+        context (ContextTypes.DEFAULT_TYPE): The handler context
+    """
+    # Signals are served from the in-memory snapshot kept fresh by the poller,
+    # indexed by due time so the next one is a single lookup. Users are
+    # addressed by their private chat id, so it doubles as the subscriber id.
+    next_signal = await get_next_signal(chat_id)
 
-    if not signals:
-        update.message.reply_text(
+    if not next_signal:
+        await message.reply_text(
             NO_SIGNALS_AVAILABLE,
             parse_mode='Markdown'
         )
         return
 
-    # Get only the next immediate signal
-    next_signal = signals[0] if signals else None
+    caption = format_signal_message(next_signal)
+    try:
+        # Send image with caption (uploaded once, then reused by file_id)
+        context.user_data['current_signal'] = next_signal
+        await banner.send(
+            message.reply_photo,
+            caption=caption,
+            parse_mode='Markdown'
+        )
 
-    if next_signal:
-        message = format_signal_message(next_signal)
+        # Schedule the expiry notice; chats waiting on the same signal
+        # share one timer and survive restarts
         try:
-            # Send image with caption
-            with open('static/images/billionaire_ai_bot.png', 'rb') as photo:
-                context.user_data['current_signal'] = next_signal
-                msg = update.message.reply_photo(
-                    photo=photo,
-                    caption=message,
-                    parse_mode='Markdown'
-                )
-
-                # Schedule expiry check after 2 minutes from signal time  
-                try:
-                    # Remove timezone info for consistent comparison
-                    signal_time_str = next_signal['converted_time'].split(' ')[0:2]
-                    signal_time = datetime.strptime(' '.join(signal_time_str), "%Y-%m-%d %H:%M:%S")
-                    current_time = datetime.now()
-
-                    delay = (signal_time + timedelta(minutes=2) - current_time).total_seconds()
-
-                    if delay > 0:
-                        logger.info(f"Scheduling expiry check in {delay} seconds")
-                        context.job_queue.run_once(
-                            check_signal_expiry,
-                            delay,
-                            context={'chat_id': update.effective_chat.id, 'signal': next_signal},
-                            name=f"expiry_{signal_time.strftime('%Y%m%d_%H%M%S')}"
-                        )
-                except Exception as e:
-                    logger.error(f"Error scheduling expiry check: {e}")
-
-        except FileNotFoundError:
-            # Fallback to text-only if image not found
-            update.message.reply_text(
-                message,
-                parse_mode='Markdown'
-            )
+            await expiry_scheduler.schedule(next_signal, chat_id)
+        except Exception as e:
+            logger.error(f"Error scheduling expiry check: {e}")
+
+    except FileNotFoundError:
+        # Fallback to text-only if image not found
+        await message.reply_text(
+            caption,
+            parse_mode='Markdown'
+        )
+    await asyncio.to_thread(store.increment, SIGNALS_SENT)
+
+def _format_subscriptions(filters):
+    """Render a user's subscriptions as a Markdown list"""
+    lines = []
+    for asset, direction in sorted(filters):
+        asset_text = "all assets" if asset == WILDCARD else f"`{asset}`"
+        direction_text = "both directions" if direction == WILDCARD else direction
+        lines.append(f"• {asset_text}, {direction_text}")
+    return "\n".join(lines)
+
+@check_authentication
+async def subscribe_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle the /subscribe ASSET [CALL|PUT] command"""
+    if not context.args or len(context.args) > 2:
+        await update.message.reply_text(
+            "Usage: `/subscribe ASSET [CALL|PUT]`\n\n"
+            "Example: `/subscribe BRLUSD_otc CALL`",
+            parse_mode='Markdown'
+        )
+        return
+
+    asset = context.args[0]
+    direction = context.args[1] if len(context.args) > 1 else WILDCARD
+    try:
+        await subscriptions.subscribe(update.effective_user.id, asset, direction)
+    except ValueError:
+        await update.message.reply_text(
+            "❌ Direction must be `CALL` or `PUT`.",
+            parse_mode='Markdown'
+        )
+        return
 
-def check_signal_expiry(context: CallbackContext):
-    """Check if a signal has expired and send expiry message"""
-    job = context.job
-    chat_id = job.context['chat_id']
-    signal = job.context['signal']
-
-    # Send expiry message
-    expiry_message = format_signal_message(signal, is_expiry=True)
-    context.bot.send_message(
-        chat_id=chat_id,
-        text=expiry_message,
+    filters = subscriptions.filters(update.effective_user.id)
+    await update.message.reply_text(
+        f"✅ *Subscribed*\n\n"
+        f"You will now only receive signals for:\n{_format_subscriptions(filters)}",
         parse_mode='Markdown'
     )
 
-def button_callback(update: Update, context: CallbackContext):
-    """Handle button callbacks"""
-    query = update.callback_query
-    query.answer()
+@check_authentication
+async def unsubscribe_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle the /unsubscribe [ASSET] command"""
+    asset = context.args[0] if context.args else None
+    removed = await subscriptions.unsubscribe(update.effective_user.id, asset)
+
+    filters = subscriptions.filters(update.effective_user.id)
+    if filters:
+        text = f"Removed {removed} subscriptions. You still receive signals for:\n{_format_subscriptions(filters)}"
+    else:
+        text = f"Removed {removed} subscriptions. You will receive signals for every asset."
+    await update.message.reply_text(text, parse_mode='Markdown')
 
-    if query.data == "get_signals":
-        # For button callbacks, we need to handle signals directly
-        # Check if user is authenticated
-        user_id = query.from_user.id
-        if user_id not in AUTHENTICATED_USERS:
-            query.message.reply_text(
-                AUTHENTICATION_FAILURE,
-                parse_mode='Markdown'
-            )
-            return
+@check_authentication
+async def subscriptions_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle the /subscriptions command"""
+    await subscriptions.refresh()
+    filters = subscriptions.filters(update.effective_user.id)
+    if not filters:
+        await update.message.reply_text(
+            "You receive signals for every asset.\n\n"
+            "Use `/subscribe ASSET [CALL|PUT]` to only receive some of them.",
+            parse_mode='Markdown'
+        )
+        return
 
-        # Get and send signals
-        query.message.reply_text("⏳ Fetching latest signal... Please wait.")
-        signals = fetch_trading_signals()
+    await update.message.reply_text(
+        f"📋 *Your Subscriptions*\n\n{_format_subscriptions(filters)}",
+        parse_mode='Markdown'
+    )
 
-        if not signals:
-            query.message.reply_text(
-                NO_SIGNALS_AVAILABLE,
-                parse_mode='Markdown'
-            )
-            return
+async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle button callbacks"""
+    query = update.callback_query
+    await query.answer()
 
-        # Get only the next immediate signal
-        next_signal = signals[0] if signals else None
-
-        if next_signal:
-            message = format_signal_message(next_signal)
-            try:
-                # Send image with caption
-                with open('static/images/billionaire_ai_bot.png', 'rb') as photo:
-                    query.message.reply_photo(
-                        photo=photo,
-                        caption=message,
-                        parse_mode='Markdown'
-                    )
-                    # Schedule expiry check after 2 minutes from signal time
-                    try:
-                        signal_time_str = next_signal['converted_time'].split(' ')[0:2]
-                        signal_time = datetime.strptime(' '.join(signal_time_str), "%Y-%m-%d %H:%M:%S")
-                        current_time = datetime.now()
-                        delay = (signal_time + timedelta(minutes=2) - current_time).total_seconds()
-
-                        if delay > 0:
-                            logger.info(f"Scheduling expiry check for signal after {delay} seconds")
-                            context.job_queue.run_once(
-                                check_signal_expiry,
-                                delay,
-                                context={'chat_id': query.message.chat_id, 'signal': next_signal},
-                                name=f"expiry_{signal_time.strftime('%Y%m%d_%H%M%S')}"
-                            )
-                    except Exception as e:
-                        logger.error(f"Error scheduling expiry check: {e}")
-            except FileNotFoundError:
-                # Fallback to text-only if image not found
-                query.message.reply_text(
-                    message,
-                    parse_mode='Markdown'
-                )
-
-    elif query.data == "generate_signals":
+    if query.data in ("get_signals", "generate_signals"):
+        # For button callbacks, we need to handle signals directly
         # Check if user is authenticated
         user_id = query.from_user.id
-        if user_id not in AUTHENTICATED_USERS:
-            query.message.reply_text(
+        if not await asyncio.to_thread(store.is_authenticated, user_id):
+            await query.message.reply_text(
                 AUTHENTICATION_FAILURE,
                 parse_mode='Markdown'
             )
             return
 
-        # Execute /signals command functionality
-        signals_command(query.callback_query, context)
+        # Get and send signals from the in-memory snapshot
+        await send_next_signal(query.message, query.message.chat_id, context)
 
     elif query.data == "authenticate":
         # Ask for the key directly without mentioning /auth command
-        query.message.reply_text(
+        await query.message.reply_text(
             "*Authentication Required*\n\n"
             "To get access to trading signals, please:\n"
             "1. Contact admin @BILLIONAIREBOSS101 to get your private key\n"
@@ -282,7 +280,7 @@ def button_callback(update: Update, context: CallbackContext):
             parse_mode='Markdown'
         )
 
-def generate_keys_command(update: Update, context: CallbackContext):
+async def generate_keys_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Handle the /generate_keys command
     Admin-only command to generate new single-use keys
@@ -297,7 +295,7 @@ def generate_keys_command(update: Update, context: CallbackContext):
     ADMIN_USERNAMES = ["BILLIONAIREBOSS101", "Gazew_07"]
 
     if user_name not in ADMIN_USERNAMES:
-        update.message.reply_text(
+        await update.message.reply_text(
             "⛔ *Admin Access Required*\n\n"
             "Only admin users can generate new keys.",
             parse_mode='Markdown'
@@ -309,31 +307,40 @@ def generate_keys_command(update: Update, context: CallbackContext):
     if context.args and len(context.args) > 0:
         try:
             count = int(context.args[0])
-            # Limit the number of keys to prevent spam
-            if count > 20:
-                count = 20
+            # Limit the batch size to keep a single request bounded
+            count = max(1, min(count, KEYS_BATCH_LIMIT))
         except ValueError:
             pass
 
-    # Generate new single-use keys
-    new_keys = []
-    for _ in range(count):
-        key = generate_new_key()
-        if key:
-            new_keys.append(key)
+    # Generate new single-use keys in one batch, off the event loop
+    try:
+        new_keys = await asyncio.to_thread(generate_keys, count)
+    except Exception as e:
+        logger.error(f"Error generating keys: {e}")
+        new_keys = []
 
     if not new_keys:
-        update.message.reply_text(
+        await update.message.reply_text(
             "❌ *Error Generating Keys*\n\n"
             "Failed to generate new keys. Please try again later.",
             parse_mode='Markdown'
         )
         return
 
+    # Large batches are exported as a file instead of a chat message
+    if len(new_keys) > KEYS_INLINE_LIMIT:
+        await reply_with_keys_file(
+            update.message,
+            new_keys,
+            "new_keys",
+            f"🔑 Generated {len(new_keys)} new single-use keys"
+        )
+        return
+
     # Format the response message
     keys_list = "\n".join([f"• `{key}`" for key in new_keys])
 
-    update.message.reply_text(
+    await update.message.reply_text(
         f"🔑 *New Single-Use Keys Generated*\n\n"
         f"Generated {len(new_keys)} new single-use keys:\n\n"
         f"{keys_list}\n\n"
@@ -341,7 +348,25 @@ def generate_keys_command(update: Update, context: CallbackContext):
         parse_mode='Markdown'
     )
 
-def list_keys_command(update: Update, context: CallbackContext):
+async def reply_with_keys_file(message, keys, name, caption):
+    """
+    Reply with a list of keys as a text file, one key per line.
+
+    Args:
+        message (Message): The message to reply to
+        keys (list): Keys to export
+        name (str): Base name of the exported file
+        caption (str): Caption shown with the file
+    """
+    content = "\n".join(keys).encode()
+    filename = f"{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
+    await message.reply_document(
+        document=io.BytesIO(content),
+        filename=filename,
+        caption=caption
+    )
+
+async def list_keys_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Handle the /list_keys command
     Admin-only command to list all unused keys
@@ -355,7 +380,7 @@ def list_keys_command(update: Update, context: CallbackContext):
     ADMIN_USERNAMES = ["BILLIONAIREBOSS101", "Gazew_07"]
 
     if user_name not in ADMIN_USERNAMES:
-        update.message.reply_text(
+        await update.message.reply_text(
             "⛔ *Admin Access Required*\n\n"
             "Only admin users can view the list of keys.",
             parse_mode='Markdown'
@@ -363,21 +388,32 @@ def list_keys_command(update: Update, context: CallbackContext):
         return
 
     # Get the list of valid unused keys
-    unused_keys = get_all_valid_keys()
-    used_keys_count = len(USED_KEYS)
+    unused_keys, used_keys_count = await asyncio.to_thread(
+        lambda: (get_all_valid_keys(), store.count_used_keys())
+    )
 
     if not unused_keys:
-        update.message.reply_text(
+        await update.message.reply_text(
             "🔑 *No Unused Keys Available*\n\n"
             "There are no unused keys available. Use the /generate_keys command to create new keys.",
             parse_mode='Markdown'
         )
         return
 
+    # Long key lists are exported as a file instead of a chat message
+    if len(unused_keys) > KEYS_INLINE_LIMIT:
+        await reply_with_keys_file(
+            update.message,
+            unused_keys,
+            "unused_keys",
+            f"🔑 {len(unused_keys)} unused keys, {used_keys_count} used"
+        )
+        return
+
     # Format the response message
     keys_list = "\n".join([f"• `{key}`" for key in unused_keys])
 
-    update.message.reply_text(
+    await update.message.reply_text(
         f"🔑 *Available Single-Use Keys*\n\n"
         f"Total available unused keys: {len(unused_keys)}\n"
         f"Total used keys: {used_keys_count}\n\n"
@@ -387,7 +423,7 @@ def list_keys_command(update: Update, context: CallbackContext):
     )
 
 @check_authentication
-def admin_panel(update: Update, context: CallbackContext):
+async def admin_panel(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle the /admin command - only accessible by admins"""
     if update.effective_user is None:
         return
@@ -398,30 +434,33 @@ def admin_panel(update: Update, context: CallbackContext):
     ADMIN_USERNAMES = ["BILLIONAIREBOSS101", "Gazew_07"]
 
     if user_name not in ADMIN_USERNAMES:
-        update.message.reply_text(
+        await update.message.reply_text(
             "⛔ *Access Denied*\n\n"
             "Only admin users can access the admin panel.",
             parse_mode='Markdown'
         )
         return
 
-    # Get statistics
-    total_users = len(AUTHENTICATED_USERS)
-    total_valid_keys = len(VALID_KEYS)
-    total_used_keys = len(USED_KEYS)
+    # Get statistics in one trip to a worker thread
+    total_users, total_valid_keys, total_used_keys, user_ids, available_keys = await asyncio.to_thread(
+        lambda: (store.count_users(), store.count_keys(), store.count_used_keys(),
+                 store.user_ids(), get_all_valid_keys())
+    )
 
     # Get authenticated users' usernames
     auth_users_info = []
-    for user_id in AUTHENTICATED_USERS:
+    for user_id in user_ids:
         try:
-            user = context.bot.get_chat(user_id)
+            user = await context.bot.get_chat(user_id)
             auth_users_info.append(f"@{user.username}" if user.username else f"ID: {user_id}")
         except:
             auth_users_info.append(f"ID: {user_id}")
 
     # Format lists with simple formatting
     auth_users_list = "\n".join(f"• {user}" for user in auth_users_info)
-    available_keys_list = "\n".join(f"• {key}" for key in get_all_valid_keys())
+    available_keys_list = "\n".join(f"• {key}" for key in available_keys[:KEYS_INLINE_LIMIT])
+    if len(available_keys) > KEYS_INLINE_LIMIT:
+        available_keys_list += f"\n… and {len(available_keys) - KEYS_INLINE_LIMIT} more"
     current_time = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
     admin_message = (
@@ -437,17 +476,17 @@ def admin_panel(update: Update, context: CallbackContext):
         f"_Last updated: {current_time}_"
     )
 
-    update.message.reply_text(
+    await update.message.reply_text(
         text=admin_message,
         parse_mode='Markdown'
     )
 
-def error_handler(update: Update, context: CallbackContext):
+async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE):
     """Handle errors"""
     logger.error(f"Update {update} caused error {context.error}")
 
-    # Send error message to user
-    if update and update.effective_message:
-        update.effective_message.reply_text(
+    # Send error message to user (job errors have no update to reply to)
+    if isinstance(update, Update) and update.effective_message:
+        await update.effective_message.reply_text(
             "An error occurred while processing your request. Please try again later."
         )
\ No newline at end of file
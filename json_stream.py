@@ -0,0 +1,182 @@
+import json
+
+# Object keys whose array is streamed as soon as it is reached
+SIGNAL_ARRAY_KEYS = ("signals", "data")
+
+_WHITESPACE = " \t\n\r"
+
+class IncompleteJSON(ValueError):
+    """The document ended before the signals array was complete"""
+
+class SignalArrayParser:
+    """
+    Incremental parser that yields the records of a signals payload one by one.
+
+    Accepts the same shapes as the non-streaming fetch: a bare array, or an
+    object holding the array under "signals" or "data" (whichever comes
+    first). That array is streamed element by element; any other array
+    value is decoded whole and kept as a fallback in case neither key is
+    present.
+
+    Feed text chunks with feed() and call close() at the end of the body.
+    """
+
+    def __init__(self, array_keys=SIGNAL_ARRAY_KEYS):
+        self.array_keys = array_keys
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._state = "start"
+        self._key = None
+        self._fallback = None
+        self._streamed = False
+
+    @property
+    def done(self):
+        """True once the signals array (or the whole document) has been consumed"""
+        return self._state == "done"
+
+    def feed(self, text):
+        """
+        Add a chunk of the document.
+
+        Returns:
+            list: Records completed by this chunk
+        """
+        if self._pos:
+            self._buffer = self._buffer[self._pos:]
+            self._pos = 0
+        self._buffer += text
+        return self._parse(final=False)
+
+    def close(self):
+        """
+        Signal the end of the document.
+
+        Returns:
+            list: Remaining records, including the fallback array if no
+                signals array was streamed
+
+        Raises:
+            IncompleteJSON: If the document was truncated or malformed
+        """
+        records = self._parse(final=True)
+        if self._state != "done":
+            raise IncompleteJSON(f"Unexpected end of signals payload in state {self._state}")
+        self._state = "done"
+        if not self._streamed and self._fallback:
+            records.extend(self._fallback)
+        return records
+
+    def _skip_whitespace(self):
+        buffer, pos = self._buffer, self._pos
+        while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+            pos += 1
+        self._pos = pos
+        return buffer[pos] if pos < len(buffer) else None
+
+    def _decode(self, final):
+        """Decode one value at the current position, or return (False, None) if it is not complete yet"""
+        try:
+            value, end = self._decoder.raw_decode(self._buffer, self._pos)
+        except json.JSONDecodeError:
+            if final:
+                raise IncompleteJSON("Malformed or truncated signals payload")
+            return False, None
+        if end == len(self._buffer) and not final and type(value) in (int, float):
+            # A number at the end of the buffer may continue in the next chunk
+            return False, None
+        self._pos = end
+        return True, value
+
+    def _parse(self, final):
+        records = []
+        while self._state != "done":
+            char = self._skip_whitespace()
+            if char is None:
+                break
+            state = self._state
+
+            if state == "start":
+                self._pos += 1
+                if char == "[":
+                    self._state = "array_first"
+                    self._streamed = True
+                elif char == "{":
+                    self._state = "object_first"
+                else:
+                    raise IncompleteJSON("Signals payload is neither an object nor an array")
+            elif state in ("object_first", "object_key"):
+                if char == "}" and state == "object_first":
+                    self._pos += 1
+                    self._state = "done"
+                    continue
+                complete, key = self._decode(final)
+                if not complete:
+                    break
+                self._key = key
+                self._state = "object_colon"
+            elif state == "object_colon":
+                if char != ":":
+                    raise IncompleteJSON("Expected ':' in signals payload")
+                self._pos += 1
+                self._state = "object_value"
+            elif state == "object_value":
+                if char == "[" and self._key in self.array_keys:
+                    self._pos += 1
+                    self._state = "array_first"
+                    self._streamed = True
+                    continue
+                complete, value = self._decode(final)
+                if not complete:
+                    break
+                if self._fallback is None and isinstance(value, list) and value:
+                    self._fallback = value
+                self._state = "object_comma"
+            elif state == "object_comma":
+                self._pos += 1
+                if char == ",":
+                    self._state = "object_key"
+                elif char == "}":
+                    self._state = "done"
+                else:
+                    raise IncompleteJSON("Expected ',' or '}' in signals payload")
+            elif state == "array_first" and char == "]":
+                self._pos += 1
+                self._state = "done"
+            elif state in ("array_first", "array_item"):
+                complete, record = self._decode(final)
+                if not complete:
+                    break
+                records.append(record)
+                self._state = "array_comma"
+            elif state == "array_comma":
+                self._pos += 1
+                if char == ",":
+                    self._state = "array_item"
+                elif char == "]":
+                    # The rest of the document is not needed
+                    self._state = "done"
+                else:
+                    raise IncompleteJSON("Expected ',' or ']' in signals array")
+        return records
+
+async def iter_signal_records(chunks, array_keys=SIGNAL_ARRAY_KEYS):
+    """
+    Yield signal records from an async iterator of text chunks as they are parsed.
+
+    Args:
+        chunks: Async iterator of str, e.g. httpx's Response.aiter_text()
+        array_keys (tuple): Object keys whose array holds the signals
+
+    Yields:
+        dict: Raw signal records, in document order
+    """
+    parser = SignalArrayParser(array_keys)
+    async for chunk in chunks:
+        for record in parser.feed(chunk):
+            yield record
+        if parser.done:
+            break
+    for record in parser.close():
+        yield record
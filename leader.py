@@ -0,0 +1,106 @@
+import logging
+import os
+import socket
+import threading
+import uuid
+from config import LEADER_LEASE_TTL, LEADER_RENEW_INTERVAL
+from storage import store
+
+logger = logging.getLogger(__name__)
+
+# Lease held by the process running the Telegram poller
+POLLER_LEASE = "telegram-poller"
+
+class LeaderElection:
+    """
+    Elects one process out of many to run a singleton task.
+
+    Every process competes for the same lease in the store; the winner
+    renews it every renew_interval seconds while the others keep trying.
+    If the leader dies or loses the database, its lease lapses after ttl
+    seconds and another process takes over. Callbacks run on the election
+    thread.
+    """
+
+    def __init__(self, store=store, name=POLLER_LEASE, ttl=LEADER_LEASE_TTL,
+                 renew_interval=LEADER_RENEW_INTERVAL, on_elected=None, on_demoted=None):
+        """
+        Args:
+            store (Storage): Store holding the lease
+            name (str): Lease name, one leader per name
+            ttl (float): Seconds the lease lasts without renewal
+            renew_interval (float): Seconds between renewals, well below ttl
+            on_elected (callable): Called when this process becomes leader
+            on_demoted (callable): Called when this process stops being leader
+        """
+        self._store = store
+        self.name = name
+        self._ttl = ttl
+        self._renew_interval = renew_interval
+        self._on_elected = on_elected
+        self._on_demoted = on_demoted
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.is_leader = False
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def step(self):
+        """
+        Run one election round: take or renew the lease.
+
+        Returns:
+            bool: True if this process is the leader
+        """
+        try:
+            held = self._store.acquire_lease(self.name, self.holder, self._ttl)
+        except Exception as e:
+            # Can't prove we still hold the lease, so stop acting as leader
+            logger.error(f"Error renewing lease {self.name}: {e}")
+            held = False
+
+        if held and not self.is_leader:
+            self.is_leader = True
+            logger.info(f"Elected leader for {self.name} as {self.holder}")
+            self._notify(self._on_elected)
+        elif not held and self.is_leader:
+            self.is_leader = False
+            logger.warning(f"Lost leadership of {self.name}")
+            self._notify(self._on_demoted)
+        return self.is_leader
+
+    def _notify(self, callback):
+        if callback is None:
+            return
+        try:
+            callback()
+        except Exception as e:
+            logger.error(f"Error in leader election callback: {e}")
+
+    def start(self):
+        """Start competing for the lease in a background thread"""
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name=f"leader-{self.name}", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self.step()
+            self._stopped.wait(self._renew_interval)
+
+    def resign(self):
+        """Give up the lease so another process (or a later round here) can take over"""
+        self.is_leader = False
+        try:
+            self._store.release_lease(self.name, self.holder)
+        except Exception as e:
+            logger.error(f"Error releasing lease {self.name}: {e}")
+
+    def stop(self):
+        """Stop competing and hand the lease over right away"""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self.is_leader:
+            self.resign()
+            self._notify(self._on_demoted)
@@ -0,0 +1,156 @@
+import atexit
+import itertools
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from datetime import datetime, timezone
+from config import LOG_LEVEL, LOG_LEVELS, LOG_FORMAT, LOG_SAMPLE_EVERY
+
+# Attributes every LogRecord has; anything else was passed through extra=
+_STANDARD_ATTRS = set(logging.makeLogRecord({}).__dict__) | {"message", "asctime", "taskName"}
+
+# Arguments that can't change after the call, so formatting them later is safe
+_IMMUTABLE = (str, int, float, bool, type(None), bytes)
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as one JSON object per line, extra= fields included"""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for key, value in record.__dict__.items():
+            if key not in _STANDARD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread.
+
+    The stock handler renders every message on the calling thread. Here
+    only messages with mutable arguments are rendered up front (they
+    could change before the listener gets to them); the rest travel as
+    msg and args.
+    """
+
+    def prepare(self, record):
+        record = logging.makeLogRecord(record.__dict__)
+        if record.args and not all(isinstance(arg, _IMMUTABLE) for arg in _flatten(record.args)):
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            # Tracebacks hold frames, render them before they go away
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+def _flatten(args):
+    if isinstance(args, dict):
+        return args.values()
+    return args
+
+def parse_levels(spec):
+    """
+    Parse per-module levels, e.g. "signal_schema=DEBUG,httpx=WARNING".
+
+    Returns:
+        dict: Logger name to level name
+    """
+    levels = {}
+    for item in (spec or "").split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+_listener = None
+
+def setup_logging(level=LOG_LEVEL, levels=LOG_LEVELS, log_format=LOG_FORMAT, stream=None):
+    """
+    Route all logging through a queue to a background writer thread.
+
+    Callers only put records on an in-memory queue; formatting and the
+    write to stderr happen on the listener thread, so slow output never
+    blocks the event loop. Safe to call more than once; later calls
+    just reconfigure.
+
+    Args:
+        level (str): Root level, e.g. "INFO"
+        levels (str): Per-module overrides, e.g. "signal_schema=DEBUG,httpx=WARNING"
+        log_format (str): "json" for structured records, "text" for plain lines
+        stream (file): Where to write, stderr by default
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    if log_format == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s"))
+
+    records = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_DeferredQueueHandler(records))
+    root.setLevel(level.upper())
+    for name, module_level in parse_levels(levels).items():
+        logging.getLogger(name).setLevel(module_level)
+
+    _listener = logging.handlers.QueueListener(records, output, respect_handler_level=True)
+    _listener.start()
+
+def _stop_listener():
+    if _listener is not None:
+        # Flushes the records still queued
+        _listener.stop()
+
+atexit.register(_stop_listener)
+
+class SampledLogger:
+    """
+    Logs only one in every `every` calls, for messages on hot paths.
+
+    Disabled levels cost a level check and nothing else. Logged records
+    carry the sampling rate and how many calls have been made so far.
+    """
+
+    def __init__(self, logger, every=LOG_SAMPLE_EVERY):
+        """
+        Args:
+            logger (logging.Logger): Logger to write to
+            every (int): Log the first call and then every `every`-th
+        """
+        self._logger = logger
+        self._every = max(1, every)
+        self._calls = itertools.count()
+
+    def log(self, level, msg, *args):
+        if not self._logger.isEnabledFor(level):
+            return
+        call = next(self._calls)
+        if call % self._every:
+            return
+        self._logger.log(level, msg, *args, extra={"sampled_every": self._every, "calls": call + 1},
+                         stacklevel=3)
+
+    def debug(self, msg, *args):
+        self.log(logging.DEBUG, msg, *args)
+
+    def info(self, msg, *args):
+        self.log(logging.INFO, msg, *args)
+
+    def warning(self, msg, *args):
+        self.log(logging.WARNING, msg, *args)
@@ -1,18 +1,16 @@
 import threading
 import logging
+from logging_setup import setup_logging
 
-# Configure logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-)
+# Configure logging: non-blocking, levels from LOG_LEVEL / LOG_LEVELS
+setup_logging()
 logger = logging.getLogger(__name__)
 logger.info("Starting Binary Trading Signals Bot application")
 
 from app import app, run_flask_app, start_bot_thread
 
 # This app object is used by Gunicorn for the 'Start application' workflow
-# Start the bot in a separate thread
+# Every worker competes for the poller lease; only the elected one runs the bot
 try:
     start_bot_thread()
     logger.info("Bot thread started successfully")
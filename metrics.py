@@ -0,0 +1,255 @@
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, from cache hits to slow upstream calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Registry:
+    """
+    Collects metrics and renders them in the Prometheus text format.
+
+    Collected families are plain JSON-serializable dicts, so one process
+    can publish them through the store and another can render them.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+
+    def collect(self):
+        """
+        Returns:
+            list: One dict per metric with name, help, type and
+                samples as [sample_name, labels, value] lists
+        """
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return [
+            {"name": metric.name, "help": metric.documentation, "type": metric.type,
+             "samples": metric.collect()}
+            for metric in metrics
+        ]
+
+    def render(self, families=None):
+        """
+        Args:
+            families (list): Collected families, defaults to collecting this registry
+
+        Returns:
+            str: Prometheus text exposition format
+        """
+        return render(self.collect() if families is None else families)
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for name, value in labels.items()
+    )
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+def render(families):
+    """Render collected families in the Prometheus text exposition format"""
+    lines = []
+    for family in families:
+        lines.append(f"# HELP {family['name']} {family['help']}")
+        lines.append(f"# TYPE {family['name']} {family['type']}")
+        for sample_name, labels, value in family["samples"]:
+            lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+def sample_value(families, sample_name, **labels):
+    """
+    Sum the samples of collected families matching a name and labels.
+
+    Args:
+        families (list): Collected families
+        sample_name (str): e.g. "signals_fetch_seconds_count"
+        **labels: Only samples with these label values
+
+    Returns:
+        float: The sum, 0 if nothing matches
+    """
+    return sum(
+        value
+        for family in families
+        for name, sample_labels, value in family["samples"]
+        if name == sample_name and all(sample_labels.get(k) == str(v) for k, v in labels.items())
+    )
+
+class _Metric:
+    type = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=None):
+        """
+        Args:
+            name (str): Metric name, e.g. "signals_fetch_total"
+            documentation (str): Help text
+            labelnames (tuple): Label names every sample must set
+            registry (Registry): Registry to add the metric to, the shared one by default
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        (registry or REGISTRY).register(self)
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames) or any(name not in labels for name in self.labelnames):
+            raise ValueError(f"{self.name} takes labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key):
+        return dict(zip(self.labelnames, key))
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self):
+        with self._lock:
+            items = list(self._values.items())
+        return [[self.name, self._labels(key), value] for key, value in items]
+
+class Gauge(_Metric):
+    """Value that goes up and down, set directly or read from a callback"""
+
+    type = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, function, **labels):
+        """Read the value from function() whenever the gauge is collected"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = function
+
+    def collect(self):
+        with self._lock:
+            items = list(self._values.items())
+        samples = []
+        for key, value in items:
+            if callable(value):
+                try:
+                    value = value()
+                except Exception as e:
+                    logger.error(f"Error reading gauge {self.name}: {e}")
+                    continue
+            samples.append([self.name, self._labels(key), value])
+        return samples
+
+class Histogram(_Metric):
+    """Distribution of observed values, e.g. latencies, in cumulative buckets"""
+
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=None):
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        super().__init__(name, documentation, labelnames, registry)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["counts"][i] += 1
+                    break
+            state["sum"] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the with block, errors included"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def collect(self):
+        with self._lock:
+            items = [(key, list(state["counts"]), state["sum"]) for key, state in self._values.items()]
+        samples = []
+        for key, counts, total in items:
+            labels = self._labels(key)
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                samples.append([f"{self.name}_bucket", dict(labels, le=_format_value(bound)), cumulative])
+            samples.append([f"{self.name}_sum", labels, total])
+            samples.append([f"{self.name}_count", labels, cumulative])
+        return samples
+
+# Metrics of this process
+REGISTRY = Registry()
+
+HANDLER_CALLS = Counter("bot_handler_calls_total", "Handler invocations, by handler", ["handler"])
+HANDLER_ERRORS = Counter("bot_handler_errors_total", "Handler invocations that raised, by handler", ["handler"])
+HANDLER_LATENCY = Histogram("bot_handler_seconds", "Time spent in each handler", ["handler"])
+
+SIGNAL_FETCHES = Counter("signals_fetch_total", "Signals API fetches, by outcome", ["outcome"])
+SIGNAL_FETCH_LATENCY = Histogram("signals_fetch_seconds", "Signals API fetch latency, retries included")
+SOURCE_FETCHES = Counter("signal_source_fetches_total", "Fetches per signal feed, by outcome", ["source", "outcome"])
+SOURCE_FETCH_LATENCY = Histogram("signal_source_fetch_seconds", "Fetch latency per signal feed", ["source"])
+SIGNAL_CONFLICTS = Counter("signal_conflicts_total", "Signals the feeds disagreed on, by how they were resolved",
+                           ["resolution"])
+CACHE_LOOKUPS = Counter("signal_cache_lookups_total", "Signal cache lookups, by result (hit, stale, miss)", ["result"])
+MESSAGES_FORMATTED = Counter("signal_messages_formatted_total", "Signal messages formatted")
+
+TELEGRAM_REQUESTS = Counter("telegram_requests_total", "Bot API requests, by method and outcome",
+                            ["method", "outcome"])
+TELEGRAM_LATENCY = Histogram("telegram_request_seconds", "Bot API request latency, by method", ["method"])
+BROADCAST_MESSAGES = Counter("broadcast_messages_total", "Fan-out messages, by outcome", ["outcome"])
+BROADCAST_THROUGHPUT = Gauge("broadcast_messages_per_second", "Throughput of the last finished broadcast")
+QUEUE_DEPTH = Gauge("queue_depth", "Items waiting, by queue", ["queue"])
+
+def instrument_handler(callback):
+    """
+    Wrap a handler callback to count its calls and errors and time it.
+
+    Errors are re-raised so the application's error handler still sees them.
+    """
+    handler = callback.__name__
+
+    @wraps(callback)
+    async def wrapper(*args, **kwargs):
+        HANDLER_CALLS.inc(handler=handler)
+        try:
+            with HANDLER_LATENCY.time(handler=handler):
+                return await callback(*args, **kwargs)
+        except Exception:
+            HANDLER_ERRORS.inc(handler=handler)
+            raise
+    return wrapper
@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import time
+from functools import partial
+from config import SIGNAL_CACHE_TTL, SIGNAL_CACHE_MAX_STALE
+from utils import fetch_trading_signals
+from signal_index import SignalDelta, SignalIndex, diff_signals
+from subscriptions import subscriptions
+from metrics import CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+class SignalCache:
+    """
+    Process-wide TTL cache in front of the signals API.
+
+    - Fresh entries are returned straight from memory.
+    - Concurrent callers share a single in-flight fetch (single-flight).
+    - Stale entries are returned immediately while one background
+      refresh runs (stale-while-revalidate).
+    - Each fetched list is kept as a SignalIndex ordered by due time, so
+      expired signals drop out without a refetch.
+    - Fetches are diffed against the previous list by content hash; the
+      index is only rebuilt when signals were added or removed, and the
+      delta is kept in last_delta.
+
+    All coroutines must run on the bot's event loop; peek() is safe to
+    call from other threads (e.g. Flask views).
+    """
+
+    def __init__(self, fetcher, ttl=SIGNAL_CACHE_TTL, max_stale=SIGNAL_CACHE_MAX_STALE, wait_timeout=20):
+        """
+        Args:
+            fetcher (callable): Coroutine function returning a list of Signals, raises on failure
+            ttl (float): Seconds a fetched list is considered fresh
+            max_stale (float): Extra seconds a stale list may still be served
+            wait_timeout (float): Max seconds a caller waits on an in-flight fetch
+        """
+        self._fetcher = fetcher
+        self._ttl = ttl
+        self._max_stale = max_stale
+        self._wait_timeout = wait_timeout
+        self._index = None
+        self._signals = []
+        self.last_delta = SignalDelta()
+        self._fetched_at = 0.0
+        self._retry_at = 0.0
+        self._inflight = None
+
+    async def get(self):
+        """
+        Get the current list of upcoming signals.
+
+        Returns:
+            list: Signals ordered by due time (possibly empty)
+        """
+        index = await self.get_index()
+        return index.upcoming() if index is not None else []
+
+    async def get_index(self):
+        """
+        Get the current signal snapshot.
+
+        Returns:
+            SignalIndex: The snapshot, or None if no usable one is available
+        """
+        now = time.monotonic()
+        age = now - self._fetched_at
+        if self._index is not None and age < self._ttl:
+            CACHE_LOOKUPS.inc(result="hit")
+            return self._index
+
+        if self._index is not None and age < self._ttl + self._max_stale:
+            CACHE_LOOKUPS.inc(result="stale")
+            # Serve the last good snapshot right away, refresh behind the scenes
+            if self._joinable() is None and now >= self._retry_at:
+                self._start_refresh()
+            return self._index
+
+        CACHE_LOOKUPS.inc(result="miss")
+        if self._joinable() is None and now < self._retry_at:
+            # Upstream failed recently, don't hammer it
+            return None
+
+        await self._wait(self._joinable() or self._start_refresh())
+
+        if self._index is None or time.monotonic() - self._fetched_at >= self._ttl + self._max_stale:
+            return None
+        return self._index
+
+    def peek(self):
+        """
+        Get the cached signals without triggering a fetch.
+
+        Returns:
+            list: Upcoming signals from the last good list, or an empty list
+        """
+        index = self._index
+        return index.upcoming() if index is not None else []
+
+    async def refresh(self):
+        """
+        Fetch from upstream now, joining a fetch that is already in flight.
+
+        Returns:
+            bool: True if the cache holds a list fetched by this refresh
+        """
+        started_at = time.monotonic()
+        await self._wait(self._joinable() or self._start_refresh())
+        return self._index is not None and self._fetched_at >= started_at
+
+    def invalidate(self):
+        """Mark the cached list as expired so the next get() refetches it"""
+        self._fetched_at = 0.0
+        self._retry_at = 0.0
+
+    def _joinable(self):
+        """The in-flight fetch, unless it was started on an earlier event loop"""
+        task = self._inflight
+        if task is not None and task.get_loop() is not asyncio.get_running_loop():
+            # Left over from a bot run that has since stopped, it will never finish here
+            self._inflight = None
+        return self._inflight
+
+    def _start_refresh(self):
+        self._inflight = asyncio.ensure_future(self._refresh())
+        return self._inflight
+
+    async def _wait(self, task):
+        try:
+            # Shield so a caller timing out never cancels the shared fetch
+            await asyncio.wait_for(asyncio.shield(task), self._wait_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Timed out waiting for signal refresh")
+
+    async def _refresh(self):
+        """Run one fetch and publish the result to every waiting caller"""
+        task = asyncio.current_task()
+        try:
+            signals = await self._fetcher()
+            delta = diff_signals(self._signals, signals)
+            if self._index is None or delta.changed:
+                self._index = SignalIndex(delta.signals)
+                self._signals = delta.signals
+            self.last_delta = delta
+            self._fetched_at = time.monotonic()
+            logger.info(f"Signal cache refreshed with {len(delta.signals)} signals "
+                        f"({len(delta.added)} added, {len(delta.removed)} removed)")
+        except Exception as e:
+            logger.error(f"Error refreshing signal cache: {e}")
+            self._retry_at = time.monotonic() + min(self._ttl, 5)
+        finally:
+            if self._inflight is task:
+                self._inflight = None
+
+# Shared cache used by every handler in the process
+signal_cache = SignalCache(partial(fetch_trading_signals, raise_on_error=True))
+
+async def get_signals():
+    """
+    Get the latest trading signals through the shared cache.
+
+    Returns:
+        list: Upcoming Signals ordered by due time, or empty list if none are available
+    """
+    return await signal_cache.get()
+
+async def get_next_signal(user_id=None):
+    """
+    Get the next upcoming trading signal through the shared cache.
+
+    Args:
+        user_id (int): Only consider signals this user is subscribed to
+
+    Returns:
+        Signal: The signal due soonest, or None if none are available
+    """
+    index = await signal_cache.get_index()
+    if index is None:
+        return None
+    if user_id is None:
+        return index.next()
+    await subscriptions.refresh()
+    return subscriptions.next_signal(user_id, index)
@@ -0,0 +1,236 @@
+import asyncio
+import logging
+import time
+import httpx
+from config import (
+    SIGNAL_SOURCES,
+    SIGNAL_CONFLICT_POLICY,
+    SIGNALS_API_KEY,
+    SIGNALS_DEADLINE,
+    SOURCE_TIMEZONE
+)
+from json_stream import iter_signal_records
+from signal_index import signal_timestamp
+from signal_model import Direction, normalize_asset
+from signal_schema import FieldMapping, SignalNormalizer, signal_normalizer
+from signals_client import CircuitOpenError, SignalsClient, UpstreamError, signals_client
+from metrics import SOURCE_FETCHES, SOURCE_FETCH_LATENCY, SIGNAL_CONFLICTS
+
+logger = logging.getLogger(__name__)
+
+# How conflicting directions for the same asset and time are resolved
+CONFLICT_POLICIES = ("drop", "first", "majority")
+
+class SignalFeed:
+    """One signals API: its own client, circuit breaker, deadline and normalizer"""
+
+    def __init__(self, name, client, normalizer):
+        """
+        Args:
+            name (str): Name used in logs and metrics
+            client (SignalsClient): Client for the feed's URL, its deadline bounds every fetch
+            normalizer (SignalNormalizer): Normalizer for the feed's payload format
+        """
+        self.name = name
+        self.client = client
+        self.normalizer = normalizer
+
+    @classmethod
+    def from_config(cls, config, index=0):
+        """
+        Build a feed from one SIGNAL_SOURCES entry.
+
+        Args:
+            config (dict): {"url": ..., "name", "api_key", "deadline", "timezone", "mapping"}
+            index (int): Position in SIGNAL_SOURCES, for the default name
+
+        Returns:
+            SignalFeed: The feed
+        """
+        client = SignalsClient(
+            url=config["url"],
+            api_key=config.get("api_key", SIGNALS_API_KEY),
+            deadline=float(config.get("deadline", SIGNALS_DEADLINE))
+        )
+        normalizer = SignalNormalizer(
+            mapping=FieldMapping.from_config(config.get("mapping")) or signal_normalizer.configured_mapping,
+            source_tz=config.get("timezone", SOURCE_TIMEZONE)
+        )
+        return cls(config.get("name") or f"source{index + 1}", client, normalizer)
+
+    async def fetch(self, stop_after=None):
+        """
+        Fetch and normalize the feed's signals.
+
+        Args:
+            stop_after (int): Stop reading the response after this many
+                upcoming signals, see SignalNormalizer.normalize_stream
+
+        Returns:
+            list: Upcoming Signals, in the feed's order
+
+        Raises:
+            The errors of SignalsClient.fetch
+        """
+        async def handle(response):
+            # The API returns a dictionary with 'signals', 'data', or directly an array of signals
+            records = iter_signal_records(response.aiter_text())
+            return await self.normalizer.normalize_stream(records, stop_after=stop_after)
+
+        started = time.perf_counter()
+        try:
+            signals = await self.client.fetch(handle)
+        except CircuitOpenError:
+            SOURCE_FETCHES.inc(source=self.name, outcome="circuit_open")
+            raise
+        except BaseException as e:
+            SOURCE_FETCHES.inc(source=self.name, outcome=_outcome(e))
+            SOURCE_FETCH_LATENCY.observe(time.perf_counter() - started, source=self.name)
+            raise
+        SOURCE_FETCHES.inc(source=self.name, outcome="ok")
+        SOURCE_FETCH_LATENCY.observe(time.perf_counter() - started, source=self.name)
+        return signals
+
+def _outcome(error):
+    if isinstance(error, asyncio.TimeoutError):
+        return "timeout"
+    if isinstance(error, (httpx.HTTPError, UpstreamError)):
+        return "upstream_error"
+    if isinstance(error, ValueError):
+        return "parse_error"
+    return "error"
+
+def merge_signals(sources, policy=SIGNAL_CONFLICT_POLICY):
+    """
+    Merge the signals of several feeds into one time-ordered list.
+
+    Signals for the same asset and time are one signal, whichever feeds
+    list them. Feeds that disagree on its direction are resolved by
+    policy; an UNKNOWN direction never conflicts with a known one.
+
+    Args:
+        sources (list): One list of Signals per feed, in priority order
+        policy (str): "drop", "first" or "majority"
+
+    Returns:
+        list: Signals ordered by due time
+    """
+    if policy not in CONFLICT_POLICIES:
+        raise ValueError(f"Conflict policy must be one of {CONFLICT_POLICIES}, not {policy!r}")
+
+    # (asset, time) -> direction -> [first signal, number of feeds]
+    slots = {}
+    for signals in sources:
+        for signal in signals:
+            when = signal.original_time if signal.timestamp is None else signal.timestamp
+            by_direction = slots.setdefault((normalize_asset(signal.asset), when), {})
+            entry = by_direction.get(signal.direction)
+            if entry is None:
+                by_direction[signal.direction] = [signal, 1]
+            else:
+                entry[1] += 1
+
+    merged = []
+    for by_direction in slots.values():
+        if len(by_direction) > 1:
+            by_direction = {direction: entry for direction, entry in by_direction.items()
+                            if direction is not Direction.UNKNOWN}
+        if len(by_direction) == 1:
+            merged.append(next(iter(by_direction.values()))[0])
+            continue
+        winner = _resolve_conflict(list(by_direction.values()), policy)
+        SIGNAL_CONFLICTS.inc(resolution="dropped" if winner is None else policy)
+        if winner is None:
+            logger.info("Dropping conflicting signals: %s",
+                        ", ".join(f"{signal.asset} {signal.direction}" for signal, _ in by_direction.values()))
+        else:
+            merged.append(winner)
+
+    merged.sort(key=signal_timestamp)
+    return merged
+
+def _resolve_conflict(entries, policy):
+    """Pick the winner of conflicting [signal, feeds] entries, listed in feed order, or None"""
+    if policy == "first":
+        return entries[0][0]
+    if policy == "majority":
+        entries = sorted(entries, key=lambda entry: entry[1], reverse=True)
+        if entries[0][1] > entries[1][1]:
+            return entries[0][0]
+    return None
+
+class SignalAggregator:
+    """
+    Fetches every configured feed concurrently and merges the results.
+
+    Each feed is bounded by its own deadline, so a fetch takes as long as
+    the slowest feed rather than the sum of all of them, and a slow or
+    failing feed only costs its own signals.
+    """
+
+    def __init__(self, feeds, policy=SIGNAL_CONFLICT_POLICY):
+        """
+        Args:
+            feeds (list): SignalFeeds, in priority order
+            policy (str): Conflict policy passed to merge_signals
+        """
+        if policy not in CONFLICT_POLICIES:
+            raise ValueError(f"Conflict policy must be one of {CONFLICT_POLICIES}, not {policy!r}")
+        self.feeds = feeds
+        self.policy = policy
+
+    async def fetch(self, stop_after=None):
+        """
+        Fetch all feeds and merge their signals.
+
+        Args:
+            stop_after (int): Upcoming signals read per feed, in document
+                order, and returned; None reads every feed in full. A
+                scan cutoff, so not necessarily the soonest signals
+
+        Returns:
+            list: Upcoming Signals ordered by due time
+
+        Raises:
+            The error of the first feed, if every feed failed
+        """
+        if len(self.feeds) == 1:
+            signals = await self.feeds[0].fetch(stop_after)
+            signals.sort(key=signal_timestamp)
+            return signals
+
+        results = await asyncio.gather(*(feed.fetch(stop_after) for feed in self.feeds), return_exceptions=True)
+        sources = []
+        errors = []
+        for feed, result in zip(self.feeds, results):
+            if isinstance(result, BaseException):
+                logger.warning(f"Signal feed {feed.name} failed: {result!r}")
+                errors.append(result)
+            else:
+                sources.append(result)
+        if not sources:
+            raise errors[0]
+
+        signals = merge_signals(sources, self.policy)
+        if stop_after:
+            signals = signals[:stop_after]
+        return signals
+
+    async def aclose(self):
+        """Close the pooled connections of every feed on the current event loop"""
+        for feed in self.feeds:
+            await feed.client.aclose()
+
+def load_feeds(sources=SIGNAL_SOURCES):
+    """
+    Build the feeds from SIGNAL_SOURCES.
+
+    Returns:
+        list: The configured feeds, or only the SIGNALS_API_URL feed if none are
+    """
+    if not sources:
+        return [SignalFeed("default", signals_client, signal_normalizer)]
+    return [SignalFeed.from_config(config, index) for index, config in enumerate(sources)]
+
+# Shared aggregator used by fetch_trading_signals
+signal_aggregator = SignalAggregator(load_feeds())
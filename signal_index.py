@@ -0,0 +1,145 @@
+import math
+import time
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from signal_model import normalize_asset
+
+def signal_timestamp(signal):
+    """
+    Epoch seconds a signal is due, or infinity for signals without one.
+
+    Undated signals sort after every dated one and never expire.
+    """
+    timestamp = signal.timestamp
+    return math.inf if timestamp is None else timestamp
+
+@dataclass
+class SignalDelta:
+    """
+    What changed between two snapshots of the signals.
+
+    signals is the new snapshot in fetch order, without duplicates.
+    Unchanged signals are the objects of the previous snapshot, so
+    anything keyed on them stays valid.
+    """
+    added: list = field(default_factory=list)
+    removed: list = field(default_factory=list)
+    unchanged: list = field(default_factory=list)
+    signals: list = field(default_factory=list)
+
+    @property
+    def changed(self):
+        """True if signals were added or removed"""
+        return bool(self.added or self.removed)
+
+def diff_signals(previous, current):
+    """
+    Compare a fresh fetch against the previous snapshot by content hash.
+
+    Args:
+        previous (iterable): Signals of the previous snapshot
+        current (iterable): Freshly fetched signals
+
+    Returns:
+        SignalDelta: Added, removed and unchanged signals
+    """
+    before = {signal.id: signal for signal in previous}
+    delta = SignalDelta()
+    seen = set()
+    for signal in current:
+        key = signal.id
+        if key in seen:
+            continue
+        seen.add(key)
+        old = before.get(key)
+        if old is None:
+            delta.added.append(signal)
+        else:
+            delta.unchanged.append(old)
+            signal = old
+        delta.signals.append(signal)
+    delta.removed = [signal for key, signal in before.items() if key not in seen]
+    return delta
+
+class SignalIndex:
+    """
+    Snapshot of signals ordered by due time.
+
+    Lookups bisect the sorted timestamps, so "next signal", "next N" and
+    per-asset queries are logarithmic in the number of signals. Expired
+    signals are dropped lazily as queries move the clock forward; the
+    snapshot never needs to be refetched for that, and a new snapshot
+    replaces it on every refresh.
+    """
+
+    def __init__(self, signals=(), clock=time.time):
+        """
+        Args:
+            signals (iterable): Signals, in any order
+            clock (callable): Returns the current epoch seconds
+        """
+        ordered = sorted(signals, key=signal_timestamp)
+        self._clock = clock
+        self._times = [signal_timestamp(signal) for signal in ordered]
+        self._signals = ordered
+        self._start = 0
+        self._by_asset = {}
+        for timestamp, signal in zip(self._times, ordered):
+            times, signals_for_asset = self._by_asset.setdefault(normalize_asset(signal.asset), ([], []))
+            times.append(timestamp)
+            signals_for_asset.append(signal)
+
+    def __len__(self):
+        self.expire()
+        return len(self._signals) - self._start
+
+    def expire(self, now=None):
+        """
+        Drop signals due before now.
+
+        Args:
+            now (float): Epoch seconds, defaults to the clock
+        """
+        now = self._clock() if now is None else now
+        # Only ever moves forward, so readers on other threads see a consistent view
+        self._start = max(self._start, bisect_left(self._times, now, self._start))
+
+    def next(self, now=None):
+        """
+        Returns:
+            Signal: The next upcoming signal, or None
+        """
+        self.expire(now)
+        if self._start < len(self._signals):
+            return self._signals[self._start]
+        return None
+
+    def upcoming(self, limit=None, now=None):
+        """
+        Args:
+            limit (int): Max number of signals, None for all
+            now (float): Epoch seconds, defaults to the clock
+
+        Returns:
+            list: Upcoming signals ordered by due time
+        """
+        self.expire(now)
+        end = len(self._signals) if limit is None else self._start + limit
+        return self._signals[self._start:end]
+
+    def for_asset(self, asset, after=None, limit=None):
+        """
+        Upcoming signals for one asset.
+
+        Args:
+            asset (str): The asset, e.g. "EUR/USD", in any case
+            after (float): Only signals due at or after this epoch, defaults to now
+            limit (int): Max number of signals, None for all
+
+        Returns:
+            list: Signals ordered by due time
+        """
+        times, signals = self._by_asset.get(normalize_asset(asset), ((), ()))
+        start = bisect_left(times, self._clock() if after is None else after)
+        end = len(signals) if limit is None else start + limit
+        return list(signals[start:end])
@@ -0,0 +1,181 @@
+import hashlib
+from dataclasses import dataclass
+from enum import StrEnum
+from functools import lru_cache
+from config import TARGET_TIMEZONE
+from timezones import format_wall, to_local
+
+# Direction words the API uses, in English and Portuguese
+DIRECTION_SIDES = {
+    "call": "CALL",
+    "compra": "CALL",
+    "alta": "CALL",
+    "put": "PUT",
+    "venda": "PUT",
+    "baixa": "PUT",
+}
+
+@lru_cache(maxsize=256)
+def _classify_direction(direction):
+    direction_lower = direction.strip().lower()
+    side = DIRECTION_SIDES.get(direction_lower)
+    if side is not None:
+        return side
+    # Variants such as "CALL ⬆" or "Compra forte" still contain a known word
+    for word, side in DIRECTION_SIDES.items():
+        if word in direction_lower:
+            return side
+    return direction.upper()
+
+def direction_side(direction):
+    """
+    Map an API direction to the side it trades.
+
+    Args:
+        direction (str): Direction as sent by the API, e.g. "call", "Compra" or "PUT"
+
+    Returns:
+        str: "CALL" or "PUT", or the direction upper-cased if it is neither
+    """
+    if not isinstance(direction, str):
+        return "UNKNOWN"
+    return _classify_direction(direction)
+
+class Direction(StrEnum):
+    """The side a signal trades"""
+    CALL = "CALL"
+    PUT = "PUT"
+    UNKNOWN = "UNKNOWN"
+
+    @classmethod
+    def parse(cls, direction):
+        """
+        Args:
+            direction (str): Direction as sent by the API, e.g. "compra"
+
+        Returns:
+            Direction: CALL, PUT, or UNKNOWN if it is neither; what the API
+                sent is kept for display in Signal.direction_text
+        """
+        return cls.__members__.get(direction_side(direction), cls.UNKNOWN)
+
+def normalize_asset(asset):
+    """Assets are matched case-insensitively, e.g. "brlusd_otc" and "BRLUSD_otc" """
+    return asset.strip().upper() if isinstance(asset, str) else ""
+
+def content_hash(asset, direction, source_time):
+    """
+    Stable identity of a signal, the same on every fetch and in every process.
+
+    Args:
+        asset (str): The asset, in any case
+        direction (str): e.g. "CALL", in any case
+        source_time: Epoch seconds the signal is due, or its entry time
+            as given by the API for undated signals
+
+    Returns:
+        str: 16 hex digits
+    """
+    direction = direction.strip().upper() if isinstance(direction, str) else ""
+    key = f"{normalize_asset(asset)}|{direction}|{source_time}"
+    return hashlib.blake2b(key.encode(), digest_size=8).hexdigest()
+
+@dataclass(frozen=True, slots=True)
+class Signal:
+    """
+    A processed trading signal.
+
+    Times are parsed once, when the signal is built: timestamp is the UTC
+    epoch the signal is due and wall_time the same instant on the clock
+    of the target timezone, so showing it is a cached strftime instead
+    of a reparse. Signals are immutable and can be shared freely between
+    the cache, broadcasts and the expiry scheduler.
+
+    direction is the typed category used for routing and matching;
+    direction_text is what messages show, the API's direction as
+    direction_side() classifies it, so a direction that is neither CALL
+    nor PUT is shown as sent (upper-cased) rather than as UNKNOWN.
+    """
+    asset: str
+    direction: Direction
+    original_time: str = None
+    timestamp: int = None
+    wall_time: int = None
+    zone: str = ""
+    id: str = None
+    direction_text: str = None
+
+    def __post_init__(self):
+        if self.direction_text is None:
+            object.__setattr__(self, "direction_text", self.direction.value)
+        if self.id is None:
+            source_time = self.original_time if self.timestamp is None else self.timestamp
+            object.__setattr__(self, "id", content_hash(self.asset, self.direction, source_time))
+
+    @classmethod
+    def at(cls, asset, direction, timestamp, original_time=None, tz=TARGET_TIMEZONE):
+        """
+        Build a signal due at a UTC epoch.
+
+        Args:
+            asset (str): The asset
+            direction (str): Direction as sent by the API
+            timestamp (int): UTC epoch seconds the signal is due
+            original_time (str): Entry time as sent by the API
+            tz (str or tzinfo): Timezone the signal is shown in
+
+        Returns:
+            Signal: The signal
+        """
+        wall_time, zone = to_local(timestamp, tz)
+        return cls(asset, Direction.parse(direction), original_time, timestamp, wall_time, zone,
+                   direction_text=direction_side(direction))
+
+    @property
+    def converted_time(self):
+        """Entry time in the target timezone, e.g. "2024-05-01 09:00:00 IST" """
+        if self.wall_time is None:
+            return "Unknown"
+        return format_wall(self.wall_time, self.zone)
+
+    def to_dict(self):
+        """
+        Returns:
+            dict: JSON-serializable fields, converted_time included for readers
+        """
+        return {
+            "id": self.id,
+            "asset": self.asset,
+            "direction": self.direction.value,
+            "direction_text": self.direction_text,
+            "original_time": self.original_time,
+            "timestamp": self.timestamp,
+            "wall_time": self.wall_time,
+            "zone": self.zone,
+            "converted_time": self.converted_time
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Rebuild a signal from to_dict() output.
+
+        Dicts without a wall time, as stored before signals had one, are
+        shown in the target timezone; without a direction_text, the
+        direction is shown.
+
+        Returns:
+            Signal: The signal
+        """
+        direction = data.get("direction_text") or data.get("direction")
+        if data.get("wall_time") is None and data.get("timestamp") is not None:
+            return cls.at(data.get("asset"), direction, data["timestamp"], data.get("original_time"))
+        return cls(
+            data.get("asset"),
+            Direction.parse(direction),
+            data.get("original_time"),
+            data.get("timestamp"),
+            data.get("wall_time"),
+            data.get("zone", ""),
+            direction_text=direction_side(direction)
+        )
@@ -0,0 +1,148 @@
+import asyncio
+import logging
+from telegram.ext import ContextTypes
+from banner import banner
+from broadcast import broadcaster
+from signal_cache import signal_cache
+from signal_index import SignalDelta, diff_signals
+from storage import SIGNAL_SNAPSHOT, SIGNALS_SENT, store
+from subscriptions import subscriptions
+from utils import format_signal_message
+
+logger = logging.getLogger(__name__)
+
+class SignalPoller:
+    """
+    Polls the signals API on a fixed interval through the shared cache and
+    pushes newly appeared signals to the users subscribed to them.
+
+    Only the elected leader process polls, so every snapshot that differs
+    from the last one is also published to the store along with a count
+    of delivered messages, for the web workers that don't run the bot.
+    """
+
+    def __init__(self, cache, engine, banner=None, router=subscriptions, store=store):
+        """
+        Args:
+            cache (SignalCache): Cache holding the signal snapshot
+            engine (BroadcastEngine): Engine used for the push fan-out
+            banner (BannerCache): Banner attached to pushes, None sends text only
+            router (SubscriptionRouter): Picks the chats each signal goes to
+            store (Storage): Store the snapshot and counters are published to
+        """
+        self._cache = cache
+        self._engine = engine
+        self._banner = banner
+        self._router = router
+        self._store = store
+        self._seen = None
+        self._pushes = set()
+
+    def diff(self, signals):
+        """
+        Compare a fresh list against the last snapshot by content hash.
+
+        The first snapshot only seeds the poller so a restart does not
+        re-announce every signal of the day.
+
+        Args:
+            signals (list): Freshly fetched signals
+
+        Returns:
+            SignalDelta: Signals added, removed and unchanged since the previous snapshot
+        """
+        if self._seen is None:
+            self._seen = diff_signals((), signals).signals
+            logger.info(f"Seeded signal snapshot with {len(self._seen)} signals")
+            return SignalDelta(unchanged=list(self._seen), signals=list(self._seen))
+
+        delta = diff_signals(self._seen, signals)
+        self._seen = delta.signals
+        return delta
+
+    async def poll(self, context: ContextTypes.DEFAULT_TYPE):
+        """
+        Job callback: refresh the snapshot and push new signals.
+
+        Returns:
+            asyncio.Task: The running push, or None if nothing was new
+        """
+        if not await self._cache.refresh():
+            logger.warning("Signal poll failed, keeping previous snapshot")
+            return None
+
+        seeding = self._seen is None
+        delta = self.diff(self._cache.peek())
+        if seeding or delta.changed:
+            try:
+                await asyncio.to_thread(
+                    self._store.put_state, SIGNAL_SNAPSHOT, [signal.to_dict() for signal in delta.signals]
+                )
+            except Exception as e:
+                logger.error(f"Error publishing signal snapshot: {e}")
+
+        new_signals = delta.added
+        if not new_signals:
+            return None
+
+        await self._router.refresh()
+        jobs = []
+        for signal in new_signals:
+            chat_ids = self._router.route(signal)
+            if not chat_ids:
+                continue
+            send = self._make_sender(context.bot, format_signal_message(signal), self._banner)
+            jobs.extend((chat_id, send) for chat_id in chat_ids)
+        if not jobs:
+            return None
+
+        logger.info(f"Pushing {len(new_signals)} new signals as {len(jobs)} messages")
+
+        # Deliver in the background so a large fan-out never delays the next poll
+        push = asyncio.create_task(self._push(jobs), name="signal-push")
+        self._pushes.add(push)
+        push.add_done_callback(self._pushes.discard)
+        return push
+
+    async def _push(self, jobs):
+        """Run the fan-out, then add the delivered messages to the shared count"""
+        result = await self._engine.broadcast(jobs, progress=self._log_progress, progress_every=500)
+        try:
+            await asyncio.to_thread(self._store.increment, SIGNALS_SENT, result.delivered)
+        except Exception as e:
+            logger.error(f"Error updating sent signal count: {e}")
+        return result
+
+    @staticmethod
+    def _make_sender(bot, message, banner):
+        async def send(chat_id):
+            if banner is not None:
+                try:
+                    await banner.send(
+                        bot.send_photo,
+                        chat_id=chat_id,
+                        caption=message,
+                        parse_mode='Markdown'
+                    )
+                    return
+                except FileNotFoundError:
+                    # Fallback to text-only if image not found
+                    pass
+            await bot.send_message(
+                chat_id=chat_id,
+                text=message,
+                parse_mode='Markdown'
+            )
+        return send
+
+    @staticmethod
+    def _log_progress(result):
+        logger.info(f"Signal push progress: {result.done}/{result.total} "
+                    f"({result.delivered} delivered, {result.failed} failed)")
+
+# Shared poller driven by the bot's job queue
+signal_poller = SignalPoller(signal_cache, broadcaster, banner)
+
+async def poll_signals(context: ContextTypes.DEFAULT_TYPE):
+    """Job callback registered with the job queue in bot.setup_bot()"""
+    await signal_poller.poll(context)
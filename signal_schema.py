@@ -0,0 +1,250 @@
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from config import SOURCE_TIMEZONE, TARGET_TIMEZONE, SIGNAL_FIELD_MAPPING
+from timezones import convert_times, resolve_timezone
+from signal_model import Direction, Signal, direction_side
+from logging_setup import SampledLogger
+
+logger = logging.getLogger(__name__)
+# A malformed payload repeats the same problem for every record
+bad_record_log = SampledLogger(logger)
+
+# Field names the upstream API has used over time, in order of preference
+DEFAULT_FIELD_CANDIDATES = {
+    "time": ("entrada", "time", "entry", "entry_time", "hora", "horario", "time_entry"),
+    "asset": ("ativos", "asset", "currency", "par", "pair", "symbol", "moeda"),
+    "direction": ("direcao_principal", "direction", "direcao", "operation", "tipo", "type"),
+}
+
+# Number of records inspected when detecting the mapping of a response
+DETECTION_SAMPLE_SIZE = 20
+
+# Records converted together when normalizing a streamed response
+STREAM_BATCH_SIZE = 50
+
+@dataclass(frozen=True)
+class FieldMapping:
+    """Which payload field holds each part of a signal"""
+    time: str
+    asset: str = None
+    direction: str = None
+
+    @classmethod
+    def from_config(cls, config):
+        """Build a mapping from a {"time": ..., "asset": ..., "direction": ...} dict"""
+        if not config:
+            return None
+        return cls(time=config["time"], asset=config.get("asset"), direction=config.get("direction"))
+
+def detect_mapping(records, candidates=DEFAULT_FIELD_CANDIDATES, sample_size=DETECTION_SAMPLE_SIZE):
+    """
+    Detect the field mapping of a response from a sample of its records.
+
+    Args:
+        records (list): Raw signal records
+        candidates (dict): Candidate field names per role, in order of preference
+        sample_size (int): Number of records to inspect
+
+    Returns:
+        FieldMapping: The detected mapping, or None if no time field was found
+    """
+    sample = [record for record in records[:sample_size] if isinstance(record, dict)]
+    found = {}
+    for role, fields in candidates.items():
+        found[role] = next(
+            (field for field in fields if any(record.get(field) for record in sample)),
+            None
+        )
+    if not found["time"]:
+        return None
+    return FieldMapping(**found)
+
+class SignalNormalizer:
+    """
+    Converts raw API records into Signals.
+
+    The field mapping is taken from configuration or detected once per
+    response and compiled into a single extractor; timezones are resolved
+    once when the normalizer is built.
+    """
+
+    def __init__(self, mapping=None, source_tz=SOURCE_TIMEZONE, target_tz=TARGET_TIMEZONE,
+                 candidates=DEFAULT_FIELD_CANDIDATES):
+        """
+        Args:
+            mapping (FieldMapping): Fixed mapping; None detects it per response
+            source_tz (str or tzinfo): Timezone of the API's entry times
+            target_tz (str or tzinfo): Timezone signals are shown in
+            candidates (dict): Candidate field names used for detection and fallback
+        """
+        self.configured_mapping = mapping
+        self.mapping = mapping
+        self.candidates = candidates
+        self.source_tz = resolve_timezone(source_tz)
+        self.target_tz = resolve_timezone(target_tz)
+
+    def compile(self, mapping):
+        """
+        Build an extractor for one mapping.
+
+        Records missing a mapped field fall back to probing the candidate
+        fields, so a heterogeneous payload is still handled.
+
+        Returns:
+            callable: record -> (entry_time, asset, direction)
+        """
+        time_field, asset_field, direction_field = mapping.time, mapping.asset, mapping.direction
+        time_fields = self.candidates["time"]
+        asset_fields = self.candidates["asset"]
+        direction_fields = self.candidates["direction"]
+
+        def probe(record, fields):
+            for field in fields:
+                value = record.get(field)
+                if value:
+                    return value
+            return None
+
+        def extract(record):
+            entry_time = record.get(time_field) or probe(record, time_fields)
+            asset = (record.get(asset_field) if asset_field else None) or probe(record, asset_fields)
+            direction = (record.get(direction_field) if direction_field else None) or probe(record, direction_fields)
+            return entry_time, asset or "Unknown", direction or "Unknown"
+
+        return extract
+
+    def _select_mapping(self, records):
+        """The configured mapping, or the one detected from records"""
+        mapping = self.configured_mapping or detect_mapping(records, self.candidates)
+        if mapping is None:
+            if records:
+                logger.warning("Could not detect the entry time field of the API response")
+        elif mapping != self.mapping:
+            logger.info("Using signal field mapping: %s", mapping)
+            self.mapping = mapping
+        return mapping
+
+    def normalize(self, records, now=None):
+        """
+        Convert a whole response in one pass, dropping expired signals.
+
+        Args:
+            records (list): Raw signal records from the API
+            now (datetime): Current time, defaults to the real clock
+
+        Returns:
+            list: Processed Signals
+        """
+        mapping = self._select_mapping(records)
+        if mapping is None:
+            return []
+        processed_signals = self._convert(records, mapping, now)
+        logger.debug("Total processed signals: %d", len(processed_signals))
+        return processed_signals
+
+    async def normalize_stream(self, records, now=None, stop_after=None, batch_size=STREAM_BATCH_SIZE):
+        """
+        Convert records as they arrive from a streamed response.
+
+        Records are converted in small batches; the mapping is detected from
+        the first batch and reused for the rest of the response.
+
+        stop_after is a scan cutoff, not a "soonest N": reading stops at the
+        first stop_after upcoming signals in document order, so with a feed
+        that isn't sorted by time a sooner signal further down the response
+        is never seen.
+
+        Args:
+            records: Async iterator of raw signal records
+            now (datetime): Current time, defaults to the real clock
+            stop_after (int): Stop reading once this many upcoming signals were found
+            batch_size (int): Records converted together
+
+        Returns:
+            list: Processed Signals in document order, at most stop_after of them
+        """
+        mapping = None
+        processed_signals = []
+        batch = []
+        async for record in records:
+            batch.append(record)
+            if len(batch) < batch_size:
+                continue
+            mapping = mapping or self._select_mapping(batch)
+            if mapping is not None:
+                processed_signals.extend(self._convert(batch, mapping, now))
+            batch = []
+            if stop_after and len(processed_signals) >= stop_after:
+                # Stop reading the rest of the response
+                if hasattr(records, "aclose"):
+                    await records.aclose()
+                break
+        else:
+            mapping = mapping or self._select_mapping(batch)
+            if batch and mapping is not None:
+                processed_signals.extend(self._convert(batch, mapping, now))
+
+        if stop_after:
+            processed_signals = processed_signals[:stop_after]
+        logger.debug("Total processed signals: %d", len(processed_signals))
+        return processed_signals
+
+    def _convert(self, records, mapping, now):
+        """Extract, convert and filter records with a known mapping"""
+        extract = self.compile(mapping)
+
+        extracted = []
+        for signal in records:
+            try:
+                entry_time, asset, direction = extract(signal)
+            except Exception as e:
+                bad_record_log.warning("Error processing signal %r: %s", signal, e)
+                continue
+            if not entry_time:
+                bad_record_log.warning("Signal missing entry time: %r", signal)
+                continue
+            # Handle numeric format (e.g., 1430 for 14:30)
+            entry_time = str(entry_time)
+            if ":" not in entry_time and len(entry_time) == 4 and entry_time.isdigit():
+                entry_time = f"{entry_time[:2]}:{entry_time[2:]}"
+            extracted.append((entry_time, asset, direction))
+
+        # The API provides times in HH:MM format in the source timezone, for today
+        now = time.time() if now is None else now.timestamp()
+        day = datetime.fromtimestamp(now, self.source_tz).date()
+        converted = convert_times(
+            [entry_time for entry_time, _, _ in extracted], self.source_tz, self.target_tz, day=day
+        )
+        upcoming = converted.upcoming(now)
+        skipped = len(extracted) - len(upcoming)
+        if skipped:
+            logger.debug("Skipping %d expired or unparseable signals", skipped)
+
+        debug = logger.isEnabledFor(logging.DEBUG)
+        processed_signals = []
+        seen = set()
+        for index in upcoming:
+            entry_time, asset, direction = extracted[index]
+            processed_signal = Signal(
+                asset=asset,
+                direction=Direction.parse(direction),
+                direction_text=direction_side(direction),
+                original_time=entry_time,
+                timestamp=converted.epochs[index],
+                wall_time=converted.walls[index],
+                zone=converted.zones[index]
+            )
+            if processed_signal.id in seen:
+                # The API sometimes lists the same signal twice
+                continue
+            seen.add(processed_signal.id)
+            processed_signals.append(processed_signal)
+            if debug:
+                logger.debug("Added signal: %s", processed_signal)
+
+        return processed_signals
+
+# Shared normalizer, with the mapping from SIGNAL_FIELD_MAPPING if configured
+signal_normalizer = SignalNormalizer(mapping=FieldMapping.from_config(SIGNAL_FIELD_MAPPING))
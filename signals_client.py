@@ -0,0 +1,199 @@
+import asyncio
+import logging
+import random
+import time
+import weakref
+import httpx
+from config import (
+    SIGNALS_API_URL,
+    SIGNALS_API_KEY,
+    SIGNALS_CONNECT_TIMEOUT,
+    SIGNALS_READ_TIMEOUT,
+    SIGNALS_DEADLINE,
+    SIGNALS_MAX_RETRIES,
+    SIGNALS_POOL_SIZE,
+    SIGNALS_BREAKER_THRESHOLD,
+    SIGNALS_BREAKER_RESET
+)
+
+logger = logging.getLogger(__name__)
+
+# Statuses worth retrying; any other 4xx is the caller's fault
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class CircuitOpenError(Exception):
+    """The signals API is failing and calls are being short-circuited"""
+
+class UpstreamError(Exception):
+    """The signals API returned a status that is worth retrying"""
+
+class CircuitBreaker:
+    """
+    Classic closed/open/half-open circuit breaker.
+
+    After `threshold` consecutive failures the circuit opens and every call
+    fails fast for `reset_timeout` seconds. Then a single trial call is let
+    through: success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, threshold=SIGNALS_BREAKER_THRESHOLD, reset_timeout=SIGNALS_BREAKER_RESET):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+
+    @property
+    def state(self):
+        """One of "closed", "open" or "half_open" """
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        """
+        Check whether a call may go upstream, claiming the trial slot when half-open.
+
+        Returns:
+            bool: True if the call may proceed
+        """
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and not self._trial_running:
+            self._trial_running = True
+            return True
+        return False
+
+    def release(self):
+        """Give back the trial slot after a call that neither succeeded nor failed upstream"""
+        self._trial_running = False
+
+    def record_success(self):
+        if self.opened_at is not None:
+            logger.info("Signals API recovered, closing circuit")
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self._trial_running or self.failures >= self.threshold:
+            if self.state == "closed":
+                logger.warning(f"Signals API failed {self.failures} times in a row, opening circuit")
+            self.opened_at = time.monotonic()
+        self._trial_running = False
+
+class SignalsClient:
+    """
+    Upstream client for the signals API.
+
+    Keeps one pooled keep-alive httpx client per event loop, retries
+    transient failures with bounded exponential backoff inside an overall
+    deadline, and short-circuits through a CircuitBreaker while the API
+    is down so callers fall back to their cached snapshot right away.
+    """
+
+    def __init__(self, url=SIGNALS_API_URL, api_key=SIGNALS_API_KEY, deadline=SIGNALS_DEADLINE,
+                 max_retries=SIGNALS_MAX_RETRIES, backoff=0.5, max_backoff=4.0, breaker=None,
+                 transport=None):
+        """
+        Args:
+            url (str): Signals API URL
+            api_key (str): Optional bearer token
+            deadline (float): Max seconds for a call, retries and backoff included
+            max_retries (int): Retries after the first attempt
+            backoff (float): Delay before the first retry, doubled on each retry
+            max_backoff (float): Cap for a single backoff delay
+            breaker (CircuitBreaker): Breaker to use, a new one by default
+            transport (httpx.AsyncBaseTransport): Custom transport, for tests
+        """
+        self.url = url
+        self.headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.breaker = breaker or CircuitBreaker()
+        self._transport = transport
+        # httpx clients are bound to the event loop that created them
+        self._clients = weakref.WeakKeyDictionary()
+
+    def _client(self):
+        loop = asyncio.get_running_loop()
+        client = self._clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                headers=self.headers,
+                timeout=httpx.Timeout(SIGNALS_READ_TIMEOUT, connect=SIGNALS_CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=SIGNALS_POOL_SIZE,
+                    max_keepalive_connections=SIGNALS_POOL_SIZE,
+                    keepalive_expiry=60
+                ),
+                transport=self._transport
+            )
+            self._clients[loop] = client
+        return client
+
+    async def aclose(self):
+        """Close the pooled connections of the current event loop"""
+        client = self._clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    async def fetch(self, handle):
+        """
+        GET the signals API and process the streamed response.
+
+        Args:
+            handle (callable): Coroutine function taking the httpx.Response,
+                called with the body still unread; its result is returned
+
+        Returns:
+            The result of handle
+
+        Raises:
+            CircuitOpenError: If the circuit is open
+            asyncio.TimeoutError: If the deadline passed
+            httpx.HTTPError, UpstreamError, ValueError: If the last attempt failed
+        """
+        if not self.breaker.allow():
+            raise CircuitOpenError("Signals API circuit is open")
+        try:
+            result = await asyncio.wait_for(self._fetch_with_retries(handle), self.deadline)
+        except (httpx.TransportError, httpx.HTTPStatusError, UpstreamError, asyncio.TimeoutError):
+            self.breaker.record_failure()
+            raise
+        except BaseException:
+            # Not an upstream failure; just hand the trial slot back
+            self.breaker.release()
+            raise
+        self.breaker.record_success()
+        return result
+
+    async def _fetch_with_retries(self, handle):
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            try:
+                return await self._attempt(handle)
+            except (httpx.TransportError, UpstreamError) as e:
+                delay = min(self.backoff * 2 ** attempt, self.max_backoff) * random.uniform(0.5, 1.0)
+                if attempt >= self.max_retries or time.monotonic() - started + delay >= self.deadline:
+                    raise
+                attempt += 1
+                logger.warning(f"Signals API attempt {attempt} failed ({e!r}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def _attempt(self, handle):
+        async with self._client().stream("GET", self.url) as response:
+            if response.status_code in RETRY_STATUSES:
+                raise UpstreamError(f"Signals API returned {response.status_code}")
+            response.raise_for_status()
+            return await handle(response)
+
+# Shared client used by fetch_trading_signals
+signals_client = SignalsClient()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark enforcing the cold start budget of the web app.
+
+Each run starts a fresh interpreter, imports main under
+`python -X importtime` and asks /health for a first response, the way an
+autoscaled instance boots. The median import time must stay within the
+budget, and the Telegram stack and the store must not be imported before
+the web app is up: they load in the background after it.
+
+Usage:
+    python startup_benchmark.py
+    python startup_benchmark.py --runs 10 --budget-ms 400
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Median milliseconds `import main` may take
+DEFAULT_BUDGET_MS = float(os.environ.get("STARTUP_IMPORT_BUDGET_MS", "500"))
+
+# Modules that must not be loaded by importing the web app
+DEFERRED_MODULES = ("telegram", "sqlalchemy", "httpx", "bot", "handlers", "storage", "utils")
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+response = main.app.test_client().get("/health")
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "first_response_ms": (time.perf_counter() - started) * 1000,
+    "status": response.status_code
+}))
+"""
+
+def _environment():
+    env = dict(os.environ)
+    env.setdefault("DATABASE_URL", "sqlite://")
+    # Only measure the web app, never reach Telegram
+    env.pop("TELEGRAM_BOT_TOKEN", None)
+    return env
+
+def parse_importtime(stderr):
+    """
+    Parse `-X importtime` output.
+
+    Returns:
+        dict: Module name to cumulative import time in microseconds
+    """
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+def measure_once():
+    """
+    Boot the web app in a fresh interpreter.
+
+    Returns:
+        dict: import_ms, first_response_ms, status and the slowest imports
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE],
+        capture_output=True, text=True, cwd=HERE, env=_environment(), check=True
+    )
+    measurement = json.loads(result.stdout.strip().splitlines()[-1])
+    times = parse_importtime(result.stderr)
+    measurement["slowest"] = sorted(times.items(), key=lambda item: item[1], reverse=True)[:10]
+    return measurement
+
+def eager_imports():
+    """
+    Returns:
+        list: DEFERRED_MODULES that importing the web app loads anyway
+    """
+    probe = f"import sys, app; print(' '.join(m for m in {DEFERRED_MODULES!r} if m in sys.modules))"
+    result = subprocess.run(
+        [sys.executable, "-c", probe], capture_output=True, text=True, cwd=HERE, env=_environment(), check=True
+    )
+    return result.stdout.split()
+
+def run(runs=5, budget_ms=DEFAULT_BUDGET_MS):
+    """
+    Returns:
+        dict: Medians, the slowest imports of the last run, eager modules and whether the budget holds
+    """
+    measurements = [measure_once() for _ in range(runs)]
+    import_ms = statistics.median(m["import_ms"] for m in measurements)
+    eager = eager_imports()
+    return {
+        "import_ms": round(import_ms, 1),
+        "first_response_ms": round(statistics.median(m["first_response_ms"] for m in measurements), 1),
+        "statuses": sorted({m["status"] for m in measurements}),
+        "slowest": measurements[-1]["slowest"],
+        "eager_imports": eager,
+        "budget_ms": budget_ms,
+        "ok": import_ms <= budget_ms and not eager and all(m["status"] == 200 for m in measurements)
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to boot")
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS, help="Median import budget")
+    args = parser.parse_args(argv)
+
+    report = run(args.runs, args.budget_ms)
+    print(f"import main: {report['import_ms']} ms (budget {report['budget_ms']:.0f} ms)")
+    print(f"first /health response: {report['first_response_ms']} ms")
+    print("slowest imports (cumulative):")
+    for name, micros in report["slowest"]:
+        print(f"  {micros / 1000:8.1f} ms  {name}")
+    if report["eager_imports"]:
+        print(f"imported eagerly, should be deferred: {', '.join(report['eager_imports'])}")
+    print("OK" if report["ok"] else "FAILED")
+    return 0 if report["ok"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
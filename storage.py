@@ -0,0 +1,517 @@
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    Column,
+    DateTime,
+    Float,
+    JSON,
+    MetaData,
+    String,
+    Table,
+    create_engine,
+    event,
+    func,
+    delete,
+    or_,
+    select,
+    update
+)
+from sqlalchemy.pool import StaticPool
+from config import DATABASE_URL, SEED_KEYS
+
+logger = logging.getLogger(__name__)
+
+metadata = MetaData()
+
+# Single-use access keys; the primary key gives O(1) indexed lookups
+keys_table = Table(
+    "keys",
+    metadata,
+    Column("key", String(64), primary_key=True),
+    Column("used", Boolean, nullable=False, default=False, index=True),
+    Column("used_by", BigInteger, nullable=True),
+    Column("created_at", DateTime(timezone=True), nullable=False),
+    Column("used_at", DateTime(timezone=True), nullable=True),
+)
+
+# Telegram users that have authenticated with a valid key
+users_table = Table(
+    "users",
+    metadata,
+    Column("user_id", BigInteger, primary_key=True),
+    Column("authenticated_at", DateTime(timezone=True), nullable=False),
+)
+
+# Per-user signal filters; "*" matches any asset or direction
+subscriptions_table = Table(
+    "subscriptions",
+    metadata,
+    Column("user_id", BigInteger, primary_key=True),
+    Column("asset", String(64), primary_key=True),
+    Column("direction", String(16), primary_key=True),
+    Column("created_at", DateTime(timezone=True), nullable=False),
+)
+
+# Pending expiry notices, one row per (signal, chat); due_at is UTC epoch seconds
+expiries_table = Table(
+    "expiries",
+    metadata,
+    Column("signal_id", String(128), primary_key=True),
+    Column("chat_id", BigInteger, primary_key=True),
+    Column("due_at", Float, nullable=False, index=True),
+    Column("signal", JSON, nullable=False),
+)
+
+# Names of the counters and state published for the web workers
+SIGNALS_SENT = "signals_sent"
+SIGNAL_SNAPSHOT = "signal_snapshot"
+METRICS_SNAPSHOT = "metrics"
+
+# Time-limited named locks, e.g. which process runs the Telegram poller
+leases_table = Table(
+    "leases",
+    metadata,
+    Column("name", String(64), primary_key=True),
+    Column("holder", String(128), nullable=False),
+    Column("expires_at", Float, nullable=False),
+)
+
+# Counters shared by every process (e.g. signals_sent)
+counters_table = Table(
+    "counters",
+    metadata,
+    Column("name", String(64), primary_key=True),
+    Column("value", BigInteger, nullable=False),
+)
+
+# Small JSON documents published by the leader for the other processes
+state_table = Table(
+    "state",
+    metadata,
+    Column("name", String(64), primary_key=True),
+    Column("value", JSON, nullable=False),
+    Column("updated_at", Float, nullable=False),
+)
+
+# Webhook updates received by a process that isn't running the bot,
+# waiting for the one that is
+relayed_updates_table = Table(
+    "relayed_updates",
+    metadata,
+    Column("update_id", BigInteger, primary_key=True),
+    Column("payload", JSON, nullable=False),
+    Column("received_at", Float, nullable=False),
+)
+
+def _utcnow():
+    return datetime.now(timezone.utc)
+
+def _insert(dialect, table):
+    """Dialect-specific INSERT supporting ON CONFLICT (SQLite, Postgres)"""
+    # Imported on use so SQLite deployments never load the Postgres dialect
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
+def _insert_ignoring_duplicates(dialect, table, *key_columns):
+    """INSERT ... ON CONFLICT DO NOTHING for the supported backends"""
+    return _insert(dialect, table).on_conflict_do_nothing(index_elements=list(key_columns))
+
+def _normalize_url(url):
+    """Accept the postgres:// scheme that hosting providers hand out"""
+    if url.startswith("postgres://"):
+        return "postgresql://" + url[len("postgres://"):]
+    return url
+
+class Storage:
+    """
+    Persistent store for keys, users, subscriptions, pending expiry
+    notices, leases, counters, published state and relayed webhook
+    updates, shared by every process of the bot.
+
+    SQLite is the default; point DATABASE_URL at Postgres to replace it.
+    Authenticated user ids are cached in-process once seen, which is safe
+    because authentication is never revoked.
+    """
+
+    def __init__(self, url=DATABASE_URL, seed_keys=SEED_KEYS):
+        self.url = _normalize_url(url)
+        self._seed_keys = list(seed_keys)
+        self._engine = None
+        self._engine_lock = threading.Lock()
+        self._known_users = set()
+
+    @property
+    def engine(self):
+        """The SQLAlchemy engine, created and migrated on first use"""
+        if self._engine is None:
+            with self._engine_lock:
+                if self._engine is None:
+                    self._engine = self._create_engine()
+        return self._engine
+
+    def _create_engine(self):
+        kwargs = {}
+        if self.url.startswith("sqlite"):
+            kwargs["connect_args"] = {"check_same_thread": False, "timeout": 30}
+            if self.url in ("sqlite://", "sqlite:///:memory:"):
+                # One shared connection, otherwise every connection gets its own database
+                kwargs["poolclass"] = StaticPool
+        else:
+            kwargs["pool_pre_ping"] = True
+
+        engine = create_engine(self.url, future=True, **kwargs)
+
+        if engine.dialect.name == "sqlite":
+            @event.listens_for(engine, "connect")
+            def _set_sqlite_pragmas(dbapi_connection, connection_record):
+                # WAL lets several processes read while one writes
+                cursor = dbapi_connection.cursor()
+                cursor.execute("PRAGMA journal_mode=WAL")
+                cursor.execute("PRAGMA synchronous=NORMAL")
+                cursor.close()
+
+        metadata.create_all(engine)
+        self._seed(engine)
+        logger.info(f"Storage ready ({engine.dialect.name})")
+        return engine
+
+    def _seed(self, engine):
+        if not self._seed_keys:
+            return
+        with engine.begin() as conn:
+            self._insert_keys(conn, self._seed_keys)
+
+    def _insert_keys(self, conn, keys):
+        """Insert keys in one statement, skipping ones that already exist. Returns the keys inserted."""
+        if not keys:
+            return []
+        now = _utcnow()
+        rows = [{"key": key, "used": False, "created_at": now} for key in keys]
+        statement = (
+            _insert_ignoring_duplicates(conn.dialect.name, keys_table, "key")
+            .returning(keys_table.c.key)
+        )
+        return list(conn.execute(statement, rows).scalars())
+
+    # Keys
+
+    def add_keys(self, keys):
+        """
+        Add single-use keys to the store in one bulk write.
+
+        Args:
+            keys (iterable): Keys to add
+
+        Returns:
+            list: The keys that were new (existing keys are skipped)
+        """
+        with self.engine.begin() as conn:
+            return self._insert_keys(conn, list(keys))
+
+    def consume_key(self, key, user_id=None):
+        """
+        Atomically mark an unused key as used.
+
+        Only one caller across all processes can win for a given key.
+
+        Args:
+            key (str): The key to consume
+            user_id (int): The user consuming the key
+
+        Returns:
+            bool: True if the key existed and was unused
+        """
+        statement = (
+            update(keys_table)
+            .where(keys_table.c.key == key, keys_table.c.used.is_(False))
+            .values(used=True, used_by=user_id, used_at=_utcnow())
+        )
+        with self.engine.begin() as conn:
+            return conn.execute(statement).rowcount == 1
+
+    def is_used_key(self, key):
+        """Check if a key exists and has already been used"""
+        with self.engine.connect() as conn:
+            used = conn.scalar(select(keys_table.c.used).where(keys_table.c.key == key))
+        return bool(used)
+
+    def unused_keys(self):
+        """
+        Returns:
+            list: All keys that haven't been used yet
+        """
+        with self.engine.connect() as conn:
+            return list(conn.scalars(
+                select(keys_table.c.key)
+                .where(keys_table.c.used.is_(False))
+                .order_by(keys_table.c.created_at, keys_table.c.key)
+            ))
+
+    def count_keys(self):
+        """Total number of single-use keys, used or not"""
+        with self.engine.connect() as conn:
+            return conn.scalar(select(func.count()).select_from(keys_table))
+
+    def count_used_keys(self):
+        """Number of single-use keys that have been used"""
+        with self.engine.connect() as conn:
+            return conn.scalar(
+                select(func.count()).select_from(keys_table).where(keys_table.c.used.is_(True))
+            )
+
+    # Users
+
+    def add_user(self, user_id):
+        """Record a user as authenticated"""
+        statement = _insert_ignoring_duplicates(self.engine.dialect.name, users_table, "user_id")
+        with self.engine.begin() as conn:
+            conn.execute(statement, {"user_id": user_id, "authenticated_at": _utcnow()})
+        self._known_users.add(user_id)
+
+    def is_authenticated(self, user_id):
+        """Check if a user has authenticated, in this or any other process"""
+        if user_id in self._known_users:
+            return True
+        with self.engine.connect() as conn:
+            found = conn.scalar(select(users_table.c.user_id).where(users_table.c.user_id == user_id))
+        if found is not None:
+            self._known_users.add(user_id)
+            return True
+        return False
+
+    def user_ids(self):
+        """
+        Returns:
+            list: Ids of all authenticated users
+        """
+        with self.engine.connect() as conn:
+            return list(conn.scalars(select(users_table.c.user_id)))
+
+    def count_users(self):
+        """Number of authenticated users"""
+        with self.engine.connect() as conn:
+            return conn.scalar(select(func.count()).select_from(users_table))
+
+    # Subscriptions
+
+    def add_subscription(self, user_id, asset, direction):
+        """
+        Subscribe a user to signals for an asset and direction.
+
+        Returns:
+            bool: True if the subscription is new
+        """
+        statement = _insert_ignoring_duplicates(
+            self.engine.dialect.name, subscriptions_table, "user_id", "asset", "direction"
+        )
+        row = {"user_id": user_id, "asset": asset, "direction": direction, "created_at": _utcnow()}
+        with self.engine.begin() as conn:
+            return conn.execute(statement, row).rowcount == 1
+
+    def remove_subscriptions(self, user_id, asset=None):
+        """
+        Remove a user's subscriptions, all of them or those for one asset.
+
+        Returns:
+            int: Number of subscriptions removed
+        """
+        statement = delete(subscriptions_table).where(subscriptions_table.c.user_id == user_id)
+        if asset is not None:
+            statement = statement.where(subscriptions_table.c.asset == asset)
+        with self.engine.begin() as conn:
+            return conn.execute(statement).rowcount
+
+    def subscriptions(self, user_id=None):
+        """
+        Args:
+            user_id (int): Only this user's subscriptions, None for everyone's
+
+        Returns:
+            list: (user_id, asset, direction) tuples
+        """
+        statement = select(
+            subscriptions_table.c.user_id, subscriptions_table.c.asset, subscriptions_table.c.direction
+        ).order_by(subscriptions_table.c.user_id, subscriptions_table.c.asset)
+        if user_id is not None:
+            statement = statement.where(subscriptions_table.c.user_id == user_id)
+        with self.engine.connect() as conn:
+            return [tuple(row) for row in conn.execute(statement)]
+
+    # Expiry notices
+
+    def add_expiry(self, signal_id, chat_id, due_at, signal):
+        """
+        Record that a chat should get an expiry notice for a signal.
+
+        Returns:
+            bool: True if the chat was not already waiting on that signal
+        """
+        statement = _insert_ignoring_duplicates(
+            self.engine.dialect.name, expiries_table, "signal_id", "chat_id"
+        )
+        row = {"signal_id": signal_id, "chat_id": chat_id, "due_at": due_at, "signal": signal}
+        with self.engine.begin() as conn:
+            return conn.execute(statement, row).rowcount == 1
+
+    def pending_expiries(self):
+        """
+        Returns:
+            list: (signal_id, chat_id, due_at, signal) tuples ordered by due time
+        """
+        statement = select(
+            expiries_table.c.signal_id,
+            expiries_table.c.chat_id,
+            expiries_table.c.due_at,
+            expiries_table.c.signal
+        ).order_by(expiries_table.c.due_at)
+        with self.engine.connect() as conn:
+            return [tuple(row) for row in conn.execute(statement)]
+
+    def remove_expiries(self, signal_id):
+        """
+        Forget every chat waiting on a signal's expiry.
+
+        Returns:
+            int: Number of rows removed
+        """
+        statement = delete(expiries_table).where(expiries_table.c.signal_id == signal_id)
+        with self.engine.begin() as conn:
+            return conn.execute(statement).rowcount
+
+    # Leases
+
+    def acquire_lease(self, name, holder, ttl):
+        """
+        Take or renew a named lease.
+
+        Succeeds if the lease is free, expired or already held by holder;
+        only one holder can succeed at a time across all processes.
+
+        Args:
+            name (str): Lease name
+            holder (str): Unique id of the caller
+            ttl (float): Seconds until the lease expires unless renewed
+
+        Returns:
+            bool: True if holder now holds the lease
+        """
+        now = time.time()
+        values = {"holder": holder, "expires_at": now + ttl}
+        renew = (
+            update(leases_table)
+            .where(
+                leases_table.c.name == name,
+                or_(leases_table.c.holder == holder, leases_table.c.expires_at < now)
+            )
+            .values(**values)
+        )
+        with self.engine.begin() as conn:
+            if conn.execute(renew).rowcount == 1:
+                return True
+            statement = _insert_ignoring_duplicates(conn.dialect.name, leases_table, "name")
+            return conn.execute(statement, {"name": name, **values}).rowcount == 1
+
+    def release_lease(self, name, holder):
+        """Give up a lease if holder still holds it"""
+        statement = delete(leases_table).where(leases_table.c.name == name, leases_table.c.holder == holder)
+        with self.engine.begin() as conn:
+            conn.execute(statement)
+
+    def lease_holder(self, name):
+        """
+        Returns:
+            str: Holder of an unexpired lease, or None
+        """
+        with self.engine.connect() as conn:
+            return conn.scalar(
+                select(leases_table.c.holder)
+                .where(leases_table.c.name == name, leases_table.c.expires_at >= time.time())
+            )
+
+    # Counters and published state
+
+    def increment(self, name, amount=1):
+        """Atomically add amount to a shared counter"""
+        statement = _insert(self.engine.dialect.name, counters_table).values(name=name, value=amount)
+        statement = statement.on_conflict_do_update(
+            index_elements=["name"],
+            set_={"value": counters_table.c.value + statement.excluded.value}
+        )
+        with self.engine.begin() as conn:
+            conn.execute(statement)
+
+    def counter(self, name):
+        """Current value of a shared counter, 0 if never incremented"""
+        with self.engine.connect() as conn:
+            return conn.scalar(select(counters_table.c.value).where(counters_table.c.name == name)) or 0
+
+    def put_state(self, name, value):
+        """Publish a JSON-serializable value under a name, replacing the previous one"""
+        statement = _insert(self.engine.dialect.name, state_table).values(
+            name=name, value=value, updated_at=time.time()
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=["name"],
+            set_={"value": statement.excluded.value, "updated_at": statement.excluded.updated_at}
+        )
+        with self.engine.begin() as conn:
+            conn.execute(statement)
+
+    def get_state(self, name):
+        """
+        Returns:
+            tuple: (value, updated_at epoch seconds), or (None, None) if never published
+        """
+        with self.engine.connect() as conn:
+            row = conn.execute(
+                select(state_table.c.value, state_table.c.updated_at).where(state_table.c.name == name)
+            ).first()
+        return (row.value, row.updated_at) if row is not None else (None, None)
+
+    # Relayed webhook updates
+
+    def relay_update(self, payload):
+        """
+        Leave a webhook update for the process running the bot.
+
+        Returns:
+            bool: True if the update was not already waiting
+        """
+        statement = _insert_ignoring_duplicates(self.engine.dialect.name, relayed_updates_table, "update_id")
+        row = {"update_id": payload["update_id"], "payload": payload, "received_at": time.time()}
+        with self.engine.begin() as conn:
+            return conn.execute(statement, row).rowcount == 1
+
+    def take_relayed_updates(self, limit=100):
+        """
+        Remove and return the oldest relayed updates.
+
+        Args:
+            limit (int): Max updates taken
+
+        Returns:
+            list: Update payloads ordered by update_id
+        """
+        statement = (
+            select(relayed_updates_table.c.update_id, relayed_updates_table.c.payload)
+            .order_by(relayed_updates_table.c.update_id)
+            .limit(limit)
+        )
+        with self.engine.begin() as conn:
+            rows = conn.execute(statement).all()
+            if rows:
+                conn.execute(
+                    delete(relayed_updates_table)
+                    .where(relayed_updates_table.c.update_id.in_([row.update_id for row in rows]))
+                )
+        return [row.payload for row in rows]
+
+# Shared store used by handlers, the poller and the web app
+store = Storage()
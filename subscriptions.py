@@ -0,0 +1,202 @@
+import asyncio
+import logging
+import time
+from config import SUBSCRIPTION_RELOAD_INTERVAL
+from signal_index import signal_timestamp
+from signal_model import normalize_asset
+from storage import store
+
+logger = logging.getLogger(__name__)
+
+# Matches any asset or any direction
+WILDCARD = "*"
+
+DIRECTIONS = ("CALL", "PUT")
+
+class SubscriptionRouter:
+    """
+    Routes signals to the chats subscribed to them.
+
+    Keeps an index from (asset, direction) to subscriber sets, with "*"
+    entries for wildcards, so routing a signal is four set lookups and
+    costs time proportional to the number of matching chats. Users
+    without any subscription receive every signal, as before
+    subscriptions existed; they live in the ("*", "*") entry.
+
+    Changes made through this router apply at once; changes made by
+    other processes are picked up when the index is reloaded.
+
+    The store is only queried in worker threads, and the index is only
+    read and changed on the event loop, so no lookup can see a set
+    changing under it or a half-built index. Lookups never load: await
+    refresh() before them.
+    """
+
+    def __init__(self, store=store, max_age=SUBSCRIPTION_RELOAD_INTERVAL):
+        """
+        Args:
+            store (Storage): Store holding users and subscriptions
+            max_age (float): Seconds before the index is reloaded from the store
+        """
+        self._store = store
+        self._max_age = max_age
+        self._routes = {}
+        self._filters = {}
+        self._loaded_at = None
+        # Bumped by every change made through this router
+        self._version = 0
+
+    async def load(self):
+        """Rebuild the index from the store, read in a worker thread"""
+        while True:
+            version = self._version
+            routes, filters = await asyncio.to_thread(self._read)
+            if version == self._version:
+                break
+            # Changed through this router while reading, read again so the change isn't lost
+
+        self._routes = routes
+        self._filters = filters
+        self._loaded_at = time.monotonic()
+        logger.info(f"Loaded {sum(len(f) for f in filters.values())} subscriptions for {len(filters)} users")
+
+    async def refresh(self):
+        """Reload the index if it is older than max_age or was never loaded"""
+        if self._loaded_at is None or time.monotonic() - self._loaded_at >= self._max_age:
+            await self.load()
+
+    def _read(self):
+        """Build the index from the store; touches no shared state"""
+        routes = {}
+        filters = {}
+        for user_id, asset, direction in self._store.subscriptions():
+            filters.setdefault(user_id, set()).add((asset, direction))
+            routes.setdefault((asset, direction), set()).add(user_id)
+        everything = routes.setdefault((WILDCARD, WILDCARD), set())
+        everything.update(user_id for user_id in self._store.user_ids() if user_id not in filters)
+        return routes, filters
+
+    def route(self, signal):
+        """
+        Find the chats a signal should be pushed to.
+
+        Args:
+            signal (Signal): A processed signal
+
+        Returns:
+            set: Matching chat ids
+        """
+        asset = normalize_asset(signal.asset)
+        side = signal.direction
+        routes = self._routes
+        chat_ids = set()
+        for key in ((asset, side), (asset, WILDCARD), (WILDCARD, side), (WILDCARD, WILDCARD)):
+            subscribers = routes.get(key)
+            if subscribers:
+                chat_ids |= subscribers
+        return chat_ids
+
+    def filters(self, user_id):
+        """
+        Returns:
+            set: The user's (asset, direction) subscriptions, empty if they get everything
+        """
+        return set(self._filters.get(user_id, ()))
+
+    def matches(self, user_id, signal):
+        """Check whether a signal should reach a user"""
+        filters = self._filters.get(user_id)
+        if not filters:
+            return True
+        asset = normalize_asset(signal.asset)
+        side = signal.direction
+        return any(
+            filter_asset in (asset, WILDCARD) and filter_direction in (side, WILDCARD)
+            for filter_asset, filter_direction in filters
+        )
+
+    def next_signal(self, user_id, index):
+        """
+        The next upcoming signal a user is subscribed to.
+
+        Args:
+            user_id (int): The user
+            index (SignalIndex): Current signal snapshot
+
+        Returns:
+            Signal: The signal due soonest, or None
+        """
+        filters = self._filters.get(user_id)
+        if not filters:
+            return index.next()
+
+        assets = {asset for asset, _ in filters}
+        if WILDCARD in assets:
+            candidates = index.upcoming()
+        else:
+            candidates = [signal for asset in assets for signal in index.for_asset(asset)]
+        matching = [signal for signal in candidates if self.matches(user_id, signal)]
+        return min(matching, key=signal_timestamp, default=None)
+
+    async def add_user(self, user_id):
+        """Record a newly authenticated user, who receives every signal until they subscribe"""
+        await self.refresh()
+        await asyncio.to_thread(self._store.add_user, user_id)
+        self._version += 1
+        if user_id not in self._filters:
+            self._routes.setdefault((WILDCARD, WILDCARD), set()).add(user_id)
+
+    async def subscribe(self, user_id, asset, direction=WILDCARD):
+        """
+        Subscribe a user to an asset, optionally for one direction only.
+
+        Args:
+            user_id (int): The user
+            asset (str): Asset name, or "*" for every asset
+            direction (str): "CALL", "PUT" or "*"
+
+        Returns:
+            tuple: The (asset, direction) filter that was added
+        """
+        asset = normalize_asset(asset)
+        direction = direction.upper() if direction != WILDCARD else WILDCARD
+        if direction not in DIRECTIONS + (WILDCARD,):
+            raise ValueError(f"Direction must be CALL or PUT, not {direction}")
+
+        await self.refresh()
+        await asyncio.to_thread(self._store.add_subscription, user_id, asset, direction)
+        self._version += 1
+        filters = self._filters.setdefault(user_id, set())
+        if not filters:
+            # The user stops receiving everything
+            self._routes.get((WILDCARD, WILDCARD), set()).discard(user_id)
+        filters.add((asset, direction))
+        self._routes.setdefault((asset, direction), set()).add(user_id)
+        return asset, direction
+
+    async def unsubscribe(self, user_id, asset=None):
+        """
+        Remove one or all of a user's subscriptions.
+
+        Users left without subscriptions receive every signal again.
+
+        Returns:
+            int: Number of subscriptions removed
+        """
+        asset = normalize_asset(asset) if asset is not None else None
+        await self.refresh()
+        removed = await asyncio.to_thread(self._store.remove_subscriptions, user_id, asset)
+        self._version += 1
+
+        had_filters = user_id in self._filters
+        filters = self._filters.get(user_id, set())
+        for key in [key for key in filters if asset is None or key[0] == asset]:
+            filters.discard(key)
+            self._routes.get(key, set()).discard(user_id)
+        if had_filters and not filters:
+            self._filters.pop(user_id, None)
+            self._routes.setdefault((WILDCARD, WILDCARD), set()).add(user_id)
+        return removed
+
+# Shared router used by the poller and the subscription commands
+subscriptions = SubscriptionRouter()
@@ -1,11 +1,12 @@
 """
 Test script to verify API connection and field mappings.
 """
+import asyncio
 import logging
 import json
-import requests
 from utils import fetch_trading_signals, format_signal_message
-from config import SIGNALS_API_URL, SIGNALS_API_KEY
+from signals_client import signals_client
+from config import SIGNALS_API_URL
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
@@ -13,14 +14,10 @@ logger = logging.getLogger(__name__)
 
 def test_api_connection():
     """Test direct API connection and print response"""
-    try:
-        headers = {"Authorization": f"Bearer {SIGNALS_API_KEY}"} if SIGNALS_API_KEY else {}
-        
-        logger.info(f"Connecting to API: {SIGNALS_API_URL}")
-        response = requests.get(SIGNALS_API_URL, headers=headers, timeout=10)
-        
+    async def handle(response):
         # Print status code
         logger.info(f"API Response Status: {response.status_code}")
+        await response.aread()
         
         # Try to parse as JSON
         try:
@@ -42,7 +39,16 @@ def test_api_connection():
         except ValueError:
             logger.error("Failed to parse response as JSON")
             logger.info(f"Response content: {response.text[:500]}...")
-            
+    
+    async def run():
+        try:
+            await signals_client.fetch(handle)
+        finally:
+            await signals_client.aclose()
+    
+    try:
+        logger.info(f"Connecting to API: {SIGNALS_API_URL}")
+        asyncio.run(run())
     except Exception as e:
         logger.error(f"Error testing API connection: {e}")
 
@@ -51,7 +57,7 @@ def test_signal_processing():
     logger.info("Testing signal processing...")
     
     # Fetch signals using the utility function
-    signals = fetch_trading_signals()
+    signals = asyncio.run(fetch_trading_signals())
     
     if signals:
         logger.info(f"Successfully fetched {len(signals)} signals")
@@ -4,8 +4,14 @@ Test script to simulate user authentication and verify persistent authentication
 """
 
 import logging
+import os
 import sys
-from config import AUTHENTICATED_USERS, VALID_KEYS, USED_KEYS, PERMANENT_KEY
+
+# Use a throwaway in-memory database so the test never consumes real keys
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from config import SEED_KEYS, PERMANENT_KEY
+from storage import store
 from utils import verify_private_key
 
 # Configure logging
@@ -21,12 +27,12 @@ def test_authentication():
     logger.info("=== TESTING BOT AUTHENTICATION SYSTEM ===")
     
     # Initial state
-    logger.info(f"Initial authenticated users: {AUTHENTICATED_USERS}")
+    logger.info(f"Initial authenticated users: {store.user_ids()}")
     
     # Test users
     test_users = [
-        {"id": 123456, "name": "User 1", "key": VALID_KEYS[0]},
-        {"id": 789012, "name": "User 2", "key": VALID_KEYS[1]},
+        {"id": 123456, "name": "User 1", "key": SEED_KEYS[0]},
+        {"id": 789012, "name": "User 2", "key": SEED_KEYS[1]},
         {"id": 345678, "name": "User 3", "key": PERMANENT_KEY},
         {"id": 901234, "name": "User 4", "key": "invalid_key"},
     ]
@@ -36,29 +42,29 @@ def test_authentication():
         logger.info(f"\nAttempting authentication for {user['name']} (ID: {user['id']})")
         
         # Check if user is already authenticated (should be False initially)
-        is_authenticated = user['id'] in AUTHENTICATED_USERS
+        is_authenticated = store.is_authenticated(user['id'])
         logger.info(f"Already authenticated: {is_authenticated}")
         
         # Try to authenticate with the key
-        if verify_private_key(user['key']):
+        if verify_private_key(user['key'], user['id']):
             # Add user to authenticated users
-            AUTHENTICATED_USERS.add(user['id'])
+            store.add_user(user['id'])
             logger.info(f"Authentication successful for {user['name']} with key: {user['key']}")
         else:
             logger.info(f"Authentication failed for {user['name']} with key: {user['key']}")
         
         # Verify authentication status after attempt
-        is_authenticated = user['id'] in AUTHENTICATED_USERS
+        is_authenticated = store.is_authenticated(user['id'])
         logger.info(f"Authenticated after attempt: {is_authenticated}")
     
     # Show final state
-    logger.info(f"\nFinal authenticated users: {AUTHENTICATED_USERS}")
-    logger.info(f"Used keys: {USED_KEYS}")
+    logger.info(f"\nFinal authenticated users: {store.user_ids()}")
+    logger.info(f"Used keys: {store.count_used_keys()}")
     
     # Simulation of user coming back to the bot later
     logger.info("\n=== SIMULATING RETURN VISITS ===")
     for user in test_users:
-        is_authenticated = user['id'] in AUTHENTICATED_USERS
+        is_authenticated = store.is_authenticated(user['id'])
         if is_authenticated:
             logger.info(f"{user['name']} (ID: {user['id']}) returns to the bot - Already authenticated")
             # The bot would not ask for a key again
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the banner is uploaded once and reused by file_id.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+from types import SimpleNamespace
+from telegram.error import BadRequest
+from banner import BannerCache
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    stream=sys.stdout
+)
+logger = logging.getLogger(__name__)
+
+class FakeTelegram:
+    """Stands in for reply_photo/send_photo and records what was sent"""
+
+    def __init__(self):
+        self.uploads = 0
+        self.by_id = 0
+        self.reject_ids = set()
+
+    async def send_photo(self, photo, **kwargs):
+        if "*_" in kwargs.get("caption", ""):
+            raise BadRequest("Can't parse entities: can't find end of the entity starting at byte offset 3")
+        if isinstance(photo, str):
+            if photo in self.reject_ids:
+                raise BadRequest("Wrong file identifier/http url specified")
+            self.by_id += 1
+            file_id = photo
+        else:
+            photo.read()
+            self.uploads += 1
+            file_id = f"file-id-{self.uploads}"
+        return SimpleNamespace(photo=[SimpleNamespace(file_id="thumb"), SimpleNamespace(file_id=file_id)])
+
+def make_banner(directory, content=b"banner-bytes"):
+    image_path = os.path.join(directory, "banner.png")
+    with open(image_path, 'wb') as image:
+        image.write(content)
+    return BannerCache(image_path, os.path.join(directory, "banner_file_id.json"))
+
+def test_upload_once_then_reuse():
+    """Only the first send should upload bytes"""
+    with tempfile.TemporaryDirectory() as directory:
+        telegram = FakeTelegram()
+        banner = make_banner(directory)
+
+        async def scenario():
+            for _ in range(50):
+                await banner.send(telegram.send_photo, caption="signal")
+
+        asyncio.run(scenario())
+
+        logger.info(f"Uploads: {telegram.uploads}, sends by file_id: {telegram.by_id}")
+        assert telegram.uploads == 1
+        assert telegram.by_id == 49
+
+def test_file_id_survives_restart():
+    """A new cache instance should reuse the persisted file_id"""
+    with tempfile.TemporaryDirectory() as directory:
+        telegram = FakeTelegram()
+        asyncio.run(make_banner(directory).send(telegram.send_photo))
+
+        restarted = make_banner(directory)
+        assert restarted.file_id == "file-id-1"
+        asyncio.run(restarted.send(telegram.send_photo))
+        assert telegram.uploads == 1
+
+def test_changed_image_or_rejected_id_reuploads():
+    """A new image or a rejected file_id should trigger a fresh upload"""
+    with tempfile.TemporaryDirectory() as directory:
+        telegram = FakeTelegram()
+        asyncio.run(make_banner(directory).send(telegram.send_photo))
+
+        changed = make_banner(directory, content=b"new-banner-bytes")
+        assert changed.file_id is None, "Changed image should discard the cached id"
+        asyncio.run(changed.send(telegram.send_photo))
+        assert telegram.uploads == 2
+
+        telegram.reject_ids.add("file-id-2")
+        asyncio.run(changed.send(telegram.send_photo))
+        assert telegram.uploads == 3
+        assert changed.file_id == "file-id-3"
+
+def test_uploads_on_a_new_loop():
+    """The upload lock should work again after the bot restarts on a new loop"""
+    with tempfile.TemporaryDirectory() as directory:
+        banner = make_banner(directory)
+
+        async def slow_upload(photo, **kwargs):
+            await asyncio.sleep(0.01)
+            # No photo in the reply, so every send uploads under the lock
+
+        async def concurrent_sends():
+            await asyncio.gather(*(banner.send(slow_upload) for _ in range(3)))
+
+        asyncio.run(concurrent_sends())
+        asyncio.run(concurrent_sends())
+
+def test_caption_errors_keep_the_file_id():
+    """A caption that fails to parse should raise without discarding the cached id"""
+    with tempfile.TemporaryDirectory() as directory:
+        telegram = FakeTelegram()
+        banner = make_banner(directory)
+        asyncio.run(banner.send(telegram.send_photo, caption="signal"))
+
+        try:
+            asyncio.run(banner.send(telegram.send_photo, caption="*_BRLUSD_otc*"))
+            assert False, "The caption error should reach the caller"
+        except BadRequest:
+            pass
+
+        assert banner.file_id == "file-id-1"
+        assert make_banner(directory).file_id == "file-id-1", "The persisted id should survive"
+        assert telegram.uploads == 1
+
+if __name__ == "__main__":
+    test_upload_once_then_reuse()
+    test_file_id_survives_restart()
+    test_changed_image_or_rejected_id_reuploads()
+    test_uploads_on_a_new_loop()
+    test_caption_errors_keep_the_file_id()
+    logger.info("=== BANNER TEST COMPLETED SUCCESSFULLY ===")
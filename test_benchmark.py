@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the benchmark harness's stand-ins and regression check.
+"""
+
+import json
+import logging
+import os
+import sys
+import tempfile
+import httpx
+from benchmark import (
+    compare,
+    load_previous,
+    percentile,
+    start_bot_api_server,
+    start_signals_server,
+    synthesize_payload
+)
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    stream=sys.stdout
+)
+logger = logging.getLogger(__name__)
+
+def test_fake_servers():
+    """The stand-ins should serve the payload and canned Bot API results"""
+    payload = synthesize_payload(25)
+    signals_server = start_signals_server(payload)
+    bot_api_server = start_bot_api_server()
+    try:
+        response = httpx.get(f"http://127.0.0.1:{signals_server.server_port}/signals")
+        assert len(response.json()["signals"]) == 25
+
+        base = f"http://127.0.0.1:{bot_api_server.server_port}/bot123:TOKEN"
+        photo = httpx.post(f"{base}/sendPhoto", data={"chat_id": 1}).json()
+        assert photo["ok"] and photo["result"]["photo"][0]["file_id"]
+        assert httpx.post(f"{base}/answerCallbackQuery").json()["result"] is True
+        assert bot_api_server.calls == {"sendPhoto": 1, "answerCallbackQuery": 1}
+    finally:
+        signals_server.shutdown()
+        bot_api_server.shutdown()
+
+def test_percentiles_and_regressions():
+    """Percentiles use nearest rank; regressions compare with the last matching run"""
+    ordered = list(range(1, 101))
+    assert (percentile(ordered, 0.5), percentile(ordered, 0.95), percentile(ordered, 0.99)) == (50, 95, 99)
+    assert percentile([], 0.5) is None
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "results.jsonl")
+        params = {"users": 10}
+        with open(path, "w") as results_file:
+            for p95, other_params in ((5.0, params), (10.0, params), (1.0, {"users": 20})):
+                run = {"params": other_params, "scenarios": {"broadcast": {"p95_ms": p95, "ops_per_sec": 100}}}
+                results_file.write(json.dumps(run) + "\n")
+
+        previous = load_previous(path, params)
+        assert previous["scenarios"]["broadcast"]["p95_ms"] == 10.0
+
+    current = {"broadcast": {"p95_ms": 11.0, "ops_per_sec": 70}, "new": {"p95_ms": 1.0, "ops_per_sec": 1}}
+    assert compare(previous["scenarios"], current, 0.2) == [("broadcast", "ops_per_sec", 100, 70)]
+    assert compare(previous["scenarios"], current, 0.5) == []
+
+if __name__ == "__main__":
+    test_fake_servers()
+    test_percentiles_and_regressions()
+    logger.info("=== BENCHMARK HARNESS TEST COMPLETED SUCCESSFULLY ===")
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the rate-limit-aware broadcast engine.
+"""
+
+import asyncio
+import logging
+import sys
+import time
+from telegram.error import RetryAfter, Forbidden
+from broadcast import BroadcastEngine, TokenBucket
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    stream=sys.stdout
+)
+logger = logging.getLogger(__name__)
+
+def test_token_bucket_rate():
+    """The bucket should never exceed its configured rate"""
+    async def scenario():
+        bucket = TokenBucket(rate=100, capacity=1)
+        for _ in range(51):
+            await bucket.acquire()
+
+    started = time.monotonic()
+    asyncio.run(scenario())
+    elapsed = time.monotonic() - started
+
+    logger.info(f"51 tokens at 100/s took {elapsed:.3f}s")
+    assert elapsed >= 0.45, "Bucket handed out tokens too quickly"
+
+def test_delivery_counts_and_per_chat_order():
+    """Every chat should receive its messages in order"""
+    engine = BroadcastEngine(rate=1000, per_chat_interval=0.01, workers=4)
+    received = {}
+
+    def make_send(sequence):
+        async def send(chat_id):
+            await asyncio.sleep(0)
+            received.setdefault(chat_id, []).append(sequence)
+        return send
+
+    jobs = [(chat_id, make_send(sequence)) for sequence in range(3) for chat_id in range(200)]
+    progress_calls = []
+    result = asyncio.run(engine.broadcast(jobs, progress=progress_calls.append, progress_every=100))
+
+    logger.info(f"Delivered {result.delivered}/{result.total} at {result.rate:.0f} msg/s")
+    assert result.delivered == 600 and result.failed == 0
+    assert all(sequence == [0, 1, 2] for sequence in received.values()), "Per-chat order was not kept"
+    assert progress_calls, "Progress should be reported"
+
+def test_retry_after_and_permanent_failures():
+    """429s should be retried, blocked chats should fail without retries"""
+    engine = BroadcastEngine(rate=1000, per_chat_interval=0, workers=2)
+    attempts = {}
+
+    async def send(chat_id):
+        attempts[chat_id] = attempts.get(chat_id, 0) + 1
+        if chat_id == "flooded" and attempts[chat_id] == 1:
+            raise RetryAfter(1)
+        if chat_id == "blocked":
+            raise Forbidden("Forbidden: bot was blocked by the user")
+
+    result = asyncio.run(engine.broadcast([("flooded", send), ("blocked", send), ("ok", send)]))
+
+    assert result.delivered == 2 and result.failed == 1
+    assert result.failed_chats == ["blocked"]
+    assert attempts == {"flooded": 2, "blocked": 1, "ok": 1}
+
+def test_flood_waits_are_not_retries():
+    """429s shouldn't use up the retry budget, only the flood wait deadline"""
+    engine = BroadcastEngine(rate=1000, per_chat_interval=0, workers=1, max_retries=1, max_flood_wait=0.5)
+    attempts = {}
+
+    async def send(chat_id):
+        attempts[chat_id] = attempts.get(chat_id, 0) + 1
+        if chat_id == "flooded" and attempts[chat_id] <= 3:
+            raise RetryAfter(0.1)
+        if chat_id == "flooded forever":
+            raise RetryAfter(0.2)
+
+    result = asyncio.run(engine.broadcast([("flooded", send), ("flooded forever", send)]))
+
+    assert result.delivered == 1 and result.failed_chats == ["flooded forever"]
+    assert attempts["flooded"] == 4, "Three 429s should not exhaust max_retries=1"
+    assert attempts["flooded forever"] == 3, "Flood waits should stop at max_flood_wait"
+
+def test_concurrent_broadcasts_keep_per_chat_spacing():
+    """Two broadcasts to the same chat should still be spaced by the per-chat interval"""
+    engine = BroadcastEngine(rate=1000, per_chat_interval=0.2, workers=2)
+    sent_at = []
+
+    async def send(chat_id):
+        sent_at.append(time.monotonic())
+        # Still waiting on Telegram when the other broadcast reaches the chat
+        await asyncio.sleep(0.05)
+
+    async def scenario():
+        await asyncio.gather(engine.broadcast([(1, send)]), engine.broadcast([(1, send)]))
+
+    asyncio.run(scenario())
+    assert len(sent_at) == 2
+    assert sent_at[1] - sent_at[0] >= 0.19, "Both broadcasts sent to the chat back-to-back"
+
+if __name__ == "__main__":
+    test_token_bucket_rate()
+    test_delivery_counts_and_per_chat_order()
+    test_retry_after_and_permanent_failures()
+    test_flood_waits_are_not_retries()
+    test_concurrent_broadcasts_keep_per_chat_spacing()
+    logger.info("=== BROADCAST TEST COMPLETED SUCCESSFULLY ===")
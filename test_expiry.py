@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the persistent, coalescing expiry scheduler.
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+from broadcast import BroadcastEngine
+from expiry import ExpiryScheduler
+from signal_model import Signal
+from storage import Storage
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    stream=sys.stdout
+)
+logger = logging.getLogger(__name__)
+
+class FakeBot:
+    """Records outgoing messages instead of calling Telegram"""
+
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        self.sent.append((chat_id, text))
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+def make_signal(timestamp, asset="EUR/USD"):
+    return Signal.at(asset, "CALL", timestamp, original_time="10:00")
+
+def make_scheduler(store, clock):
+    engine = BroadcastEngine(rate=1000, per_chat_interval=0)
+    return ExpiryScheduler(store, engine, delay=120, grace=600, clock=clock, monotonic=clock)
+
+def test_chats_are_coalesced_per_signal():
+    """Many chats waiting on one signal should share one timer and one broadcast"""
+    store = Storage("sqlite://", seed_keys=[])
+    clock = FakeClock(1000)
+    scheduler = make_scheduler(store, clock)
+
+    async def schedule_all():
+        for chat_id in (1, 2, 3, 3):
+            assert await scheduler.schedule(make_signal(1100), chat_id)
+        await scheduler.schedule(make_signal(1500, asset="GBP/JPY"), 1)
+        assert not await scheduler.schedule(make_signal(500), 1), "Expired signals should not be scheduled"
+
+    asyncio.run(schedule_all())
+    assert scheduler.pending == 2
+
+    bot = FakeBot()
+    clock.now = 1220
+    assert asyncio.run(scheduler.fire_due(bot)) == 1
+    assert sorted(chat_id for chat_id, _ in bot.sent) == [1, 2, 3]
+    assert all("SIGNAL EXPIRED" in text for _, text in bot.sent)
+    assert scheduler.pending == 1
+    assert [row[0] for row in store.pending_expiries()] == [make_signal(1500, asset="GBP/JPY").id]
+
+def test_pending_notices_survive_restart():
+    """A new scheduler should reload pending notices and drop stale ones"""
+    store = Storage("sqlite://", seed_keys=[])
+    clock = FakeClock(1000)
+    first = make_scheduler(store, clock)
+
+    async def schedule_all():
+        await first.schedule(make_signal(1100), 1)
+        await first.schedule(make_signal(1100), 2)
+        await first.schedule(make_signal(2000), 3)
+
+    asyncio.run(schedule_all())
+
+    # Restart well after the first signal expired, within grace of the second
+    clock.now = 2500
+    restarted = make_scheduler(store, clock)
+    asyncio.run(restarted.load())
+    assert restarted.pending == 2
+
+    bot = FakeBot()
+    assert asyncio.run(restarted.fire_due(bot)) == 1
+    assert bot.sent and [chat_id for chat_id, _ in bot.sent] == [3]
+    assert store.pending_expiries() == []
+
+def test_background_loop_fires_on_time():
+    """The running scheduler should wake up for a newly scheduled earlier deadline"""
+    async def scenario():
+        store = Storage("sqlite://", seed_keys=[])
+        scheduler = ExpiryScheduler(store, BroadcastEngine(rate=1000, per_chat_interval=0), delay=0.2)
+        bot = FakeBot()
+        await scheduler.start(bot)
+        now = time.time()
+        await scheduler.schedule(make_signal(now + 60), 1)
+        await scheduler.schedule(make_signal(now), 2)
+
+        await asyncio.sleep(0.5)
+        await scheduler.stop()
+        return bot.sent, scheduler.pending
+
+    sent, pending = asyncio.run(scenario())
+    assert [chat_id for chat_id, _ in sent] == [2]
+    assert pending == 1
+
+def test_store_calls_run_off_the_loop():
+    """Scheduling, reloading and expiring should never call the store on the event loop"""
+    store = Storage("sqlite://", seed_keys=[])
+    clock = FakeClock(1000)
+    loop_threads = set()
+
+    class ThreadCheckingStore:
+        """Fails any store call made on the thread running the event loop"""
+        def __getattr__(self, name):
+            method = getattr(store, name)
+
+            def call(*args):
+                assert threading.get_ident() not in loop_threads, f"{name} ran on the event loop"
+                return method(*args)
+            return call
+
+    async def scenario():
+        loop_threads.add(threading.get_ident())
+        scheduler = make_scheduler(ThreadCheckingStore(), clock)
+        assert await scheduler.schedule(make_signal(1100), 1)
+        await scheduler.load()
+        clock.now = 1220
+        return await scheduler.fire_due(FakeBot())
+
+    assert asyncio.run(scenario()) == 1
+    assert store.pending_expiries() == []
+
+if __name__ == "__main__":
+    test_chats_are_coalesced_per_signal()
+    test_pending_notices_survive_restart()
+    test_background_loop_fires_on_time()
+    test_store_calls_run_off_the_loop()
+    logger.info("=== EXPIRY TEST COMPLETED SUCCESSFULLY ===")
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Test script to verify signal times and expiry deadlines do not depend on the host's timezone.
+
+Each check runs with the process timezone switched through several zones
+and the clock frozen at the same instant; every result must be identical.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from broadcast import BroadcastEngine
+from expiry import ExpiryScheduler
+from signal_model import Direction, Signal
+from signal_schema import SignalNormalizer
+from storage import Storage
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    stream=sys.stdout
+)
+logger = logging.getLogger(__name__)
+
+HOST_TIMEZONES = ("UTC", "Asia/Kolkata", "America/New_York", "Pacific/Kiritimati", "Pacific/Pago_Pago")
+
+# 2024-05-01 08:00 in UTC+6:00
+FROZEN_NOW = datetime(2024, 5, 1, 2, 0, tzinfo=timezone.utc)
+
+@contextmanager
+def host_timezone(name):
+    """Switch the process-local timezone, as if the bot ran on a host in that zone"""
+    previous = os.environ.get("TZ")
+    os.environ["TZ"] = name
+    time.tzset()
+    try:
+        yield
+    finally:
+        if previous is None:
+            os.environ.pop("TZ", None)
+        else:
+            os.environ["TZ"] = previous
+        time.tzset()
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        self.sent.append(chat_id)
+
+def test_normalized_signals_are_host_independent():
+    """Epoch timestamps and formatted times should not change with the host zone"""
+    records = [{"entrada": entry, "ativos": "EUR/USD", "direcao_principal": "CALL"}
+               for entry in ("07:59", "08:00", "09:30", "23:59")]
+    results = {}
+    for name in HOST_TIMEZONES:
+        with host_timezone(name):
+            normalizer = SignalNormalizer(source_tz="UTC+6:00", target_tz="Asia/Kolkata")
+            results[name] = normalizer.normalize(records, now=FROZEN_NOW)
+
+    expected = results["UTC"]
+    assert [signal.original_time for signal in expected] == ["08:00", "09:30", "23:59"]
+    assert expected[0].timestamp == FROZEN_NOW.timestamp()
+    assert expected[1].converted_time == "2024-05-01 09:00:00 IST"
+    for name, signals in results.items():
+        assert signals == expected, f"Signals differ on a host in {name}"
+
+def test_expiry_deadlines_are_host_independent():
+    """The scheduler should fire the same notices at the same instants in every host zone"""
+    signal = Signal("EUR/USD", Direction.CALL, timestamp=FROZEN_NOW.timestamp() + 60)
+    for name in HOST_TIMEZONES:
+        with host_timezone(name):
+            now = [FROZEN_NOW.timestamp()]
+            clock = lambda: now[0]
+            scheduler = ExpiryScheduler(Storage("sqlite://", seed_keys=[]),
+                                        BroadcastEngine(rate=1000, per_chat_interval=0),
+                                        delay=120, clock=clock, monotonic=clock)
+            bot = FakeBot()
+            assert asyncio.run(scheduler.schedule(signal, 1))
+
+            now[0] += 179
+            assert asyncio.run(scheduler.fire_due(bot)) == 0, f"Fired early on a host in {name}"
+            now[0] += 1
+            assert asyncio.run(scheduler.fire_due(bot)) == 1, f"Did not fire on a host in {name}"
+            assert bot.sent == [1]
+
+def test_expiry_fires_within_jitter():
+    """With real clocks a notice should fire no earlier than its deadline and only slightly after"""
+    fired_at = []
+
+    class TimingBot:
+        async def send_message(self, chat_id, text, parse_mode=None):
+            fired_at.append(time.time())
+
+    async def scenario():
+        scheduler = ExpiryScheduler(Storage("sqlite://", seed_keys=[]),
+                                    BroadcastEngine(rate=1000, per_chat_interval=0), delay=0)
+        await scheduler.start(TimingBot())
+        due_at = time.time() + 0.3
+        await scheduler.schedule(Signal("EUR/USD", Direction.PUT, timestamp=due_at), 1)
+        await asyncio.sleep(0.6)
+        await scheduler.stop()
+        return due_at
+
+    due_at = asyncio.run(scenario())
+    assert len(fired_at) == 1
+    lateness = fired_at[0] - due_at
+    logger.info(f"Expiry fired {lateness * 1000:.1f}ms after its deadline")
+    assert -0.005 <= lateness < 0.1
+
+if __name__ == "__main__":
+    test_normalized_signals_are_host_independent()
+    test_expiry_deadlines_are_host_independent()
+    test_expiry_fires_within_jitter()
+    logger.info("=== HOST TIMEZONES TEST COMPLETED SUCCESSFULLY ===")
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Test script to verify streaming parsing of large signal payloads.
+"""
+
+import asyncio
+import json
+import logging
+import sys
+from datetime import datetime
+import pytz
+from json_stream import IncompleteJSON, SignalArrayParser, iter_signal_records
+from signal_schema import SignalNormalizer
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    stream=sys.stdout
+)
+logger = logging.getLogger(__name__)
+
+def chunked(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+def parse(text, size=7):
+    parser = SignalArrayParser()
+    records = []
+    for chunk in chunked(text, size):
+        records.extend(parser.feed(chunk))
+    records.extend(parser.close())
+    return records
+
+def test_payload_shapes():
+    """Every payload shape the API has used should parse, whatever the chunk size"""
+    signals = [{"entrada": f"{hour:02d}:00", "ativos": "EUR/USD", "n": hour * 1.5} for hour in range(24)]
+    documents = [
+        json.dumps(signals),
+        json.dumps({"status": "ok", "count": 24, "signals": signals, "extra": [1, 2]}),
+        json.dumps({"meta": {"page": 1}, "data": signals}, indent=2),
+        json.dumps({"status": "ok", "items": signals}),
+    ]
+    for document in documents:
+        for size in (1, 3, 64, len(document)):
+            assert parse(document, size) == signals, f"Failed on chunk size {size}: {document[:40]}"
+
+    assert parse(json.dumps({"status": "ok"})) == []
+    assert parse("[]") == []
+
+def test_truncated_payload():
+    """A truncated payload should raise instead of silently returning part of it"""
+    try:
+        parse('{"signals": [{"entrada": "09:00"}, {"entr')
+    except IncompleteJSON:
+        return
+    assert False, "Truncated payload should raise"
+
+def test_stops_after_limit():
+    """Streaming should stop reading once enough upcoming signals were found"""
+    records = [{"entrada": f"{hour:02d}:{minute:02d}", "ativos": f"PAIR{hour}"} for hour in range(24)
+               for minute in range(0, 60, 5)]
+    document = json.dumps({"signals": records})
+    chunks = chunked(document, 256)
+    served = []
+
+    async def body():
+        for chunk in chunks:
+            served.append(chunk)
+            yield chunk
+
+    # 12:00 in UTC+6:00, so half of the day is already expired
+    now = pytz.FixedOffset(6 * 60).localize(datetime(2024, 5, 1, 12, 0))
+    normalizer = SignalNormalizer(source_tz="UTC+6:00", target_tz="Asia/Kolkata")
+
+    signals = asyncio.run(normalizer.normalize_stream(iter_signal_records(body()), now=now, stop_after=3))
+
+    logger.info(f"Read {len(served)} of {len(chunks)} chunks")
+    assert [signal.original_time for signal in signals] == ["12:00", "12:05", "12:10"]
+    assert len(served) < len(chunks), "The rest of the body should not be read"
+
+    everything = asyncio.run(normalizer.normalize_stream(iter_signal_records(body()), now=now))
+    assert everything == normalizer.normalize(records, now=now)
+
+def test_stop_after_is_a_scan_cutoff():
+    """stop_after keeps the first upcoming signals in document order, not the soonest ones"""
+    records = [{"entrada": entry, "ativos": "EUR/USD"} for entry in ("15:00", "13:00", "14:00", "12:30")]
+
+    async def body():
+        yield json.dumps({"signals": records})
+
+    now = pytz.FixedOffset(6 * 60).localize(datetime(2024, 5, 1, 12, 0))
+    normalizer = SignalNormalizer(source_tz="UTC+6:00", target_tz="Asia/Kolkata")
+    signals = asyncio.run(normalizer.normalize_stream(iter_signal_records(body()), now=now,
+                                                      stop_after=2, batch_size=1))
+    assert [signal.original_time for signal in signals] == ["15:00", "13:00"]
+
+if __name__ == "__main__":
+    test_payload_shapes()
+    test_truncated_payload()
+    test_stops_after_limit()
+    test_stop_after_is_a_scan_cutoff()
+    logger.info("=== JSON STREAM TEST COMPLETED SUCCESSFULLY ===")
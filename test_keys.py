@@ -4,9 +4,15 @@ Test script to verify the single-use key system functionality.
 """
 
 import logging
+import os
 import sys
-from config import VALID_KEYS, USED_KEYS, PERMANENT_KEY
-from utils import verify_private_key, generate_new_key, get_all_valid_keys
+
+# Use a throwaway in-memory database so the test never touches real keys
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from config import PERMANENT_KEY
+from storage import store
+from utils import verify_private_key, generate_new_key, generate_keys, get_all_valid_keys
 
 # Configure logging
 logging.basicConfig(
@@ -21,8 +27,8 @@ def test_key_system():
     logger.info("=== TESTING SINGLE-USE KEY SYSTEM ===")
     
     # Display initial state
-    logger.info(f"Valid keys: {VALID_KEYS}")
-    logger.info(f"Used keys: {USED_KEYS}")
+    logger.info(f"Valid keys: {store.count_keys()}")
+    logger.info(f"Used keys: {store.count_used_keys()}")
     logger.info(f"Permanent key: {PERMANENT_KEY}")
     
     # Test generating new keys
@@ -34,7 +40,7 @@ def test_key_system():
         logger.info(f"Generated key {i+1}: {key}")
     
     # Display valid keys after generation
-    logger.info(f"\nValid keys after generation: {VALID_KEYS}")
+    logger.info(f"\nValid keys after generation: {store.count_keys()}")
     logger.info(f"Unused keys: {get_all_valid_keys()}")
     
     # Test key verification (single-use keys)
@@ -51,7 +57,7 @@ def test_key_system():
         assert result2 == False, f"Second verification of key {key} should fail (key already used)"
     
     # Show used keys
-    logger.info(f"\nUsed keys after verification: {USED_KEYS}")
+    logger.info(f"\nUsed keys after verification: {store.count_used_keys()}")
     
     # Test permanent key (should always work)
     logger.info("\n=== TESTING PERMANENT KEY ===")
@@ -67,5 +73,25 @@ def test_key_system():
     
     logger.info("\n=== KEY SYSTEM TEST COMPLETED SUCCESSFULLY ===")
 
+def test_bulk_key_generation():
+    """Test generating a large batch of keys in one call"""
+    logger.info("=== TESTING BULK KEY GENERATION ===")
+    
+    keys_before = store.count_keys()
+    new_keys = generate_keys(20000)
+    logger.info(f"Generated {len(new_keys)} keys, e.g. {new_keys[:3]}")
+    
+    assert len(new_keys) == 20000, "Bulk generation should return the requested count"
+    assert len(set(new_keys)) == 20000, "Bulk generated keys should be unique"
+    assert store.count_keys() == keys_before + 20000, "Every key should be stored"
+    assert all(key.isalnum() and key.isupper() for key in new_keys[:100])
+    
+    # Bulk keys are regular single-use keys
+    assert verify_private_key(new_keys[0]) == True
+    assert verify_private_key(new_keys[0]) == False
+    
+    logger.info("\n=== BULK KEY GENERATION TEST COMPLETED SUCCESSFULLY ===")
+
 if __name__ == "__main__":
-    test_key_system()
\ No newline at end of file
+    test_key_system()
+    test_bulk_key_generation()
\ No newline at end of file
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the queued, structured and sampled logging pipeline.
+"""
+
+import io
+import json
+import logging
+import sys
+import logging_setup
+from logging_setup import JsonFormatter, SampledLogger, parse_levels, setup_logging
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    stream=sys.stdout
+)
+logger = logging.getLogger(__name__)
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+def test_json_records():
+    """Records should become one JSON object per line with extra fields"""
+    record = logging.makeLogRecord({
+        "name": "signal_poller", "levelno": logging.INFO, "levelname": "INFO",
+        "msg": "Pushed %d signals", "args": (3,), "chat_id": 42
+    })
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["message"] == "Pushed 3 signals"
+    assert entry["logger"] == "signal_poller" and entry["level"] == "INFO"
+    assert entry["chat_id"] == 42
+    assert entry["time"].endswith("+00:00")
+
+def test_queue_defers_formatting():
+    """Immutable arguments travel unformatted; mutable ones are rendered up front"""
+    handler = logging_setup._DeferredQueueHandler(None)
+    lazy = handler.prepare(logging.makeLogRecord({"msg": "Signal %s at %d", "args": ("EUR/USD", 5)}))
+    assert lazy.msg == "Signal %s at %d" and lazy.args == ("EUR/USD", 5)
+
+    signal = {"asset": "EUR/USD"}
+    eager = handler.prepare(logging.makeLogRecord({"msg": "Signal %s", "args": (signal,)}))
+    signal["asset"] = "changed"
+    assert eager.msg == "Signal {'asset': 'EUR/USD'}" and eager.args is None
+
+def test_sampled_logger():
+    """Only one in every N calls should be logged, and disabled levels not at all"""
+    sampled = logging.getLogger("test_logging_setup.sampled")
+    sampled.propagate = False
+    sampled.setLevel(logging.INFO)
+    handler = ListHandler()
+    sampled.addHandler(handler)
+
+    log = SampledLogger(sampled, every=10)
+    for i in range(25):
+        log.warning("Transient error sending to %s", i)
+        log.debug("Never logged %s", i)
+
+    assert [record.getMessage() for record in handler.records] == [
+        "Transient error sending to 0", "Transient error sending to 10", "Transient error sending to 20"
+    ]
+    assert handler.records[1].calls == 11 and handler.records[1].sampled_every == 10
+    assert handler.records[0].funcName == "test_sampled_logger"
+
+def test_setup_logging_levels_and_queue():
+    """setup_logging should write through the listener with per-module levels"""
+    assert parse_levels("signal_schema=debug, httpx=WARNING,,bad") == {"signal_schema": "DEBUG", "httpx": "WARNING"}
+
+    root = logging.getLogger()
+    saved_handlers, saved_level = list(root.handlers), root.level
+    stream = io.StringIO()
+    try:
+        setup_logging(level="INFO", levels="noisy=ERROR", log_format="json", stream=stream)
+        logging.getLogger("quiet").info("Kept %s", "message")
+        logging.getLogger("noisy").warning("Dropped")
+        logging.getLogger("quiet").debug("Below the root level")
+        logging_setup._listener.stop()
+        logging_setup._listener = None
+    finally:
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        for handler in saved_handlers:
+            root.addHandler(handler)
+        root.setLevel(saved_level)
+        logging.getLogger("noisy").setLevel(logging.NOTSET)
+
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [(line["logger"], line["message"]) for line in lines] == [("quiet", "Kept message")]
+
+if __name__ == "__main__":
+    test_json_records()
+    test_queue_defers_formatting()
+    test_sampled_logger()
+    test_setup_logging_levels_and_queue()
+    logger.info("=== LOGGING SETUP TEST COMPLETED SUCCESSFULLY ===")
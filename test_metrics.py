@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the metrics registry and the Prometheus output.
+"""
+
+import asyncio
+import logging
+import sys
+from metrics import Counter, Gauge, Histogram, Registry, instrument_handler, render, sample_value
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    stream=sys.stdout
+)
+logger = logging.getLogger(__name__)
+
+def test_prometheus_rendering():
+    """Counters, gauges and histograms should render in the text format"""
+    registry = Registry()
+    requests = Counter("requests_total", "Requests", ["outcome"], registry=registry)
+    depth = Gauge("queue_depth", "Queue depth", ["queue"], registry=registry)
+    latency = Histogram("latency_seconds", "Latency", buckets=(0.1, 1.0), registry=registry)
+
+    requests.inc(outcome="ok")
+    requests.inc(2, outcome="ok")
+    requests.inc(outcome='bad "quote"')
+    depth.set_function(lambda: 7, queue="webhook")
+    for value in (0.05, 0.5, 3.0):
+        latency.observe(value)
+
+    text = registry.render()
+    logger.info(f"Rendered metrics:\n{text}")
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{outcome="ok"} 3' in text
+    assert 'requests_total{outcome="bad \\"quote\\""} 1' in text
+    assert 'queue_depth{queue="webhook"} 7' in text
+    assert 'latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{le="1"} 2' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 3' in text
+    assert "latency_seconds_count 3" in text
+
+    try:
+        requests.inc(method="GET")
+        assert False, "Unknown labels should be rejected"
+    except ValueError:
+        pass
+
+def test_published_families_render_elsewhere():
+    """Collected families should survive JSON and render the same in another process"""
+    import json
+    registry = Registry()
+    Counter("fetch_total", "Fetches", ["outcome"], registry=registry).inc(outcome="ok")
+
+    families = json.loads(json.dumps(registry.collect()))
+    assert render(families) == registry.render()
+    assert sample_value(families, "fetch_total") == 1
+    assert sample_value(families, "fetch_total", outcome="error") == 0
+
+def test_instrumented_handler_counts_errors():
+    """Wrapped handlers should be counted and timed, and still raise"""
+    from metrics import HANDLER_CALLS, HANDLER_ERRORS, HANDLER_LATENCY
+
+    async def flaky_command(update, context):
+        if update == "boom":
+            raise RuntimeError("boom")
+        return "ok"
+
+    handler = instrument_handler(flaky_command)
+    assert handler.__name__ == "flaky_command"
+    assert asyncio.run(handler("hello", None)) == "ok"
+    try:
+        asyncio.run(handler("boom", None))
+        assert False, "Handler errors should propagate"
+    except RuntimeError:
+        pass
+
+    families = [{"samples": metric.collect()} for metric in (HANDLER_CALLS, HANDLER_ERRORS, HANDLER_LATENCY)]
+    assert sample_value(families, "bot_handler_calls_total", handler="flaky_command") == 2
+    assert sample_value(families, "bot_handler_errors_total", handler="flaky_command") == 1
+    assert sample_value(families, "bot_handler_seconds_count", handler="flaky_command") == 2
+
+if __name__ == "__main__":
+    test_prometheus_rendering()
+    test_published_families_render_elsewhere()
+    test_instrumented_handler_counts_errors()
+    logger.info("=== METRICS TEST COMPLETED SUCCESSFULLY ===")
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the shared signal cache (TTL, single-flight and stale-while-revalidate).
+"""
+
+import asyncio
+import logging
+import sys
+import time
+from signal_cache import SignalCache
+from signal_model import Direction, Signal
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    stream=sys.stdout
+)
+logger = logging.getLogger(__name__)
+
+class CountingFetcher:
+    """Fake upstream that counts calls and can be slowed down or failed"""
+
+    def __init__(self, delay=0.0):
+        self.calls = 0
+        self.delay = delay
+        self.fail = False
+
+    async def __call__(self):
+        self.calls += 1
+        call_number = self.calls
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError("upstream down")
+        return [Signal("BRLUSD_otc", Direction.CALL, original_time=f"14:{call_number:02d}")]
+
+def test_fresh_hits_do_not_refetch():
+    """Repeated reads within the TTL should hit upstream once"""
+    async def scenario():
+        fetcher = CountingFetcher()
+        cache = SignalCache(fetcher, ttl=60, max_stale=60)
+
+        for _ in range(100):
+            signals = await cache.get()
+
+        logger.info(f"Upstream calls for 100 reads: {fetcher.calls}")
+        assert fetcher.calls == 1, "Fresh cache should not refetch"
+        assert signals[0].asset == "BRLUSD_otc"
+
+    asyncio.run(scenario())
+
+def test_single_flight():
+    """Concurrent cold readers should share one upstream fetch"""
+    async def scenario():
+        fetcher = CountingFetcher(delay=0.2)
+        cache = SignalCache(fetcher, ttl=60, max_stale=60)
+
+        results = await asyncio.gather(*(cache.get() for _ in range(50)))
+
+        logger.info(f"Upstream calls for 50 concurrent readers: {fetcher.calls}")
+        assert fetcher.calls == 1, "Concurrent readers should share one fetch"
+        assert all(len(result) == 1 for result in results), "Every reader should get the signals"
+
+    asyncio.run(scenario())
+
+def test_stale_while_revalidate():
+    """Stale reads should return immediately and refresh in the background"""
+    async def scenario():
+        fetcher = CountingFetcher()
+        cache = SignalCache(fetcher, ttl=0.05, max_stale=60)
+        first = await cache.get()
+
+        await asyncio.sleep(0.1)
+        fetcher.delay = 0.3
+        started = time.monotonic()
+        stale = await cache.get()
+        elapsed = time.monotonic() - started
+
+        logger.info(f"Stale read returned in {elapsed:.3f}s")
+        assert elapsed < 0.1, "Stale read should not wait for the refresh"
+        assert stale == first, "Stale read should return the last good list"
+
+        await asyncio.sleep(0.5)
+        assert cache.peek()[0].original_time == "14:02", "Background refresh should publish the new list"
+
+    asyncio.run(scenario())
+
+def test_failed_refresh_keeps_last_good_list():
+    """An upstream failure should not wipe the cached signals"""
+    async def scenario():
+        fetcher = CountingFetcher()
+        cache = SignalCache(fetcher, ttl=0.05, max_stale=60)
+        first = await cache.get()
+
+        await asyncio.sleep(0.1)
+        fetcher.fail = True
+        await cache.get()
+        await asyncio.sleep(0.1)
+
+        assert await cache.get() == first, "Last good list should survive a failed refresh"
+
+    asyncio.run(scenario())
+
+def test_restart_on_a_new_loop():
+    """A fetch left in flight by a stopped bot loop should not block the next loop"""
+    fetcher = CountingFetcher(delay=60)
+    cache = SignalCache(fetcher, ttl=60, max_stale=60)
+
+    async def start_and_stop():
+        cache.invalidate()
+        asyncio.ensure_future(cache.refresh())
+        await asyncio.sleep(0)
+
+    # The bot thread's loop stops without finishing the fetch
+    old_loop = asyncio.new_event_loop()
+    old_loop.run_until_complete(start_and_stop())
+    old_loop.close()
+
+    fetcher.delay = 0
+    signals = asyncio.run(cache.get())
+    assert fetcher.calls == 2, "The new loop should start its own fetch"
+    assert signals[0].original_time == "14:02"
+
+if __name__ == "__main__":
+    test_fresh_hits_do_not_refetch()
+    test_single_flight()
+    test_stale_while_revalidate()
+    test_failed_refresh_keeps_last_good_list()
+    test_restart_on_a_new_loop()
+    logger.info("=== SIGNAL CACHE TEST COMPLETED SUCCESSFULLY ===")
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Test script to verify concurrent multi-feed fetching and the merge of their signals.
+"""
+
+import asyncio
+import logging
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+import httpx
+from signal_feeds import SignalAggregator, SignalFeed, merge_signals
+from signal_model import Direction, Signal
+from signal_schema import SignalNormalizer
+from signals_client import SignalsClient
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    stream=sys.stdout
+)
+logger = logging.getLogger(__name__)
+
+def make_signal(asset, direction, timestamp):
+    return Signal(asset, Direction.parse(direction), timestamp=timestamp)
+
+def test_merge_orders_and_deduplicates():
+    """Feeds should merge into one time-ordered list, shared signals listed once"""
+    first = [make_signal("EUR/USD", "CALL", 300), make_signal("GBP/JPY", "PUT", 100)]
+    second = [make_signal("eur/usd", "call", 300), make_signal("BTC/USD", "PUT", 200)]
+
+    merged = merge_signals([first, second], policy="drop")
+    assert [(signal.asset, signal.timestamp) for signal in merged] == [
+        ("GBP/JPY", 100), ("BTC/USD", 200), ("EUR/USD", 300)
+    ]
+    assert merged[2] is first[0], "The first feed's copy should be kept"
+
+def test_conflict_policies():
+    """Opposing directions for the same asset and time are resolved by the policy"""
+    first = [make_signal("EUR/USD", "CALL", 100), make_signal("GBP/JPY", "Unknown", 200)]
+    second = [make_signal("EUR/USD", "PUT", 100), make_signal("GBP/JPY", "PUT", 200)]
+    third = [make_signal("EUR/USD", "PUT", 100)]
+
+    dropped = merge_signals([first, second, third], policy="drop")
+    assert [(signal.asset, signal.direction) for signal in dropped] == [("GBP/JPY", Direction.PUT)], \
+        "Conflicts are dropped, an unknown direction is not a conflict"
+
+    kept = merge_signals([first, second, third], policy="first")
+    assert kept[0].direction == Direction.CALL
+
+    majority = merge_signals([first, second, third], policy="majority")
+    assert majority[0].direction == Direction.PUT
+    assert merge_signals([first, second], policy="majority")[0].asset == "GBP/JPY", "Ties should be dropped"
+
+    try:
+        merge_signals([first], policy="newest")
+        assert False, "Unknown policies should be rejected"
+    except ValueError:
+        pass
+
+def make_feed(name, delay, entries, deadline=5.0, status=200):
+    """A feed backed by a fake API answering after delay seconds"""
+    async def handler(request):
+        await asyncio.sleep(delay)
+        records = [{"entrada": entry, "ativos": asset, "direcao_principal": direction}
+                   for asset, direction, entry in entries]
+        return httpx.Response(status, json={"signals": records})
+
+    client = SignalsClient(url=f"http://{name}.test/signals", deadline=deadline, max_retries=0,
+                           transport=httpx.MockTransport(handler))
+    return SignalFeed(name, client, SignalNormalizer(source_tz="UTC", target_tz="UTC"))
+
+def test_fetch_takes_the_slowest_feed_not_the_sum():
+    """Feeds run concurrently, and a feed past its deadline only loses its own signals"""
+    soon = (datetime.now(timezone.utc) + timedelta(hours=1)).isoformat(timespec="seconds")
+    later = (datetime.now(timezone.utc) + timedelta(hours=2)).isoformat(timespec="seconds")
+    aggregator = SignalAggregator([
+        make_feed("fast", 0.2, [("EUR/USD", "CALL", later)]),
+        make_feed("also-fast", 0.2, [("GBP/JPY", "PUT", soon)]),
+        make_feed("stuck", 10, [("BTC/USD", "CALL", soon)], deadline=0.4),
+    ])
+
+    started = time.monotonic()
+    signals = asyncio.run(aggregator.fetch())
+    elapsed = time.monotonic() - started
+
+    logger.info(f"Fetched {len(signals)} signals from 3 feeds in {elapsed:.3f}s")
+    assert [signal.asset for signal in signals] == ["GBP/JPY", "EUR/USD"]
+    assert elapsed < 0.8, "Fetch should be bounded by the slowest deadline, not the sum"
+
+def test_every_feed_failing_is_an_error():
+    """Only a fetch where no feed answered should raise"""
+    aggregator = SignalAggregator([
+        make_feed("down", 0, [], status=404),
+        make_feed("also-down", 0, [], status=404),
+    ])
+    try:
+        asyncio.run(aggregator.fetch())
+        assert False, "All feeds failing should raise"
+    except httpx.HTTPStatusError:
+        pass
+
+if __name__ == "__main__":
+    test_merge_orders_and_deduplicates()
+    test_conflict_policies()
+    test_fetch_takes_the_slowest_feed_not_the_sum()
+    test_every_feed_failing_is_an_error()
+    logger.info("=== SIGNAL FEEDS TEST COMPLETED SUCCESSFULLY ===")
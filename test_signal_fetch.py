@@ -4,6 +4,7 @@ Test script to verify signal fetching, timezone conversion and formatting.
 import logging
 import datetime
 import pytz
+from signal_model import Signal
 from utils import format_signal_message, convert_timezone
 
 # Set up logging
@@ -123,7 +124,11 @@ if __name__ == "__main__":
         print(f"Converted Time (GMT+5:30): {signal['converted_time']}")
         
         # Format the signal message
-        formatted = format_signal_message(signal)
+        formatted = format_signal_message(Signal.at(
+            signal["asset"], signal["direction"],
+            convert_timezone(signal["original_time"], SOURCE_TIMEZONE, TARGET_TIMEZONE).timestamp(),
+            original_time=signal["original_time"]
+        ))
         print(f"\nFormatted message:\n{formatted}")
         
     print("\nTimezone conversion and filtering test completed!")
\ No newline at end of file
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the time-ordered signal index.
+"""
+
+import asyncio
+import logging
+import sys
+import time
+from signal_cache import SignalCache
+from signal_index import SignalIndex, diff_signals
+from signal_model import Direction, Signal, content_hash
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    stream=sys.stdout
+)
+logger = logging.getLogger(__name__)
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+def make_signal(asset, timestamp=None, direction=Direction.CALL):
+    return Signal(asset, direction, timestamp=timestamp)
+
+def make_signals():
+    # API order is not time order
+    return [
+        make_signal("EUR/USD", 1300),
+        make_signal("GBP/JPY", 1100),
+        make_signal("EUR/USD", 1000),
+        make_signal("GBP/JPY", 1200),
+        make_signal("BTC/USD"),
+    ]
+
+def test_next_and_upcoming():
+    """Signals should come back ordered by due time, undated ones last"""
+    clock = FakeClock(900)
+    index = SignalIndex(make_signals(), clock=clock)
+
+    assert index.next().timestamp == 1000
+    assert [signal.timestamp for signal in index.upcoming()] == [1000, 1100, 1200, 1300, None]
+    assert [signal.timestamp for signal in index.upcoming(limit=2)] == [1000, 1100]
+    assert len(index) == 5
+
+def test_lazy_expiry():
+    """Advancing the clock should drop expired signals without a refetch"""
+    clock = FakeClock(900)
+    index = SignalIndex(make_signals(), clock=clock)
+
+    clock.now = 1150
+    assert index.next().timestamp == 1200
+    assert len(index) == 3
+
+    clock.now = 5000
+    assert index.next() == make_signal("BTC/USD"), "Undated signals never expire"
+
+def test_for_asset():
+    """Per-asset queries should honour the after bound"""
+    index = SignalIndex(make_signals(), clock=FakeClock(900))
+
+    assert [signal.timestamp for signal in index.for_asset("EUR/USD")] == [1000, 1300]
+    assert [signal.timestamp for signal in index.for_asset("EUR/USD", after=1001)] == [1300]
+    assert [signal.timestamp for signal in index.for_asset("GBP/JPY", limit=1)] == [1100]
+    assert index.for_asset("XAU/USD") == []
+
+def test_cache_serves_index():
+    """The cache should expose the next signal from its snapshot"""
+    now = time.time()
+
+    async def fetcher():
+        return [make_signal("EUR/USD", now + offset) for offset in (60, -60, 30)]
+
+    async def scenario():
+        cache = SignalCache(fetcher, ttl=60, max_stale=60)
+        assert (await cache.get_index()).next().timestamp == now + 30
+        assert [signal.timestamp for signal in await cache.get()] == [now + 30, now + 60]
+
+    asyncio.run(scenario())
+
+def test_content_hash():
+    """The hash should ignore case and whitespace but not the due time"""
+    key = content_hash("BRLUSD_otc", "CALL", 1714534200)
+    assert key == content_hash(" brlusd_OTC ", "call", 1714534200)
+    assert key != content_hash("BRLUSD_otc", "PUT", 1714534200)
+    assert key != content_hash("BRLUSD_otc", "CALL", 1714534200 + 86400), "Same time tomorrow is another signal"
+    assert Signal("BRLUSD_otc", Direction.parse("compra"), "14:30", 1714534200).id == key
+    assert Signal("BRLUSD_otc", Direction.CALL, "14:30", 1714534200, id="cached").id == "cached"
+
+def test_diff_signals():
+    """Deltas should reuse previous dicts and drop duplicates"""
+    previous = [make_signal("EUR/USD", 1000), make_signal("GBP/JPY", 1100, Direction.PUT)]
+    current = [make_signal("EUR/USD", 1000), make_signal("USD/JPY", 1200, Direction.PUT),
+               make_signal("USD/JPY", 1200, Direction.PUT)]
+
+    delta = diff_signals(previous, current)
+    assert delta.changed
+    assert delta.unchanged == [previous[0]] and delta.unchanged[0] is previous[0]
+    assert delta.added == [current[1]]
+    assert delta.removed == [previous[1]]
+    assert delta.signals == [previous[0], current[1]]
+    assert not diff_signals(current, current).changed
+
+def test_cache_keeps_index_when_unchanged():
+    """Refetching the same signals should not rebuild the index"""
+    now = time.time()
+    upstream = [make_signal("EUR/USD", now + 60)]
+
+    async def fetcher():
+        return [make_signal(signal.asset, signal.timestamp, signal.direction) for signal in upstream]
+
+    async def scenario():
+        cache = SignalCache(fetcher, ttl=60, max_stale=60)
+        first = await cache.get_index()
+        assert await cache.refresh()
+        assert await cache.get_index() is first and not cache.last_delta.changed
+
+        upstream.append(make_signal("GBP/JPY", now + 30, Direction.PUT))
+        assert await cache.refresh()
+        assert cache.last_delta.added == [upstream[1]]
+        assert (await cache.get_index()).next().asset == "GBP/JPY"
+
+    asyncio.run(scenario())
+
+if __name__ == "__main__":
+    test_next_and_upcoming()
+    test_lazy_expiry()
+    test_for_asset()
+    test_cache_serves_index()
+    test_content_hash()
+    test_diff_signals()
+    test_cache_keeps_index_when_unchanged()
+    logger.info("=== SIGNAL INDEX TEST COMPLETED SUCCESSFULLY ===")
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the direction lookup table and the rendered message cache.
+"""
+
+import dataclasses
+import logging
+import os
+import sys
+
+# Use a throwaway in-memory database, utils imports the shared store
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from signal_model import Signal
+from utils import _render_signal_message, direction_side, format_signal_message
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    stream=sys.stdout
+)
+logger = logging.getLogger(__name__)
+
+# 2024-05-01 09:00 IST
+SIGNAL = Signal.at("EUR/USD", "compra", 1714534200, original_time="09:30", tz="Asia/Kolkata")
+
+def test_direction_table():
+    """English and Portuguese variants should map to CALL/PUT"""
+    for word in ("call", "CALL", "Compra", "alta", " call "):
+        assert direction_side(word) == "CALL", word
+    for word in ("put", "Venda", "BAIXA", "venda forte"):
+        assert direction_side(word) == "PUT", word
+    assert direction_side("sideways") == "SIDEWAYS"
+    assert direction_side(None) == "UNKNOWN"
+
+def test_messages_are_rendered_once():
+    """A broadcast should render each signal once, whatever the number of chats"""
+    _render_signal_message.cache_clear()
+    messages = {format_signal_message(dataclasses.replace(SIGNAL)) for _ in range(1000)}
+
+    info = _render_signal_message.cache_info()
+    logger.info(f"Render cache: {info}")
+    assert len(messages) == 1
+    assert info.misses == 1 and info.hits == 999
+
+    message = messages.pop()
+    assert "Direction: *CALL* 📈" in message
+    assert "Entry Time: *2024-05-01 09:00:00 IST*" in message
+    assert "SIGNAL EXPIRED" in format_signal_message(SIGNAL, is_expiry=True)
+
+def test_html_rendering_escapes_fields():
+    """HTML captions should use tags and escape API-provided text"""
+    signal = dataclasses.replace(SIGNAL, asset="BRL<USD>_otc", id=None)
+    message = format_signal_message(signal, parse_mode="HTML")
+    assert "<b>BRL&lt;USD&gt;_otc</b>" in message
+    assert "*" not in message
+
+def test_unrecognised_directions_are_shown_as_sent():
+    """A direction that is neither CALL nor PUT should be shown as the API sent it"""
+    signal = Signal.at("EUR/USD", "sideways", 1714534200, original_time="09:30", tz="Asia/Kolkata")
+    assert signal.direction == "UNKNOWN"
+    assert "Direction: *SIDEWAYS* ❓" in format_signal_message(signal)
+
+    restored = Signal.from_dict(signal.to_dict())
+    assert restored == signal and restored.direction_text == "SIDEWAYS"
+
+if __name__ == "__main__":
+    test_direction_table()
+    test_messages_are_rendered_once()
+    test_html_rendering_escapes_fields()
+    test_unrecognised_directions_are_shown_as_sent()
+    logger.info("=== SIGNAL MESSAGE TEST COMPLETED SUCCESSFULLY ===")
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the background signal poller and its push fan-out.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+from types import SimpleNamespace
+
+# Use a throwaway in-memory database for the subscriber list
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from broadcast import BroadcastEngine
+from signal_cache import SignalCache
+from signal_model import Direction, Signal
+from signal_poller import SignalPoller
+from storage import store
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    stream=sys.stdout
+)
+logger = logging.getLogger(__name__)
+
+def make_signal(asset, direction, time):
+    return Signal(asset, Direction.parse(direction), original_time=time)
+
+class FakeBot:
+    """Records outgoing messages instead of calling Telegram"""
+
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        self.sent.append((chat_id, text))
+
+def test_first_snapshot_only_seeds():
+    """The first poll should not re-announce existing signals"""
+    poller = SignalPoller(cache=None, engine=None)
+    signals = [make_signal("BRLUSD_otc", "CALL", "14:30")]
+
+    assert poller.diff(signals).added == [], "First snapshot should only seed"
+    delta = poller.diff([make_signal("BRLUSD_otc", "CALL", "14:30")])
+    assert delta.added == [] and not delta.changed, "Unchanged snapshot should push nothing"
+    assert delta.unchanged[0] is signals[0], "Unchanged signals should keep their first dict"
+
+def test_only_new_signals_are_pushed():
+    """Signals missing from the previous snapshot should be pushed to every user"""
+    async def scenario():
+        upstream = [make_signal("BRLUSD_otc", "CALL", "14:30")]
+
+        async def fetcher():
+            return list(upstream)
+
+        cache = SignalCache(fetcher, ttl=60, max_stale=60)
+        poller = SignalPoller(cache, BroadcastEngine(rate=1000, per_chat_interval=0), banner=None)
+        bot = FakeBot()
+        context = SimpleNamespace(bot=bot)
+
+        assert await poller.poll(context) is None, "Seeding poll should not push"
+
+        upstream.append(make_signal("USDINR_otc", "PUT", "15:00"))
+        await (await poller.poll(context))
+
+        logger.info(f"Pushed {len(bot.sent)} messages")
+        assert sorted(chat_id for chat_id, _ in bot.sent) == sorted(store.user_ids())
+        assert all("USDINR_otc" in text for _, text in bot.sent), "Only the new signal should be pushed"
+
+    for user_id in (1001, 1002, 1003):
+        store.add_user(user_id)
+    asyncio.run(scenario())
+
+if __name__ == "__main__":
+    test_first_snapshot_only_seeds()
+    test_only_new_signals_are_pushed()
+    logger.info("=== SIGNAL POLLER TEST COMPLETED SUCCESSFULLY ===")
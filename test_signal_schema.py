@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the precompiled signal normalization schema.
+"""
+
+import logging
+import sys
+from datetime import datetime
+import pytz
+from signal_model import Direction, Signal
+from signal_schema import FieldMapping, SignalNormalizer, detect_mapping
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    stream=sys.stdout
+)
+logger = logging.getLogger(__name__)
+
+# 08:00 in UTC+6:00, so 09:00 and later are still upcoming
+NOW = pytz.FixedOffset(6 * 60).localize(datetime(2024, 5, 1, 8, 0)).astimezone(pytz.utc)
+
+def test_detects_mapping_once_and_normalizes():
+    """The detected mapping should produce the same output as per-record probing"""
+    records = [
+        {"entrada": "09:30", "ativos": "EUR/USD", "direcao_principal": "CALL"},
+        {"entrada": "1015", "ativos": "GBP/JPY", "direcao_principal": "PUT"},
+        {"entrada": "07:00", "ativos": "USD/JPY", "direcao_principal": "PUT"},
+        {"entrada": "", "ativos": "AUD/CAD"},
+    ]
+    assert detect_mapping(records) == FieldMapping("entrada", "ativos", "direcao_principal")
+
+    signals = SignalNormalizer().normalize(records, now=NOW)
+    logger.info(f"Normalized signals: {signals}")
+
+    assert signals == [
+        Signal.at("EUR/USD", "CALL", 1714534200, original_time="09:30"),
+        Signal.at("GBP/JPY", "PUT", 1714536900, original_time="10:15"),
+    ]
+    assert [signal.converted_time for signal in signals] == ["2024-05-01 09:00:00 IST", "2024-05-01 09:45:00 IST"]
+    assert all(isinstance(signal.timestamp, int) for signal in signals)
+
+def test_configured_mapping_with_fallback():
+    """A configured mapping is used as-is; records missing a field fall back to probing"""
+    normalizer = SignalNormalizer(mapping=FieldMapping.from_config({"time": "hora", "asset": "pair"}))
+    records = [
+        {"hora": "12:00", "pair": "BTC/USD", "direction": "CALL"},
+        {"time": "13:00", "symbol": "ETH/USD"},
+    ]
+
+    signals = normalizer.normalize(records, now=NOW)
+
+    assert [(s.asset, s.direction, s.original_time) for s in signals] == [
+        ("BTC/USD", Direction.CALL, "12:00"),
+        ("ETH/USD", Direction.UNKNOWN, "13:00"),
+    ]
+
+def test_unrecognized_payload():
+    """A payload without any time field should yield no signals"""
+    assert detect_mapping([{"foo": "bar"}]) is None
+    assert SignalNormalizer().normalize([{"foo": "bar"}], now=NOW) == []
+
+if __name__ == "__main__":
+    test_detects_mapping_once_and_normalizes()
+    test_configured_mapping_with_fallback()
+    test_unrecognized_payload()
+    logger.info("=== SIGNAL SCHEMA TEST COMPLETED SUCCESSFULLY ===")
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Test script to verify retries, deadlines and the circuit breaker of the signals API client.
+"""
+
+import asyncio
+import logging
+import sys
+import time
+import httpx
+from signals_client import CircuitBreaker, CircuitOpenError, SignalsClient, UpstreamError
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    stream=sys.stdout
+)
+logger = logging.getLogger(__name__)
+
+async def read_json(response):
+    await response.aread()
+    return response.json()
+
+def make_client(handler, **kwargs):
+    kwargs.setdefault("backoff", 0.01)
+    return SignalsClient(url="http://signals.test/list", transport=httpx.MockTransport(handler), **kwargs)
+
+def test_retries_transient_failures():
+    """5xx responses and connection errors should be retried with backoff"""
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) == 1:
+            raise httpx.ConnectError("connection refused")
+        if len(calls) == 2:
+            return httpx.Response(503)
+        return httpx.Response(200, json={"signals": [{"entrada": "10:00"}]})
+
+    client = make_client(handler, max_retries=3, api_key="secret")
+    data = asyncio.run(client.fetch(read_json))
+
+    assert data == {"signals": [{"entrada": "10:00"}]}
+    assert len(calls) == 3
+    assert calls[-1].headers["Authorization"] == "Bearer secret"
+    assert client.breaker.state == "closed"
+
+def test_client_errors_are_not_retried():
+    """A 404 is not transient and should fail on the first attempt"""
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(404)
+
+    try:
+        asyncio.run(make_client(handler, max_retries=3).fetch(read_json))
+    except httpx.HTTPStatusError:
+        assert len(calls) == 1
+        return
+    assert False, "404 should raise"
+
+def test_deadline_bounds_slow_upstream():
+    """A hanging upstream should fail once the deadline passes"""
+    async def handler(request):
+        await asyncio.sleep(5)
+        return httpx.Response(200, json=[])
+
+    started = time.monotonic()
+    try:
+        asyncio.run(make_client(handler, deadline=0.2).fetch(read_json))
+    except asyncio.TimeoutError:
+        elapsed = time.monotonic() - started
+        logger.info(f"Gave up after {elapsed:.2f}s")
+        assert elapsed < 1
+        return
+    assert False, "Slow upstream should time out"
+
+def test_breaker_opens_and_recovers():
+    """Repeated failures should open the circuit; a successful trial should close it"""
+    healthy = False
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(200, json=[]) if healthy else httpx.Response(500)
+
+    breaker = CircuitBreaker(threshold=2, reset_timeout=0.1)
+    client = make_client(handler, max_retries=0, breaker=breaker)
+
+    for _ in range(2):
+        try:
+            asyncio.run(client.fetch(read_json))
+        except UpstreamError:
+            pass
+    assert breaker.state == "open"
+
+    try:
+        asyncio.run(client.fetch(read_json))
+        assert False, "Open circuit should fail fast"
+    except CircuitOpenError:
+        assert len(calls) == 2, "Open circuit should not reach upstream"
+
+    time.sleep(0.15)
+    healthy = True
+    assert asyncio.run(client.fetch(read_json)) == []
+    assert breaker.state == "closed"
+
+if __name__ == "__main__":
+    test_retries_transient_failures()
+    test_client_errors_are_not_retried()
+    test_deadline_bounds_slow_upstream()
+    test_breaker_opens_and_recovers()
+    logger.info("=== SIGNALS CLIENT TEST COMPLETED SUCCESSFULLY ===")
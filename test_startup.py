@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the deferred startup path and the readiness probe.
+"""
+
+import logging
+import os
+import sys
+import threading
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from startup_benchmark import eager_imports, parse_importtime
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    stream=sys.stdout
+)
+logger = logging.getLogger(__name__)
+
+def test_web_app_defers_heavy_imports():
+    """Importing the web app should not load the Telegram stack or the store"""
+    eager = eager_imports()
+    logger.info(f"Eagerly imported: {eager}")
+    assert eager == []
+
+def test_parse_importtime():
+    stderr = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |   _io\n"
+        "import time:      4115 |     233137 | main\n"
+    )
+    assert parse_importtime(stderr) == {"_io": 120, "main": 233137}
+
+def test_readiness_probe():
+    """/health is always up; /ready waits for a connected bot"""
+    import app as web
+
+    class FakeElection:
+        is_leader = True
+
+    client = web.app.test_client()
+    assert client.get("/health").status_code == 200
+
+    starting = client.get("/ready")
+    assert starting.status_code == 503 and starting.json["bot"] == "starting"
+
+    connected = threading.Event()
+    election, bot = web.election, dict(web._bot)
+    web.election = FakeElection()
+    web._bot["connected"] = connected
+    try:
+        assert client.get("/ready").json["bot"] == "starting"
+        connected.set()
+        response = client.get("/ready")
+        assert response.status_code == 200 and response.json["bot"] == "connected"
+
+        # Another worker runs the bot
+        FakeElection.is_leader = False
+        response = client.get("/ready")
+        assert response.status_code == 503 and response.json["bot"] == "down"
+    finally:
+        web.election = election
+        web._bot.update(bot)
+
+if __name__ == "__main__":
+    test_web_app_defers_heavy_imports()
+    test_parse_importtime()
+    test_readiness_probe()
+    logger.info("=== STARTUP TEST COMPLETED SUCCESSFULLY ===")
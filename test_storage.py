@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the persistent key and user store.
+"""
+
+import logging
+import os
+import sys
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from storage import Storage
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    stream=sys.stdout
+)
+logger = logging.getLogger(__name__)
+
+def test_keys_are_deduplicated_and_single_use():
+    """Duplicate keys should be skipped and a key should be consumable once"""
+    store = Storage("sqlite://", seed_keys=["SEEDKEY1", "SEEDKEY2"])
+
+    assert sorted(store.add_keys(["NEWKEY1", "NEWKEY2", "SEEDKEY1"])) == ["NEWKEY1", "NEWKEY2"]
+    assert store.count_keys() == 4
+
+    assert store.consume_key("NEWKEY1", user_id=42) is True
+    assert store.consume_key("NEWKEY1", user_id=43) is False, "Key should only work once"
+    assert store.consume_key("MISSING") is False
+    assert store.is_used_key("NEWKEY1") and not store.is_used_key("NEWKEY2")
+    assert "NEWKEY1" not in store.unused_keys()
+    assert store.count_used_keys() == 1
+
+def test_concurrent_consumption_has_one_winner():
+    """Many simultaneous attempts on one key should succeed exactly once"""
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite:///{os.path.join(directory, 'bot.db')}"
+        Storage(url, seed_keys=["RACEKEY"]).count_keys()
+
+        # Separate Storage objects stand in for separate worker processes
+        stores = [Storage(url, seed_keys=[]) for _ in range(4)]
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            results = list(pool.map(lambda i: stores[i % 4].consume_key("RACEKEY", i), range(32)))
+
+        logger.info(f"Successful consumptions: {results.count(True)}")
+        assert results.count(True) == 1
+
+def test_users_survive_restart_and_are_shared():
+    """Users written by one process should be visible to another and after restart"""
+    with tempfile.TemporaryDirectory() as directory:
+        url = f"sqlite:///{os.path.join(directory, 'bot.db')}"
+        first = Storage(url, seed_keys=[])
+        second = Storage(url, seed_keys=[])
+
+        assert not second.is_authenticated(1001)
+        first.add_user(1001)
+        first.add_user(1001)
+        assert second.is_authenticated(1001), "Other processes should see new users"
+
+        restarted = Storage(url, seed_keys=[])
+        assert restarted.user_ids() == [1001]
+        assert restarted.count_users() == 1
+
+if __name__ == "__main__":
+    test_keys_are_deduplicated_and_single_use()
+    test_concurrent_consumption_has_one_winner()
+    test_users_survive_restart_and_are_shared()
+    logger.info("=== STORAGE TEST COMPLETED SUCCESSFULLY ===")
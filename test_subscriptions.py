@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Test script to verify per-asset and per-direction subscriptions and their routing index.
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+from signal_index import SignalIndex
+from signal_model import Direction, Signal
+from storage import Storage
+from subscriptions import SubscriptionRouter
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    stream=sys.stdout
+)
+logger = logging.getLogger(__name__)
+
+async def make_router():
+    store = Storage("sqlite://", seed_keys=[])
+    router = SubscriptionRouter(store, max_age=3600)
+    for user_id in (1, 2, 3, 4):
+        await router.add_user(user_id)
+    return store, router
+
+def test_routing_by_asset_and_direction():
+    """Signals should only reach matching subscribers and unfiltered users"""
+    async def scenario():
+        store, router = await make_router()
+        await router.subscribe(1, "brlusd_otc")
+        await router.subscribe(2, "BRLUSD_otc", "put")
+        await router.subscribe(3, "*", "CALL")
+        reloaded = SubscriptionRouter(store)
+        await reloaded.refresh()
+        return router, reloaded
+
+    router, reloaded = asyncio.run(scenario())
+
+    call = Signal("BRLUSD_otc", Direction.parse("compra"))
+    put = Signal("BRLUSD_otc", Direction.PUT)
+    other = Signal("USDINR_otc", Direction.parse("put"))
+
+    assert router.route(call) == {1, 3, 4}
+    assert router.route(put) == {1, 2, 4}
+    assert router.route(other) == {4}
+
+    # A fresh router rebuilt from the store should agree
+    assert [reloaded.route(signal) for signal in (call, put, other)] == [{1, 3, 4}, {1, 2, 4}, {4}]
+
+def test_unsubscribe_restores_everything():
+    """Users left without subscriptions should receive every signal again"""
+    async def scenario():
+        _, router = await make_router()
+        await router.subscribe(1, "BRLUSD_otc")
+        await router.subscribe(1, "USDINR_otc", "CALL")
+
+        assert await router.unsubscribe(1, "brlusd_otc") == 1
+        assert router.filters(1) == {("USDINR_OTC", "CALL")}
+        assert 1 not in router.route(Signal("USDPKR_otc", Direction.CALL))
+
+        assert await router.unsubscribe(1) == 1
+        assert router.filters(1) == set()
+        assert 1 in router.route(Signal("USDPKR_otc", Direction.CALL))
+
+        # Unknown users never end up in the routes
+        await router.unsubscribe(99)
+        assert 99 not in router.route(Signal("USDPKR_otc", Direction.CALL))
+
+    asyncio.run(scenario())
+
+def test_invalid_direction():
+    """Only CALL and PUT are valid directions"""
+    _, router = asyncio.run(make_router())
+    try:
+        asyncio.run(router.subscribe(1, "BRLUSD_otc", "SIDEWAYS"))
+    except ValueError:
+        assert router.filters(1) == set()
+        return
+    assert False, "Invalid direction should raise"
+
+def test_next_signal_per_user():
+    """Each user's next signal should respect their subscriptions"""
+    async def subscribe():
+        _, router = await make_router()
+        await router.subscribe(1, "USDINR_otc")
+        await router.subscribe(2, "BRLUSD_otc", "PUT")
+        return router
+
+    router = asyncio.run(subscribe())
+    index = SignalIndex([
+        Signal("BRLUSD_otc", Direction.CALL, timestamp=100),
+        Signal("USDINR_otc", Direction.PUT, timestamp=200),
+        Signal("BRLUSD_otc", Direction.PUT, timestamp=300),
+    ], clock=lambda: 0)
+
+    assert router.next_signal(1, index).timestamp == 200
+    assert router.next_signal(2, index).timestamp == 300
+    assert router.next_signal(4, index).timestamp == 100
+
+def test_store_runs_off_the_loop_and_reloads_keep_local_changes():
+    """The store is only queried off the loop, and a reload racing a change doesn't undo it"""
+    store = Storage("sqlite://", seed_keys=[])
+    store.add_user(1)
+    loop_threads = set()
+    reading = threading.Event()
+    resume = threading.Event()
+
+    class SlowStore:
+        """Fails store calls made on the loop, and holds a reload right after it read the subscriptions"""
+        def __getattr__(self, name):
+            method = getattr(store, name)
+
+            def call(*args):
+                assert threading.get_ident() not in loop_threads, f"{name} ran on the event loop"
+                result = method(*args)
+                if name == "subscriptions" and not reading.is_set():
+                    reading.set()
+                    resume.wait(5)
+                return result
+            return call
+
+    async def scenario():
+        loop_threads.add(threading.get_ident())
+        router = SubscriptionRouter(SlowStore(), max_age=3600)
+        reading.set()
+        await router.load()
+        reading.clear()
+        # A forced reload reads the store before the subscription below is written
+        router._loaded_at = None
+        reload = asyncio.ensure_future(router.refresh())
+        await asyncio.to_thread(reading.wait, 5)
+        subscribe = asyncio.ensure_future(router.subscribe(1, "BRLUSD_otc", "CALL"))
+        await asyncio.sleep(0.1)
+        resume.set()
+        await asyncio.gather(reload, subscribe)
+        return router
+
+    router = asyncio.run(scenario())
+    assert router.filters(1) == {("BRLUSD_OTC", "CALL")}, "The reload dropped a local change"
+
+if __name__ == "__main__":
+    test_routing_by_asset_and_direction()
+    test_unsubscribe_restores_everything()
+    test_invalid_direction()
+    test_next_signal_per_user()
+    test_store_runs_off_the_loop_and_reloads_keep_local_changes()
+    logger.info("=== SUBSCRIPTIONS TEST COMPLETED SUCCESSFULLY ===")
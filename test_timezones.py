@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Test script to verify batch timezone conversion with precomputed offset tables.
+"""
+
+import logging
+import sys
+from datetime import date, datetime
+import pytz
+from timezones import convert_times, resolve_timezone
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    stream=sys.stdout
+)
+logger = logging.getLogger(__name__)
+
+def test_resolve_timezone():
+    """Offsets and IANA names should both resolve, and be cached"""
+    assert resolve_timezone("UTC+6:00").utcoffset(None).total_seconds() == 6 * 3600
+    assert resolve_timezone("UTC-3").utcoffset(None).total_seconds() == -3 * 3600
+    assert resolve_timezone("Asia/Kolkata").zone == "Asia/Kolkata"
+    assert resolve_timezone("UTC+6:00") is resolve_timezone("UTC+6:00")
+
+def test_batch_matches_pytz():
+    """Batch results should match a strptime and pytz round trip per entry"""
+    day = date(2024, 5, 1)
+    times = [f"{hour:02d}:{minute:02d}" for hour in range(24) for minute in (0, 17, 45)]
+    converted = convert_times(times, "UTC+6:00", "Asia/Kolkata", day=day)
+
+    source = pytz.FixedOffset(6 * 60)
+    target = pytz.timezone("Asia/Kolkata")
+    for entry_time, epoch, formatted in zip(times, converted.epochs, converted.formatted):
+        expected = source.localize(datetime.strptime(f"2024-05-01 {entry_time}", "%Y-%m-%d %H:%M"))
+        assert epoch == expected.timestamp()
+        assert formatted == expected.astimezone(target).strftime("%Y-%m-%d %H:%M:%S %Z")
+
+def test_dst_and_iso_timestamps():
+    """DST transitions and explicit offsets should be honoured"""
+    day = date(2024, 3, 10)  # US spring-forward day
+    converted = convert_times(
+        ["01:30", "03:30", "2024-03-10T12:00:00+00:00", "2024-07-04 12:00", "bogus"],
+        "America/New_York", "UTC", day=day
+    )
+    logger.info(f"Converted: {converted.formatted}")
+
+    assert converted.formatted[:4] == [
+        "2024-03-10 06:30:00 UTC",
+        "2024-03-10 07:30:00 UTC",
+        "2024-03-10 12:00:00 UTC",
+        "2024-07-04 16:00:00 UTC",
+    ]
+    assert converted.epochs[4] is None and converted.formatted[4] is None
+
+def test_upcoming_filter():
+    """Expiry filtering should keep entries at or after now, in input order"""
+    day = date(2024, 5, 1)
+    converted = convert_times(["10:00", "08:00", "bad", "09:00"], "UTC", "UTC", day=day)
+    now = datetime(2024, 5, 1, 9, 0, tzinfo=pytz.utc).timestamp()
+    assert converted.upcoming(now) == [0, 3]
+
+if __name__ == "__main__":
+    test_resolve_timezone()
+    test_batch_matches_pytz()
+    test_dst_and_iso_timestamps()
+    test_upcoming_filter()
+    logger.info("=== TIMEZONES TEST COMPLETED SUCCESSFULLY ===")
@@ -0,0 +1,230 @@
+import calendar
+import logging
+import time
+from bisect import bisect_right
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from functools import lru_cache
+import pytz
+from config import SOURCE_TIMEZONE, TARGET_TIMEZONE
+from logging_setup import SampledLogger
+
+logger = logging.getLogger(__name__)
+conversion_error_log = SampledLogger(logger)
+
+# Resolution of offset tables; every real-world transition falls on a quarter hour
+TABLE_STEP = 15 * 60
+
+DAY = 24 * 60 * 60
+
+@lru_cache(maxsize=64)
+def _resolve_name(name):
+    if name.startswith(("UTC+", "UTC-")):
+        sign = 1 if name[3] == "+" else -1
+        hours, _, minutes = name[4:].partition(":")
+        return pytz.FixedOffset(sign * (int(hours) * 60 + int(minutes or 0)))
+    return pytz.timezone(name)
+
+def resolve_timezone(tz):
+    """
+    Resolve a timezone name to a tzinfo object, caching the result.
+
+    Args:
+        tz (str or tzinfo): An IANA name, a "UTC+H:MM"/"UTC-H:MM" offset or a tzinfo
+
+    Returns:
+        tzinfo: The resolved timezone
+    """
+    if isinstance(tz, str):
+        return _resolve_name(tz)
+    return tz
+
+class OffsetTable:
+    """
+    UTC offsets of one timezone over a window of time.
+
+    Built once by sampling the timezone every TABLE_STEP seconds and
+    merging equal runs, so a lookup is a bisect over a handful of
+    segments instead of a pytz call.
+    """
+
+    def __init__(self, tz, start, end):
+        """
+        Args:
+            tz (tzinfo): The timezone
+            start (int): First UTC epoch second covered
+            end (int): Last UTC epoch second covered
+        """
+        self.starts = []
+        self.offsets = []
+        self.names = []
+        for instant in range(start, end + TABLE_STEP, TABLE_STEP):
+            local = datetime.fromtimestamp(instant, tz)
+            offset = int(local.utcoffset().total_seconds())
+            if not self.offsets or self.offsets[-1] != offset:
+                self.starts.append(instant)
+                self.offsets.append(offset)
+                self.names.append(local.strftime("%Z"))
+
+    def lookup(self, epoch):
+        """
+        Returns:
+            tuple: (offset seconds, zone abbreviation) in effect at a UTC epoch
+        """
+        index = max(bisect_right(self.starts, epoch) - 1, 0)
+        return self.offsets[index], self.names[index]
+
+    def to_utc(self, wall):
+        """
+        Convert a local wall-clock time, as epoch-like seconds, to a UTC epoch.
+
+        Ambiguous times resolve to the earlier offset; times skipped by a
+        DST gap are shifted by the offset in effect before the gap.
+        """
+        for offset in self.offsets:
+            if self.lookup(wall - offset)[0] == offset:
+                return wall - offset
+        return wall - self.offsets[0]
+
+@lru_cache(maxsize=32)
+def offset_table(tz, day):
+    """
+    Offset table for a timezone covering the day before through the day after a date.
+
+    Args:
+        tz (tzinfo): The timezone
+        day (date): The date
+
+    Returns:
+        OffsetTable: The cached table
+    """
+    midnight = calendar.timegm(day.timetuple())
+    return OffsetTable(tz, midnight - 2 * DAY, midnight + 3 * DAY)
+
+def _wall_seconds(timestamp, day_start):
+    """
+    Parse "HH:MM", "HHMM", "YYYY-MM-DD HH:MM[:SS]" or ISO 8601 into wall-clock seconds.
+
+    Returns:
+        tuple: (seconds, explicit UTC offset in seconds or None)
+    """
+    if len(timestamp) <= 5:
+        if ":" in timestamp:
+            hours, _, minutes = timestamp.partition(":")
+        elif len(timestamp) == 4:
+            hours, minutes = timestamp[:2], timestamp[2:]
+        else:
+            raise ValueError("expected HH:MM")
+        hours, minutes = int(hours), int(minutes)
+        if not (0 <= hours < 24 and 0 <= minutes < 60):
+            raise ValueError("time out of range")
+        return day_start + hours * 3600 + minutes * 60, None
+    parsed = datetime.fromisoformat(timestamp)
+    wall = calendar.timegm(parsed.replace(tzinfo=None).timetuple())
+    if parsed.tzinfo is None:
+        return wall, None
+    return wall, int(parsed.utcoffset().total_seconds())
+
+def _table_for(tz, day, day_start, instant):
+    """The table for day if it covers instant, otherwise the table for instant's own date"""
+    if day_start - DAY <= instant < day_start + 2 * DAY:
+        return offset_table(tz, day)
+    return offset_table(tz, datetime.fromtimestamp(instant, timezone.utc).date())
+
+# Format of converted times, followed by the zone abbreviation
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+@lru_cache(maxsize=4096)
+def format_wall(wall, zone, fmt=TIME_FORMAT):
+    """
+    Format a wall-clock time, e.g. "2024-05-01 09:00:00 IST".
+
+    Args:
+        wall (int): Local wall-clock time as epoch-like seconds
+        zone (str): Zone abbreviation appended to the time
+
+    Returns:
+        str: The formatted time, cached for repeated calls
+    """
+    return f"{time.strftime(fmt, time.gmtime(wall))} {zone}"
+
+def to_local(epoch, tz=TARGET_TIMEZONE):
+    """
+    Convert a UTC epoch to wall-clock seconds in a timezone.
+
+    Returns:
+        tuple: (wall-clock seconds, zone abbreviation)
+    """
+    tz = resolve_timezone(tz)
+    offset, name = offset_table(tz, datetime.fromtimestamp(epoch, timezone.utc).date()).lookup(epoch)
+    return epoch + offset, name
+
+@dataclass
+class ConvertedTimes:
+    """Result of a batch conversion; entries that failed to parse are None"""
+    epochs: list = field(default_factory=list)
+    formatted: list = field(default_factory=list)
+    # Wall-clock seconds and zone abbreviations in the target zone
+    walls: list = field(default_factory=list)
+    zones: list = field(default_factory=list)
+
+    def upcoming(self, now):
+        """
+        Indices of entries at or after now.
+
+        A plain pass over epochs: entries keep the input order, which
+        need not be sorted, so unlike SignalIndex there is no sorted list
+        to bisect, and sorting first would cost more than the scan.
+
+        Args:
+            now (float): Current UTC epoch seconds
+
+        Returns:
+            list: Indices into epochs/formatted, in input order
+        """
+        return [index for index, epoch in enumerate(self.epochs) if epoch is not None and epoch >= now]
+
+def convert_times(timestamps, from_tz=SOURCE_TIMEZONE, to_tz=TARGET_TIMEZONE, day=None,
+                  fmt=TIME_FORMAT):
+    """
+    Convert a batch of timestamps from one timezone to another.
+
+    Entries are still converted one at a time, but offsets come from
+    precomputed tables for both zones, so each one costs integer
+    arithmetic and a table lookup instead of a strptime and pytz round
+    trip.
+
+    Args:
+        timestamps (iterable): "HH:MM"/"HHMM" times or ISO timestamps
+        from_tz (str or tzinfo): Zone of timestamps without an explicit offset
+        to_tz (str or tzinfo): Zone to format the results in
+        day (date): Date for bare times, defaults to today in from_tz
+        fmt (str): strftime format for the result, followed by the zone abbreviation
+
+    Returns:
+        ConvertedTimes: UTC epochs and formatted strings, aligned with the input
+    """
+    source = resolve_timezone(from_tz)
+    target = resolve_timezone(to_tz)
+    if day is None:
+        day = datetime.now(source).date()
+    day_start = calendar.timegm(day.timetuple())
+
+    result = ConvertedTimes()
+    for timestamp in timestamps:
+        try:
+            wall, explicit_offset = _wall_seconds(str(timestamp), day_start)
+            if explicit_offset is None:
+                epoch = _table_for(source, day, day_start, wall).to_utc(wall)
+            else:
+                epoch = wall - explicit_offset
+            offset, name = _table_for(target, day, day_start, epoch).lookup(epoch)
+            formatted = format_wall(epoch + offset, name, fmt)
+        except (ValueError, IndexError, TypeError) as e:
+            conversion_error_log.warning("Could not convert timestamp %r: %s", timestamp, e)
+            epoch = formatted = offset = name = None
+        result.epochs.append(epoch)
+        result.formatted.append(formatted)
+        result.walls.append(None if epoch is None else epoch + offset)
+        result.zones.append(name)
+    return result
@@ -1,27 +1,38 @@
+import asyncio
 import hashlib
+import html
 import logging
-import pytz
-from datetime import datetime, timedelta
-import requests
+import secrets
+import string
+import time
+from datetime import datetime
+from functools import lru_cache
+import httpx
 from config import (
     SOURCE_TIMEZONE,
     TARGET_TIMEZONE,
-    SIGNALS_API_URL,
-    SIGNALS_API_KEY,
     MASTER_KEY,
-    VALID_KEYS,
-    USED_KEYS,
-    PERMANENT_KEY
+    PERMANENT_KEY,
+    KEY_LETTERS,
+    KEY_DIGITS,
+    SIGNAL_MESSAGE_CACHE_SIZE
 )
+from storage import store
+from signal_feeds import signal_aggregator
+from signal_model import direction_side
+from signals_client import CircuitOpenError, UpstreamError
+from timezones import resolve_timezone
+from metrics import SIGNAL_FETCHES, SIGNAL_FETCH_LATENCY, MESSAGES_FORMATTED
 
 logger = logging.getLogger(__name__)
 
-def verify_private_key(private_key):
+def verify_private_key(private_key, user_id=None):
     """
     Verify if a private key is valid and check if it's a single-use key.
     
     Args:
         private_key (str): The private key to verify
+        user_id (int): The user presenting the key, recorded when a key is consumed
     
     Returns:
         bool: True if the key is valid, False otherwise
@@ -33,15 +44,14 @@ def verify_private_key(private_key):
     if private_key == PERMANENT_KEY:
         return True
     
-    # Check if key is in the valid keys list and not previously used
-    if private_key in VALID_KEYS and private_key not in USED_KEYS:
-        # Mark the key as used so it can't be used again
-        USED_KEYS.add(private_key)
+    # Atomically mark the key as used so it can't be used again,
+    # even by a concurrent request in another process
+    if store.consume_key(private_key, user_id):
         logger.info(f"Single-use key '{private_key}' verified and marked as used")
         return True
     
     # Check if key was already used
-    if private_key in USED_KEYS:
+    if store.is_used_key(private_key):
         logger.warning(f"Attempt to use already used key: {private_key}")
         return False
         
@@ -60,6 +70,8 @@ def convert_timezone(timestamp, from_tz=SOURCE_TIMEZONE, to_tz=TARGET_TIMEZONE):
     """
     Convert a timestamp from one timezone to another.
     
+    Use timezones.convert_times to convert a whole batch at once.
+    
     Args:
         timestamp (str or datetime): The timestamp to convert
         from_tz (str): Source timezone
@@ -75,196 +87,138 @@ def convert_timezone(timestamp, from_tz=SOURCE_TIMEZONE, to_tz=TARGET_TIMEZONE):
                 dt = datetime.strptime(timestamp, "%Y-%m-%dT%H:%M:%S%z")
             except ValueError:
                 dt = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S")
-                # Handle UTC+6:00 format
-                if from_tz == "UTC+6:00":
-                    from_tz = pytz.FixedOffset(6 * 60)
-                    dt = from_tz.localize(dt)
         else:
             dt = timestamp
             
         # If timestamp doesn't have timezone info and from_tz is specified
         if dt.tzinfo is None and from_tz:
-            if isinstance(from_tz, str):
-                if from_tz.startswith("UTC+"):
-                    offset_hours = int(from_tz.replace("UTC+", "").split(":")[0])
-                    from_tz = pytz.FixedOffset(offset_hours * 60)
-                else:
-                    from_tz = pytz.timezone(from_tz)
-            dt = from_tz.localize(dt)
+            dt = resolve_timezone(from_tz).localize(dt)
             
         # Convert to target timezone
-        if isinstance(to_tz, str):
-            to_timezone = pytz.timezone(to_tz)
-        else:
-            to_timezone = to_tz
-            
-        return dt.astimezone(to_timezone)
+        return dt.astimezone(resolve_timezone(to_tz))
     except Exception as e:
         logger.error(f"Error converting timezone: {e}")
         return timestamp
 
-def fetch_trading_signals():
+async def fetch_trading_signals(raise_on_error=False, stop_after=None):
     """
-    Fetch trading signals from the API.
+    Fetch trading signals from the API without blocking the event loop.
+    
+    Every configured feed is fetched concurrently through the shared
+    signal_aggregator and the results are merged by due time. Each feed's
+    client pools connections, retries transient failures within the
+    feed's deadline and fails fast while that feed is down.
+    
+    Response bodies are parsed as they stream in: records are converted
+    in small batches, expired ones are dropped straight away and reading
+    can stop once stop_after upcoming signals have been found.
+    
+    Args:
+        raise_on_error (bool): Re-raise request and parsing errors instead of
+            returning an empty list, so callers can tell a failed fetch apart
+            from a response without upcoming signals. With several feeds
+            only a fetch where every feed failed is an error
+        stop_after (int): Stop reading after this many upcoming signals;
+            None reads the whole response. This is a scan cutoff: signals
+            are taken in the order the feed lists them, so with an
+            unsorted feed they are not necessarily the soonest ones
     
     Returns:
-        list: List of signal dictionaries or empty list if failed
+        list: List of Signals or empty list if failed
     """
+    started = time.perf_counter()
     try:
-        headers = {"Authorization": f"Bearer {SIGNALS_API_KEY}"} if SIGNALS_API_KEY else {}
-        
-        response = requests.get(SIGNALS_API_URL, headers=headers, timeout=15)
-        response.raise_for_status()
-        
-        data = response.json()
-        logger.info(f"API Response: {data}")
-        
-        # The API returns a dictionary with 'signals', 'data', or directly an array of signals
-        if isinstance(data, dict):
-            if 'signals' in data:
-                signals = data['signals']
-            elif 'data' in data:
-                signals = data['data']
-            else:
-                # Try to find a key that might contain signals
-                potential_signal_keys = [k for k, v in data.items() if isinstance(v, list) and len(v) > 0]
-                if potential_signal_keys:
-                    signals = data[potential_signal_keys[0]]
-                else:
-                    signals = []
-            logger.info(f"Successfully extracted {len(signals)} signals from API response")
-        else:
-            signals = data if isinstance(data, list) else []
-            logger.info(f"Using full response as signals list with {len(signals)} items")
-        
-        # Get current date in UTC+6 (SOURCE_TIMEZONE)
-        source_tz = pytz.FixedOffset(6 * 60)  # UTC+6:00
-        current_date = datetime.now(source_tz).strftime("%Y-%m-%d")
-        
-        # Filter and process signals
-        current_time = datetime.now(pytz.timezone(TARGET_TIMEZONE))
-        processed_signals = []
-        
-        logger.info(f"Current time in {TARGET_TIMEZONE}: {current_time}")
-        
-        for signal in signals:
-            try:
-                # Adapt to different possible field names based on API changes
-                entry_time = None
-                
-                # Try different field names for time
-                time_fields = ["entrada", "time", "entry", "entry_time", "hora", "horario", "time_entry"]
-                for field in time_fields:
-                    if field in signal and signal[field]:
-                        entry_time = signal[field]
-                        break
-                
-                if not entry_time:
-                    logger.warning(f"Signal missing entry time: {signal}")
-                    continue
-                
-                # Handle different time formats
-                time_format = "%H:%M"
-                if ":" not in entry_time:
-                    # Handle numeric format (e.g., 1430 for 14:30)
-                    if len(entry_time) == 4 and entry_time.isdigit():
-                        entry_time = f"{entry_time[:2]}:{entry_time[2:]}"
-                
-                # Create a full datetime string with today's date and the entry time
-                # The API provides time in HH:MM format in UTC+6:00 timezone
-                full_time_str = f"{current_date} {entry_time}"
-                logger.debug(f"Created full time string: {full_time_str}")
-                
-                # Parse the time and set the timezone to UTC+6:00
-                dt = datetime.strptime(full_time_str, "%Y-%m-%d %H:%M")
-                signal_time = source_tz.localize(dt)
-                logger.debug(f"Original signal time (UTC+6:00): {signal_time}")
-                
-                # Convert to target timezone (GMT+5:30)
-                target_tz = pytz.timezone(TARGET_TIMEZONE)
-                signal_time_converted = signal_time.astimezone(target_tz)
-                logger.debug(f"Converted signal time ({TARGET_TIMEZONE}): {signal_time_converted}")
-                
-                # Skip expired signals
-                if signal_time_converted < current_time:
-                    logger.info(f"Skipping expired signal: {entry_time}, current time: {current_time}")
-                    continue
-                
-                # Try to find asset and direction with different possible field names
-                asset = None
-                asset_fields = ["ativos", "asset", "currency", "par", "pair", "symbol", "moeda"]
-                for field in asset_fields:
-                    if field in signal and signal[field]:
-                        asset = signal[field]
-                        break
-                
-                if not asset:
-                    asset = "Unknown"
-                
-                direction = None
-                direction_fields = ["direcao_principal", "direction", "direcao", "operation", "tipo", "type"]
-                for field in direction_fields:
-                    if field in signal and signal[field]:
-                        direction = signal[field]
-                        break
-                
-                if not direction:
-                    direction = "Unknown"
-                
-                # Create a clean processed signal object
-                processed_signal = {
-                    "asset": asset,
-                    "direction": direction,
-                    "original_time": entry_time,
-                    "converted_time": signal_time_converted.strftime("%Y-%m-%d %H:%M:%S %Z")
-                }
-                
-                processed_signals.append(processed_signal)
-                logger.info(f"Added signal: {processed_signal}")
-            except Exception as e:
-                logger.error(f"Error processing signal: {e}")
-                logger.error(f"Problematic signal: {signal}")
-                continue
-        
-        logger.info(f"Total processed signals: {len(processed_signals)}")
-        return processed_signals
-    except requests.RequestException as e:
+        signals = await signal_aggregator.fetch(stop_after)
+    except CircuitOpenError as e:
+        # No upstream call was made, so no latency to record
+        SIGNAL_FETCHES.inc(outcome="circuit_open")
+        logger.warning(f"Skipping signals fetch: {e}")
+        if raise_on_error:
+            raise
+        return []
+    except (httpx.HTTPError, UpstreamError, asyncio.TimeoutError) as e:
+        _record_fetch("upstream_error", started)
         logger.error(f"Error fetching signals from API: {e}")
+        if raise_on_error:
+            raise
         return []
     except ValueError as e:
+        _record_fetch("parse_error", started)
         logger.error(f"Error parsing API response: {e}")
+        if raise_on_error:
+            raise
         return []
     except Exception as e:
+        _record_fetch("error", started)
         logger.error(f"Unexpected error fetching signals: {e}")
+        if raise_on_error:
+            raise
         return []
+    _record_fetch("ok", started)
+    return signals
+
+def _record_fetch(outcome, started):
+    SIGNAL_FETCHES.inc(outcome=outcome)
+    SIGNAL_FETCH_LATENCY.observe(time.perf_counter() - started)
+
+KEY_PREFIXES = ("VIP", "SIGNAL", "TRADE", "BINARY", "FOREX", "CRYPTO")
+
+def _random_choices(options, count):
+    """
+    Pick count items from options using a CSPRNG.
+
+    Random bytes are mapped onto the options with rejection sampling so
+    every option is equally likely.
+    """
+    limit = 256 - (256 % len(options))
+    picks = []
+    while len(picks) < count:
+        missing = count - len(picks)
+        chunk = secrets.token_bytes(missing + missing // 8 + 16)
+        picks.extend(options[byte % len(options)] for byte in chunk if byte < limit)
+    return picks[:count]
+
+def _random_strings(alphabet, length, count):
+    """Draw count random strings of the given length in one pass"""
+    chars = ''.join(_random_choices(alphabet, length * count))
+    return [chars[i:i + length] for i in range(0, length * count, length)]
+
+def generate_keys(count):
+    """
+    Generate a batch of new unique single-use keys and add them to the key store.
+    
+    Candidates are deduplicated in a set and written with one bulk insert;
+    any that collide with stored keys are replaced in another round.
+    
+    Args:
+        count (int): Number of keys to generate
+    
+    Returns:
+        list: The newly generated keys
+    """
+    new_keys = []
+    while len(new_keys) < count:
+        needed = count - len(new_keys)
+        prefixes = _random_choices(KEY_PREFIXES, needed)
+        letters = _random_strings(string.ascii_uppercase, KEY_LETTERS, needed)
+        numbers = _random_strings(string.digits, KEY_DIGITS, needed)
+        
+        # Combine the parts; the set drops duplicates within the batch
+        candidates = {f"{prefix}{letter}{number}" for prefix, letter, number in zip(prefixes, letters, numbers)}
+        new_keys.extend(store.add_keys(candidates))
+    
+    logger.info(f"Added {len(new_keys)} new single-use keys")
+    return new_keys
 
 def generate_new_key():
     """
-    Generate a new unique single-use key and add it to the valid keys list.
+    Generate a new unique single-use key and add it to the key store.
     
     Returns:
         str: The newly generated key
     """
     try:
-        import random
-        import string
-        
-        # Generate a random key with prefix
-        prefix = random.choice(["VIP", "SIGNAL", "TRADE", "BINARY", "FOREX", "CRYPTO"])
-        numbers = ''.join(random.choices(string.digits, k=3))
-        letters = ''.join(random.choices(string.ascii_uppercase, k=3))
-        
-        # Combine the parts to create a unique key
-        new_key = f"{prefix}{letters}{numbers}"
-        
-        # Add the key to valid keys if it's not already there
-        if new_key not in VALID_KEYS and new_key not in USED_KEYS:
-            VALID_KEYS.append(new_key)
-            logger.info(f"Added new single-use key: {new_key}")
-            return new_key
-        else:
-            # Try again if there's a collision (very unlikely but possible)
-            return generate_new_key()
+        return generate_keys(1)[0]
     except Exception as e:
         logger.error(f"Error generating new key: {e}")
         return None
@@ -276,75 +230,97 @@ def get_all_valid_keys():
     Returns:
         list: List of valid unused keys
     """
-    unused_keys = [key for key in VALID_KEYS if key not in USED_KEYS]
-    return unused_keys
+    return store.unused_keys()
 
-def format_signal_message(signal, is_expiry=False):
-    """
-    Format a trading signal into a readable message.
-    
-    Args:
-        signal (dict): The signal data
-        is_expiry (bool): Whether this is an expiry message
-        
-    Returns:
-        str: Formatted message
-    """
-    try:
-        # Log the signal being processed to debug
-        logger.info(f"Formatting signal: {signal}")
-        
-        # Get asset from "ativos" or fallback to "asset" field
-        asset = signal.get("asset", "Unknown")
-        
-        # Get direction from "direcao_principal" or fallback to "direction" field
-        direction = signal.get("direction", "Unknown")
-        
-        # Get the converted time
-        signal_time = signal.get("converted_time", "Unknown")
-        
-        # Format the direction - handle both uppercase and lowercase variants
-        direction_lower = direction.lower() if isinstance(direction, str) else "unknown"
-        
-        if "call" in direction_lower or "compra" in direction_lower or "alta" in direction_lower:
-            direction_emoji = "📈"
-            direction_text = "CALL"
-        elif "put" in direction_lower or "venda" in direction_lower or "baixa" in direction_lower:
-            direction_emoji = "📉"
-            direction_text = "PUT"
-        else:
-            direction_emoji = "❓"
-            direction_text = direction.upper() if isinstance(direction, str) else "UNKNOWN"
-            
-        if is_expiry:
-            message = f"""
+DIRECTION_EMOJIS = {"CALL": "📈", "PUT": "📉"}
+
+SIGNAL_TEMPLATES = {
+    ("signal", "Markdown"): """
+🔔 *NEW TRADING SIGNAL* 🔔
+
+Asset: *{asset}*
+Direction: *{direction}* {emoji}
+Entry Time: *{time}*
+MTG 1-Step System: *{mtg}%* 📊
+
+_Trade responsibly and manage your risk!_
+            """,
+    ("expiry", "Markdown"): """
 ⚠️ *SIGNAL EXPIRED* ⚠️
 
 Asset: *{asset}*
-Direction: *{direction_text}* {direction_emoji}
-Entry Time: *{signal_time}*
+Direction: *{direction}* {emoji}
+Entry Time: *{time}*
 
 ⏳ Please wait for the next signal alert.
 ⚡ New signals are posted regularly.
 
 _Contact @BILLIONAIREBOSS101 for VIP access._
-            """
-        else:
-            # Generate an MTG 1-step value
-            mtg_value = 85  # Fixed value for 1-step system
-            
-            message = f"""
-🔔 *NEW TRADING SIGNAL* 🔔
+            """,
+    ("signal", "HTML"): """
+🔔 <b>NEW TRADING SIGNAL</b> 🔔
 
-Asset: *{asset}*
-Direction: *{direction_text}* {direction_emoji}
-Entry Time: *{signal_time}*
-MTG 1-Step System: *{mtg_value}%* 📊
+Asset: <b>{asset}</b>
+Direction: <b>{direction}</b> {emoji}
+Entry Time: <b>{time}</b>
+MTG 1-Step System: <b>{mtg}%</b> 📊
 
-_Trade responsibly and manage your risk!_
-            """
+<i>Trade responsibly and manage your risk!</i>
+""",
+    ("expiry", "HTML"): """
+⚠️ <b>SIGNAL EXPIRED</b> ⚠️
+
+Asset: <b>{asset}</b>
+Direction: <b>{direction}</b> {emoji}
+Entry Time: <b>{time}</b>
+
+⏳ Please wait for the next signal alert.
+⚡ New signals are posted regularly.
+
+<i>Contact @BILLIONAIREBOSS101 for VIP access.</i>
+""",
+}
+
+# Fixed value for the 1-step MTG system
+MTG_VALUE = 85
+
+@lru_cache(maxsize=SIGNAL_MESSAGE_CACHE_SIZE)
+def _render_signal_message(asset, direction, signal_time, kind, parse_mode):
+    side = direction_side(direction)
+    if parse_mode == "HTML":
+        asset, side, signal_time = html.escape(str(asset)), html.escape(side), html.escape(str(signal_time))
+    return SIGNAL_TEMPLATES[(kind, parse_mode)].format(
+        asset=asset,
+        direction=side,
+        emoji=DIRECTION_EMOJIS.get(side, "❓"),
+        time=signal_time,
+        mtg=MTG_VALUE
+    )
+
+def format_signal_message(signal, is_expiry=False, parse_mode="Markdown"):
+    """
+    Format a trading signal into a readable message.
+    
+    Rendered messages are memoized per signal, so a broadcast renders
+    each signal once no matter how many chats receive it.
+    
+    Args:
+        signal (Signal): The signal
+        is_expiry (bool): Whether this is an expiry message
+        parse_mode (str): "Markdown" or "HTML"
         
-        return message
+    Returns:
+        str: Formatted message
+    """
+    MESSAGES_FORMATTED.inc()
+    try:
+        return _render_signal_message(
+            signal.asset,
+            signal.direction_text,
+            signal.converted_time,
+            "expiry" if is_expiry else "signal",
+            parse_mode
+        )
     except Exception as e:
         logger.error(f"Error formatting signal message: {e}")
         return "Error formatting signal"
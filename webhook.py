@@ -0,0 +1,158 @@
+import asyncio
+import logging
+import threading
+from collections import deque
+from metrics import QUEUE_DEPTH
+from config import WEBHOOK_QUEUE_SIZE, WEBHOOK_WORKERS, WEBHOOK_DEDUP_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Outcomes of UpdateQueue.submit()
+QUEUED = "queued"
+DUPLICATE = "duplicate"
+BUSY = "busy"
+UNAVAILABLE = "unavailable"
+# Answer of the webhook route for updates left for the leader in the store
+RELAYED = "relayed"
+
+class UpdateQueue:
+    """
+    Bounded queue between the webhook endpoint and the bot's event loop.
+
+    The web thread submits raw update JSON; a fixed pool of workers on the
+    bot's loop turns it into Updates and processes them. Updates already
+    seen (Telegram redelivers when a response is slow or lost) are
+    dropped by update_id, and once maxsize updates are waiting new ones
+    are refused so Telegram retries them later instead of the process
+    buffering without limit.
+    """
+
+    def __init__(self, maxsize=WEBHOOK_QUEUE_SIZE, workers=WEBHOOK_WORKERS, dedup_size=WEBHOOK_DEDUP_SIZE):
+        """
+        Args:
+            maxsize (int): Max updates waiting or being processed
+            workers (int): Number of updates processed concurrently
+            dedup_size (int): Number of recent update_ids remembered
+        """
+        self.maxsize = maxsize
+        self._workers = workers
+        self._lock = threading.Lock()
+        self._recent = deque(maxlen=dedup_size)
+        self._recent_ids = set()
+        self._pending = 0
+        self._application = None
+        self._loop = None
+        self._queue = None
+        self._tasks = []
+
+    @property
+    def pending(self):
+        """Number of updates waiting or being processed"""
+        return self._pending
+
+    def start(self, application):
+        """Start the workers on the running event loop"""
+        self._application = application
+        self._queue = asyncio.Queue()
+        self._tasks = [
+            asyncio.create_task(self._work(), name=f"webhook-worker-{i}")
+            for i in range(self._workers)
+        ]
+        with self._lock:
+            self._pending = 0
+            self._loop = asyncio.get_running_loop()
+        logger.info(f"Webhook queue started with {self._workers} workers")
+
+    async def stop(self, timeout=10):
+        """Refuse new updates, finish the queued ones within timeout, then stop the workers"""
+        with self._lock:
+            self._loop = None
+        if self._queue is not None:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Dropping {self._pending} queued updates on shutdown")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    def submit(self, payload):
+        """
+        Queue one update. Safe to call from any thread.
+
+        Args:
+            payload (dict): Update JSON as posted by Telegram
+
+        Returns:
+            str: QUEUED, DUPLICATE, BUSY (queue full) or UNAVAILABLE (not started)
+
+        Raises:
+            ValueError: If the payload is not an update
+        """
+        update_id = payload.get("update_id") if isinstance(payload, dict) else None
+        if not isinstance(update_id, int):
+            raise ValueError("Payload has no update_id")
+
+        with self._lock:
+            loop = self._loop
+            if loop is None:
+                return UNAVAILABLE
+            if update_id in self._recent_ids:
+                return DUPLICATE
+            if self._pending >= self.maxsize:
+                return BUSY
+            self._pending += 1
+            if len(self._recent) == self._recent.maxlen:
+                self._recent_ids.discard(self._recent[0])
+            self._recent.append(update_id)
+            self._recent_ids.add(update_id)
+
+        loop.call_soon_threadsafe(self._queue.put_nowait, payload)
+        return QUEUED
+
+    async def take_relayed(self, store):
+        """
+        Queue the updates other processes relayed through the store.
+
+        Only as many as the queue has room for are taken; the rest stay in
+        the store for the next call.
+
+        Args:
+            store (Storage): Store the webhook route relays updates to
+
+        Returns:
+            int: Number of updates queued
+        """
+        room = self.maxsize - self._pending
+        if room <= 0 or self._loop is None:
+            return 0
+        payloads = await asyncio.to_thread(store.take_relayed_updates, room)
+        queued = 0
+        for payload in payloads:
+            outcome = self.submit(payload)
+            if outcome in (BUSY, UNAVAILABLE):
+                # Filled up or stopped meanwhile, leave it for the next call
+                await asyncio.to_thread(store.relay_update, payload)
+            elif outcome == QUEUED:
+                queued += 1
+        return queued
+
+    async def _work(self):
+        from telegram import Update
+        while True:
+            payload = await self._queue.get()
+            try:
+                update = Update.de_json(payload, self._application.bot)
+                await self._application.process_update(update)
+            except Exception as e:
+                logger.error(f"Error processing update {payload.get('update_id')}: {e}")
+            finally:
+                with self._lock:
+                    self._pending -= 1
+                self._queue.task_done()
+
+# Shared queue fed by the Flask webhook route
+update_queue = UpdateQueue()
+QUEUE_DEPTH.set_function(lambda: update_queue.pending, queue="webhook")